@@ -1337,6 +1337,12 @@ def main():
             # Also optionally disable image resize overlay in safe mode
             if SAFE_MODE:
                 os.environ["NOTEBOOK_DISABLE_IMAGE_RESIZE"] = "1"
+                try:
+                    from ui_richtext import _reset_image_resize_flag
+
+                    _reset_image_resize_flag()
+                except Exception:
+                    pass
             # Install image context menu and keyboard shortcuts regardless of toolbar wiring
             try:
                 install_image_support(te)
@@ -10,7 +10,11 @@ from PyQt5 import QtWidgets, QtCore, QtGui
 from PyQt5.QtGui import QTextBlockFormat
 import re
 import os
-from PyQt5.QtCore import QEvent, QObject, QPoint, QRect, QSize, Qt, QUrl, QTimer
+import hashlib
+import threading
+from html.parser import HTMLParser
+from functools import lru_cache, partial
+from PyQt5.QtCore import QEvent, QObject, QPoint, QRect, QRunnable, QSize, QStandardPaths, Qt, QThreadPool, QUrl, QTimer
 from PyQt5.QtGui import (
     QColor,
     QDesktopServices,
@@ -22,8 +26,8 @@ from PyQt5.QtGui import (
     QPalette,
     QPen,
     QImage,
+    QImageReader,
     QPixmap,
-    QCursor,
     QTextCharFormat,
     QTextCursor,
     QTextFrameFormat,
@@ -38,84 +42,220 @@ from PyQt5.QtGui import (
     QTextCharFormat as _QTextCharFormat,
 )
 
+# Standard button set shared by the editor's modal dialogs
+_OK_CANCEL = QtWidgets.QDialogButtonBox.Ok | QtWidgets.QDialogButtonBox.Cancel
+
+# Editor shortcuts, parsed once
+_KS_INDENT = QKeySequence("Ctrl+]")
+_KS_OUTDENT = QKeySequence("Ctrl+[")
+_KS_IMG_PROPS = QKeySequence("Ctrl+Shift+I")
+_KS_F2 = QKeySequence("F2")
+
+# Binding capabilities probed once (older PyQt builds lack some of these)
+_HAS_SHORTCUT_CTX = hasattr(QtWidgets.QAction, "setShortcutContext")
+_HAS_IS_IMAGE_FORMAT = hasattr(QTextFormat, "isImageFormat")
+_HAS_BORDER_STYLE = hasattr(QTextFrameFormat, "setBorderStyle")
+
+# Links: href of an <a> wrapping an <img> (linked video thumbnails), and
+# "already absolute" hrefs (scheme: or /root) that must not be joined to the media root
+_LINKED_IMG_HREF_RE = re.compile(r"<a[^>]+href=\"([^\"]+)\"[^>]*>\s*<img[^>]*>\s*</a>", re.IGNORECASE)
+_URL_SCHEME_OR_ROOT_RE = re.compile(r"^[a-zA-Z]+:|^/")
+
 # ----------------------------- Image helpers -----------------------------
-_RAW_EXTS = {
+_RAW_EXTS = frozenset({
     "dng", "nef", "cr2", "cr3", "arw", "orf", "rw2", "raf", "srw", "pef",
     "rw1", "3fr", "erf", "kdc", "mrw", "nrw", "ptx", "r3d", "sr2", "x3f"
-}
+})
+
 
 def _is_raw_ext(name: str) -> bool:
-    try:
-        if not name:
-            return False
-        import os as _os
-        ext = _os.path.splitext(str(name))[1].lstrip(".").lower()
-        return ext in _RAW_EXTS
-    except Exception:
+    if not name:
+        return False
+    _, dot, ext = name.rpartition(".")
+    return bool(dot) and ext.lower() in _RAW_EXTS
+
+
+def _resolve_base(text_edit: QtWidgets.QTextEdit):
+    # Top-level window is cached by install_image_support (refreshed on reparent);
+    # _media_root itself is read live since opening another DB replaces it
+    win = getattr(text_edit, "_rt_window", None)
+    if win is None:
+        win = text_edit.window()
+    return getattr(win, "_media_root", None)
+
+
+class _WindowCacheRefresher(QObject):
+    def __init__(self, text_edit: QtWidgets.QTextEdit):
+        super().__init__(text_edit)
+        self._edit = text_edit
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.ParentChange:
+            try:
+                self._edit._rt_window = self._edit.window()
+            except Exception:
+                pass
         return False
-def _qimage_dims(text_edit: QtWidgets.QTextEdit, name: str):
+
+
+# Image header sizes keyed on (path, mtime_ns, size) so an edited file is re-read.
+# A bounded LRU dict rather than lru_cache: non-blocking lookups need to ask
+# whether a key is cached, and background readers fill it from worker threads.
+_DIMS_CACHE_MAX = 512
+_DIMS_CACHE = {}
+_DIMS_LOCK = threading.Lock()
+
+
+def _image_file_dims(path: str, mtime_ns: int, size: int):
+    key = (path, mtime_ns, size)
+    with _DIMS_LOCK:
+        dims = _DIMS_CACHE.pop(key, None)
+        if dims is not None:
+            _DIMS_CACHE[key] = dims
+            return dims
+    # QImageReader only parses the header instead of decoding the whole image
+    reader = QImageReader(path)
+    # Suffix first, content sniff only as Qt's own fallback
+    reader.setDecideFormatFromContent(False)
+    sz = reader.size()
+    dims = (sz.width(), sz.height()) if sz.isValid() else (None, None)
+    with _DIMS_LOCK:
+        _DIMS_CACHE[key] = dims
+        while len(_DIMS_CACHE) > _DIMS_CACHE_MAX:
+            del _DIMS_CACHE[next(iter(_DIMS_CACHE))]
+    return dims
+
+
+# Background header reads for non-blocking lookups (caret HUD); results land in
+# _DIMS_CACHE, _DIMS_PENDING only stops the same key being queued twice.
+_DIMS_PENDING = set()
+_DIMS_POOL = None
+
+
+class _DimsFetcher(QRunnable):
+    def __init__(self, key):
+        super().__init__()
+        self._key = key
+
+    def run(self):
+        try:
+            _image_file_dims(*self._key)
+        except Exception:
+            pass
+        _DIMS_PENDING.discard(self._key)
+
+
+def _dims_pool() -> QThreadPool:
+    global _DIMS_POOL
+    if _DIMS_POOL is None:
+        _DIMS_POOL = QThreadPool()
+        _DIMS_POOL.setMaxThreadCount(2)
+    return _DIMS_POOL
+
+
+def _qimage_dims(text_edit: QtWidgets.QTextEdit, name: str, block: bool = True, base: str = None):
+    """Intrinsic (width, height) of an image src, or (None, None).
+
+    With block=False a cold lookup is queued on a worker thread and returns
+    (None, None) right away; later calls pick up the cached size. Callers that
+    already resolved the media root can pass it as base.
+    """
     try:
         if not name:
             return None, None
-        base = getattr(text_edit.window(), "_media_root", None)
+        if base is None:
+            base = _resolve_base(text_edit)
         path = name
         if base and name and not os.path.isabs(name):
             path = os.path.join(base, name)
         # Avoid trying to load RAW formats; Qt/libtiff may spam stderr and fail
         if _is_raw_ext(path):
             return None, None
-        img = QImage(path)
-        if not img.isNull():
-            return img.width(), img.height()
+        st = os.stat(path)
+        key = (path, st.st_mtime_ns, st.st_size)
+        if not block and key not in _DIMS_CACHE:
+            if key not in _DIMS_PENDING:
+                _DIMS_PENDING.add(key)
+                _dims_pool().start(_DimsFetcher(key))
+            return None, None
+        return _image_file_dims(*key)
     except Exception:
         pass
     return None, None
 
 
-def _image_info_at_cursor(text_edit: QtWidgets.QTextEdit):
-    cur = text_edit.textCursor()
-    # Check char under cursor
+def _path_image_dims(path: str):
+    """Header-only (width, height) of an image file through the shared dims cache; (0, 0) if unreadable."""
+    try:
+        st = os.stat(path)
+        iw, ih = _image_file_dims(path, st.st_mtime_ns, st.st_size)
+    except Exception:
+        return 0, 0
+    return int(iw or 0), int(ih or 0)
+
+
+# Leading signatures of the image files accepted for insertion (the formats
+# imghdr used to recognise that Qt can display); WebP is RIFF + "WEBP" at 8,
+# and the netpbm family is "P1".."P6" followed by whitespace
+_IMAGE_MAGICS = (
+    b"\x89PNG\r\n\x1a\n",
+    b"\xff\xd8\xff",
+    b"GIF87a",
+    b"GIF89a",
+    b"BM",
+    b"MM\x00*",
+    b"II*\x00",
+)
+
+
+def _sniff_image(path: str) -> bool:
+    try:
+        with open(path, "rb") as f:
+            head = f.read(12)
+    except Exception:
+        return False
+    if head.startswith(_IMAGE_MAGICS):
+        return True
+    if head[:4] == b"RIFF":
+        return head[8:12] == b"WEBP"
+    return len(head) >= 3 and head[0] == 0x50 and head[1] in b"123456" and head[2] in b" \t\n\r"
+
+
+def _clear_image_dims_cache():
+    with _DIMS_LOCK:
+        _DIMS_CACHE.clear()
+
+
+_qimage_dims.cache_clear = _clear_image_dims_cache
+
+
+# Image-char test resolved once: the bound C++ predicate where available, so the
+# fragment walks don't pay a Python frame per fragment
+_IMG_OBJECT = QTextFormat.ImageObject
+_is_image_fmt = (
+    QTextFormat.isImageFormat if _HAS_IS_IMAGE_FORMAT else (lambda fmt: fmt.objectType() == _IMG_OBJECT)
+)
+
+
+def _extract_image_fmt(cur: QTextCursor):
     fmt = cur.charFormat()
-    if fmt is not None and (
-        (hasattr(fmt, "isImageFormat") and fmt.isImageFormat())
-        or fmt.objectType() == QTextFormat.ImageObject
-    ):
-        imgf = QTextImageFormat(fmt)
-        w = float(imgf.width() or 0.0)
-        h = float(imgf.height() or 0.0)
-        iw, ih = _qimage_dims(text_edit, imgf.name())
-        return {"cursor_pos": cur.position(), "name": imgf.name(), "w": w, "h": h, "iw": iw, "ih": ih}
-    # Try selecting next char (caret just before image)
-    c2 = QTextCursor(cur)
-    c2.movePosition(QTextCursor.Right, QTextCursor.KeepAnchor, 1)
-    fmt2 = c2.charFormat()
-    if fmt2 is not None and (
-        (hasattr(fmt2, "isImageFormat") and fmt2.isImageFormat())
-        or fmt2.objectType() == QTextFormat.ImageObject
-    ):
-        imgf = QTextImageFormat(fmt2)
-        w = float(imgf.width() or 0.0)
-        h = float(imgf.height() or 0.0)
-        iw, ih = _qimage_dims(text_edit, imgf.name())
-        return {"cursor_pos": cur.position(), "name": imgf.name(), "w": w, "h": h, "iw": iw, "ih": ih}
-    # Try selecting previous char (caret just after image)
-    c3 = QTextCursor(cur)
-    c3.movePosition(QTextCursor.Left, QTextCursor.KeepAnchor, 1)
-    fmt3 = c3.charFormat()
-    if fmt3 is not None and (
-        (hasattr(fmt3, "isImageFormat") and fmt3.isImageFormat())
-        or fmt3.objectType() == QTextFormat.ImageObject
-    ):
-        imgf = QTextImageFormat(fmt3)
-        w = float(imgf.width() or 0.0)
-        h = float(imgf.height() or 0.0)
-        iw, ih = _qimage_dims(text_edit, imgf.name())
-        # Use the start of the selection as the image position
-        pos = min(c3.position(), c3.anchor())
-        return {"cursor_pos": pos, "name": imgf.name(), "w": w, "h": h, "iw": iw, "ih": ih}
+    if _is_image_fmt(fmt):
+        return fmt.toImageFormat()
     return None
 
 
+def _image_info_dict(text_edit: QtWidgets.QTextEdit, pos: int, imgf, block: bool = True, base: str = None):
+    iw, ih = _qimage_dims(text_edit, imgf.name(), block=block, base=base)
+    return {
+        "cursor_pos": pos,
+        "name": imgf.name(),
+        "w": float(imgf.width() or 0.0),
+        "h": float(imgf.height() or 0.0),
+        "iw": iw,
+        "ih": ih,
+    }
+
+
 def _image_info_at_view_pos(text_edit: QtWidgets.QTextEdit, view_pos: QPoint):
     try:
         cur = text_edit.cursorForPosition(view_pos)
@@ -127,46 +267,26 @@ def _image_info_at_view_pos(text_edit: QtWidgets.QTextEdit, view_pos: QPoint):
         c2.movePosition(QTextCursor.Right)
         cands.append(c2)
         for c in cands:
-            fmt = c.charFormat()
-            if fmt is not None and (
-                (hasattr(fmt, "isImageFormat") and fmt.isImageFormat())
-                or fmt.objectType() == QTextFormat.ImageObject
-            ):
-                imgf = QTextImageFormat(fmt)
-                w = float(imgf.width() or 0.0)
-                h = float(imgf.height() or 0.0)
-                iw, ih = _qimage_dims(text_edit, imgf.name())
-                return {"cursor_pos": c.position(), "name": imgf.name(), "w": w, "h": h, "iw": iw, "ih": ih}
-            csel = QTextCursor(c)
-            csel.movePosition(QTextCursor.Right, QTextCursor.KeepAnchor, 1)
-            fmt2 = csel.charFormat()
-            if fmt2 is not None and (
-                (hasattr(fmt2, "isImageFormat") and fmt2.isImageFormat())
-                or fmt2.objectType() == QTextFormat.ImageObject
-            ):
-                imgf = QTextImageFormat(fmt2)
-                w = float(imgf.width() or 0.0)
-                h = float(imgf.height() or 0.0)
-                iw, ih = _qimage_dims(text_edit, imgf.name())
-                return {"cursor_pos": c.position(), "name": imgf.name(), "w": w, "h": h, "iw": iw, "ih": ih}
+            imgf = _extract_image_fmt(c)
+            if imgf is None:
+                csel = QTextCursor(c)
+                csel.movePosition(QTextCursor.Right, QTextCursor.KeepAnchor, 1)
+                imgf = _extract_image_fmt(csel)
+            if imgf is not None:
+                return _image_info_dict(text_edit, c.position(), imgf)
     except Exception:
         pass
     return None
 
 
 def _open_image_properties(text_edit: QtWidgets.QTextEdit, info: dict = None):
-    if info is None:
-        info = _image_info_at_cursor(text_edit)
-    if not info:
-        return
-    _image_properties_dialog_apply(text_edit, info)
-
-
-def _install_image_context_menu(text_edit: QtWidgets.QTextEdit):
-    # Defined later in the file using a robust handler class; this stub remains for
-    # backward compatibility if referenced before the full definition is parsed.
     try:
-        pass
+        if info is None:
+            info = _locate_image(text_edit)
+        if not info:
+            # No image nearby, do nothing
+            return
+        _image_properties_dialog_apply(text_edit, info)
     except Exception:
         pass
 
@@ -181,6 +301,13 @@ def install_image_support(text_edit: QtWidgets.QTextEdit):
             text_edit.viewport().setAcceptDrops(False)
     except Exception:
         pass
+    try:
+        text_edit._rt_window = text_edit.window()
+        if getattr(text_edit, "_rtWindowRefresher", None) is None:
+            text_edit._rtWindowRefresher = _WindowCacheRefresher(text_edit)
+            _route_events(text_edit, text_edit, text_edit._rtWindowRefresher, (QEvent.ParentChange,))
+    except Exception:
+        pass
     _install_image_context_menu(text_edit)
     try:
         _install_image_shortcuts(text_edit)
@@ -192,39 +319,95 @@ def install_image_support(text_edit: QtWidgets.QTextEdit):
 
 
 def _install_image_shortcuts(text_edit: QtWidgets.QTextEdit):
-    # Ctrl+Shift+I opens Image Properties; F2 as backup
-    sc1 = QtWidgets.QShortcut(QKeySequence("Ctrl+Shift+I"), text_edit)
+    # Ctrl+Shift+I opens Image Properties; F2 as backup. Installed once per editor:
+    # duplicate QShortcuts on the same keys are ambiguous and would never fire
+    if getattr(text_edit, "_imageShortcuts", None) is not None:
+        return
+    sc1 = QtWidgets.QShortcut(_KS_IMG_PROPS, text_edit)
     sc1.setContext(Qt.WidgetWithChildrenShortcut)
     sc1.activated.connect(lambda: _open_image_properties(text_edit))
-    sc2 = QtWidgets.QShortcut(QKeySequence("F2"), text_edit)
+    sc2 = QtWidgets.QShortcut(_KS_F2, text_edit)
     sc2.setContext(Qt.WidgetWithChildrenShortcut)
     sc2.activated.connect(lambda: _open_image_properties(text_edit))
+    text_edit._imageShortcuts = (sc1, sc2)
 
 
 # ----------------------------- HTML Source dialog -----------------------------
+# Character classes for _HtmlHighlighter's attribute-name scan
+_HL_NAME_START = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz_:")
+_HL_NAME_CHARS = _HL_NAME_START | frozenset("-0123456789.")
+
+
 class _HtmlHighlighter(QSyntaxHighlighter):
+    # (tag, attr, string) formats, built once and shared by every source dialog
+    _formats = None
+
     def __init__(self, doc):
         super().__init__(doc)
-        self._fmt_tag = _QTextCharFormat()
-        self._fmt_tag.setForeground(QColor("#0033aa"))
-        self._fmt_attr = _QTextCharFormat()
-        self._fmt_attr.setForeground(QColor("#aa5500"))
-        self._fmt_str = _QTextCharFormat()
-        self._fmt_str.setForeground(QColor("#228822"))
+        if _HtmlHighlighter._formats is None:
+            fmts = []
+            for color in ("#0033aa", "#aa5500", "#228822"):
+                f = _QTextCharFormat()
+                f.setForeground(QColor(color))
+                fmts.append(f)
+            _HtmlHighlighter._formats = tuple(fmts)
+        self._fmt_tag, self._fmt_attr, self._fmt_str = _HtmlHighlighter._formats
 
     def highlightBlock(self, text: str):
-        # Tags
-        for m in re.finditer(r"<[^>]+>", text):
-            self.setFormat(m.start(), m.end() - m.start(), self._fmt_tag)
-            inner = text[m.start():m.end()]
-            # Attributes inside tag
-            for a in re.finditer(r"\b([A-Za-z_:][-A-Za-z0-9_:.]*)\s*=\s*(\"[^\"]*\"|'[^']*')", inner):
-                a_start = m.start() + a.start(1)
-                a_len = len(a.group(1))
-                self.setFormat(a_start, a_len, self._fmt_attr)
-                s_start = m.start() + a.start(2)
-                s_len = len(a.group(2))
-                self.setFormat(s_start, s_len, self._fmt_str)
+        # Hand-written scan instead of per-tag regexes: find each <...> tag, then its
+        # name="value" / name='value' attributes. Same matches as <[^>]+> and the old
+        # attribute pattern.
+        setFormat = self.setFormat
+        fmt_tag = self._fmt_tag
+        fmt_attr = self._fmt_attr
+        fmt_str = self._fmt_str
+        find = text.find
+        name_start = _HL_NAME_START
+        name_chars = _HL_NAME_CHARS
+        pos = 0
+        while True:
+            start = find("<", pos)
+            if start < 0:
+                return
+            end = find(">", start + 1)
+            if end < 0:
+                return
+            if end == start + 1:
+                # "<>" is not a tag
+                pos = end
+                continue
+            setFormat(start, end + 1 - start, fmt_tag)
+            # Attributes inside tag: anchor on each '=' and walk back to the name
+            lo = start + 1
+            eq = find("=", lo, end)
+            while eq >= 0:
+                name_end = eq
+                while name_end > lo and text[name_end - 1].isspace():
+                    name_end -= 1
+                p = name_end
+                while p > lo and text[p - 1] in name_chars:
+                    p -= 1
+                # Leftmost name start on a word boundary (':' is a non-word char)
+                while p < name_end:
+                    ch = text[p]
+                    if ch in name_start:
+                        prev = text[p - 1]
+                        if (prev.isalnum() or prev == "_") != (ch != ":"):
+                            break
+                    p += 1
+                q = eq + 1
+                while text[q].isspace():
+                    q += 1
+                quote = text[q]
+                close = find(quote, q + 1, end) if quote == '"' or quote == "'" else -1
+                if p < name_end and close >= 0:
+                    setFormat(p, name_end - p, fmt_attr)
+                    setFormat(q, close + 1 - q, fmt_str)
+                    lo = close + 1
+                    eq = find("=", lo, end)
+                else:
+                    eq = find("=", eq + 1, end)
+            pos = end + 1
 
 
 def _reapply_base_url(text_edit: QtWidgets.QTextEdit):
@@ -243,10 +426,7 @@ def _open_html_source_dialog(text_edit: QtWidgets.QTextEdit):
     dlg.resize(800, 600)
     v = QtWidgets.QVBoxLayout(dlg)
     edit = QtWidgets.QPlainTextEdit(dlg)
-    try:
-        f = edit.font(); f.setFamily("Consolas"); f.setPointSize(10); edit.setFont(f)
-    except Exception:
-        pass
+    f = edit.font(); f.setFamily("Consolas"); f.setPointSize(10); edit.setFont(f)
     # Load current HTML
     try:
         html = text_edit.document().toHtml()
@@ -259,7 +439,7 @@ def _open_html_source_dialog(text_edit: QtWidgets.QTextEdit):
     except Exception:
         pass
     v.addWidget(edit)
-    btns = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.Ok | QtWidgets.QDialogButtonBox.Cancel, parent=dlg)
+    btns = QtWidgets.QDialogButtonBox(_OK_CANCEL, parent=dlg)
     v.addWidget(btns)
 
     def _apply():
@@ -274,6 +454,11 @@ def _open_html_source_dialog(text_edit: QtWidgets.QTextEdit):
     btns.accepted.connect(_apply)
     btns.rejected.connect(dlg.reject)
     dlg.exec_()
+    # The dialog is parented to the editor; without this every opened source view
+    # (its document copy and highlighter) would live as long as the editor
+    dlg.deleteLater()
+
+
 class _ImagePropertiesDialog(QtWidgets.QDialog):
     def __init__(self, parent, src_name: str, current_w: float, current_h: float, intrinsic_w: int, intrinsic_h: int, current_align: str):
         super().__init__(parent)
@@ -315,8 +500,13 @@ class _ImagePropertiesDialog(QtWidgets.QDialog):
                     self.lbl_height.setText("Height: (auto)")
             else:
                 self.lbl_height.setText("")
-        self.sp_width.valueChanged.connect(lambda _v: _refresh_h())
-        self.cb_keep.toggled.connect(lambda _v: _refresh_h())
+        # Coalesce spinbox ticks so dragging doesn't relayout the label every step
+        self._refresh_timer = QTimer(self)
+        self._refresh_timer.setSingleShot(True)
+        self._refresh_timer.setInterval(30)
+        self._refresh_timer.timeout.connect(_refresh_h)
+        self.sp_width.valueChanged.connect(lambda _v: self._refresh_timer.start())
+        self.cb_keep.toggled.connect(lambda _v: self._refresh_timer.start())
         _refresh_h()
         layout.addRow("Width (px):", self.sp_width)
         layout.addRow("", self.cb_keep)
@@ -324,7 +514,7 @@ class _ImagePropertiesDialog(QtWidgets.QDialog):
         layout.addRow("Alt:", self.le_alt)
         layout.addRow("Title:", self.le_title)
         layout.addRow("Alignment:", self.combo_align)
-        btns = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.Ok | QtWidgets.QDialogButtonBox.Cancel, parent=self)
+        btns = QtWidgets.QDialogButtonBox(_OK_CANCEL, parent=self)
         layout.addRow(btns)
         btns.accepted.connect(self.accept)
         btns.rejected.connect(self.reject)
@@ -335,35 +525,30 @@ class _ImagePropertiesDialog(QtWidgets.QDialog):
         return w, align, self.cb_keep.isChecked(), self.le_alt.text().strip(), self.le_title.text().strip()
 
 
+# Image block alignment choices from the properties dialog
+_ALIGN_MAP = {"left": Qt.AlignLeft, "center": Qt.AlignHCenter, "right": Qt.AlignRight}
+
+
 def _apply_block_alignment_for_image(text_edit: QtWidgets.QTextEdit, cursor_pos: int, align: str):
-    try:
-        c = QTextCursor(text_edit.document())
-        c.setPosition(int(cursor_pos))
-        blk = c.block()
-        bf = blk.blockFormat()
-        a = align.lower() if isinstance(align, str) else "none"
-        if a == "none":
-            return  # leave as-is
-        if a == "left":
-            bf.setAlignment(Qt.AlignLeft)
-        elif a == "center":
-            bf.setAlignment(Qt.AlignHCenter)
-        elif a == "right":
-            bf.setAlignment(Qt.AlignRight)
-        else:
-            bf.setAlignment(Qt.AlignLeft)
-        c.setBlockFormat(bf)
-    except Exception:
-        pass
+    a = align.lower() if isinstance(align, str) else "none"
+    if a == "none":
+        return  # leave as-is
+    c = QTextCursor(text_edit.document())
+    c.setPosition(int(cursor_pos))
+    bf = c.block().blockFormat()
+    bf.setAlignment(_ALIGN_MAP.get(a, Qt.AlignLeft))
+    c.setBlockFormat(bf)
 
 
 def _image_properties_dialog_apply(text_edit: QtWidgets.QTextEdit, info: dict):
-    # Determine current alignment from block
+    # Determine current alignment from block; the cursor is reused to apply the result
+    cur = None
     try:
+        pos = int(info.get("cursor_pos", 0))
         cur = QTextCursor(text_edit.document())
-        cur.setPosition(int(info.get("cursor_pos", 0)))
-        blk = cur.block()
-        current_align = "center" if blk.blockFormat().alignment() & Qt.AlignHCenter else ("right" if blk.blockFormat().alignment() & Qt.AlignRight else "left")
+        cur.setPosition(pos)
+        align_flags = cur.block().blockFormat().alignment()
+        current_align = "center" if align_flags & Qt.AlignHCenter else ("right" if align_flags & Qt.AlignRight else "left")
     except Exception:
         current_align = "left"
     dlg = _ImagePropertiesDialog(text_edit, info.get("name"), info.get("w"), info.get("h"), info.get("iw") or 0, info.get("ih") or 0, current_align)  # (Removed legacy _table_recalculate_formulas after formula feature rollback.)
@@ -383,26 +568,22 @@ def _image_properties_dialog_apply(text_edit: QtWidgets.QTextEdit, info: dict):
         # If not keeping ratio, fall back to proportional based on current dims
         ratio = (float(cur_h) / float(cur_w)) if cur_w else 1.0
         new_h = max(1.0, float(new_w) * ratio)
-    _apply_image_properties(text_edit, info["cursor_pos"], info["name"], float(new_w), float(new_h), alt_txt, title_txt)
+    _apply_image_properties(text_edit, info["cursor_pos"], info["name"], float(new_w), float(new_h), alt_txt, title_txt, cursor=cur)
     if (new_align or "none").lower() != "none":
         _apply_block_alignment_for_image(text_edit, info["cursor_pos"], new_align)
 
 
+# Attribute-value escaping for hand-built <img>/<a> markup
+_HTML_ESCAPE_TABLE = str.maketrans({"&": "&amp;", "\"": "&quot;", "<": "&lt;", ">": "&gt;"})
+
+
 def _html_escape(s: str) -> str:
-    try:
-        s = s.replace("&", "&amp;")
-        s = s.replace("\"", "&quot;")
-        s = s.replace("<", "&lt;")
-        s = s.replace(">", "&gt;")
-        return s
-    except Exception:
-        return s
+    return s.translate(_HTML_ESCAPE_TABLE) if s else s
 
 
-def _apply_image_properties(text_edit: QtWidgets.QTextEdit, cursor_pos: int, name: str, w: float, h: float, alt_txt: str, title_txt: str):
+def _apply_image_properties(text_edit: QtWidgets.QTextEdit, cursor_pos: int, name: str, w: float, h: float, alt_txt: str, title_txt: str, cursor: QTextCursor = None):
     try:
-        doc = text_edit.document()
-        c = QTextCursor(doc)
+        c = cursor if cursor is not None else QTextCursor(text_edit.document())
         c.setPosition(int(cursor_pos))
         # Select object replacement char if present
         c.movePosition(QTextCursor.Right, QTextCursor.KeepAnchor, 1)
@@ -411,19 +592,22 @@ def _apply_image_properties(text_edit: QtWidgets.QTextEdit, cursor_pos: int, nam
         except Exception:
             pass
         # Build HTML img tag with attributes
-        src_attr = f'src="{_html_escape(name)}"' if name else ""
-        w_attr = f' width="{int(max(1.0, w))}"' if w else ""
-        h_attr = f' height="{int(max(1.0, h))}"' if h else ""
-        alt_attr = f' alt="{_html_escape(alt_txt)}"' if alt_txt else ""
-        title_attr = f' title="{_html_escape(title_txt)}"' if title_txt else ""
-        html = f'<img {src_attr}{w_attr}{h_attr}{(" " + alt_attr) if alt_attr else ""}{(" " + title_attr) if title_attr else ""} />'
-        c.insertHtml(html)
+        parts = ["<img"]
+        if name:
+            parts.append(f'src="{_html_escape(name)}"')
+        if w:
+            parts.append(f'width="{int(max(1.0, w))}"')
+        if h:
+            parts.append(f'height="{int(max(1.0, h))}"')
+        if alt_txt:
+            parts.append(f'alt="{_html_escape(alt_txt)}"')
+        if title_txt:
+            parts.append(f'title="{_html_escape(title_txt)}"')
+        parts.append("/>")
+        c.insertHtml(" ".join(parts))
     except Exception:
         # Fallback to size-only application
         _apply_image_size_at(text_edit, cursor_pos, name, w, h)
-import os
-import tempfile
-import imghdr
 
 # Safe checks for deleted Qt objects (helps prevent native crashes)
 def _is_alive(obj) -> bool:
@@ -445,22 +629,39 @@ def _is_alive(obj) -> bool:
         return False
 
 # Feature flag: allow disabling image resize overlay via environment for diagnostics
+# Cached result of _is_image_resize_enabled(); None until first read
+_IMAGE_RESIZE_ENABLED = None
+
+
+def _reset_image_resize_flag():
+    """Forget the cached flag so the next check re-reads the environment."""
+    global _IMAGE_RESIZE_ENABLED
+    _IMAGE_RESIZE_ENABLED = None
+
+
 def _is_image_resize_enabled() -> bool:
     """Feature flag for experimental image-resize overlay.
 
     Default: OFF (opt-in). Enable by setting NOTEBOOK_ENABLE_IMAGE_RESIZE=1.
     You can still force-disable with NOTEBOOK_DISABLE_IMAGE_RESIZE=1.
+    The environment is read once; call _reset_image_resize_flag() after changing it.
     """
+    global _IMAGE_RESIZE_ENABLED
+    if _IMAGE_RESIZE_ENABLED is not None:
+        return _IMAGE_RESIZE_ENABLED
     try:
         # Hard disable has priority
         v_disable = os.environ.get("NOTEBOOK_DISABLE_IMAGE_RESIZE", "0").strip().lower()
         if v_disable in ("1", "true", "yes"):
-            return False
-        # Opt-in enable
-        v_enable = os.environ.get("NOTEBOOK_ENABLE_IMAGE_RESIZE", "0").strip().lower()
-        return v_enable in ("1", "true", "yes")
+            enabled = False
+        else:
+            # Opt-in enable
+            v_enable = os.environ.get("NOTEBOOK_ENABLE_IMAGE_RESIZE", "0").strip().lower()
+            enabled = v_enable in ("1", "true", "yes")
     except Exception:
-        return False
+        enabled = False
+    _IMAGE_RESIZE_ENABLED = enabled
+    return enabled
 
 
 def _ensure_layout(widget: QtWidgets.QWidget) -> QtWidgets.QVBoxLayout:
@@ -481,9 +682,52 @@ DEFAULT_VIDEO_LONG_SIDE = 400  # px; default long side for video thumbnails (can
 # List scheme configuration (can be changed at runtime from main menu)
 _ORDERED_SCHEME = "classic"  # 'classic' or 'decimal'
 _UNORDERED_SCHEME = "disc-circle-square"  # 'disc-circle-square' or 'disc-only'
+# Per-scheme style cycles; nesting level N uses entry (N-1) % len(cycle)
+_ORDERED_TABLES = {
+    # 'classic': I, A, 1, a, i (repeat)
+    "classic": (
+        QTextListFormat.ListUpperRoman,
+        QTextListFormat.ListUpperAlpha,
+        QTextListFormat.ListDecimal,
+        QTextListFormat.ListLowerAlpha,
+        QTextListFormat.ListLowerRoman,
+    ),
+    "decimal": (QTextListFormat.ListDecimal,),
+}
+_UNORDERED_TABLES = {
+    "disc-circle-square": (
+        QTextListFormat.ListDisc,
+        QTextListFormat.ListCircle,
+        QTextListFormat.ListSquare,
+    ),
+    "disc-only": (QTextListFormat.ListDisc,),
+}
+_ORDERED_ACTIVE_TABLE = _ORDERED_TABLES[_ORDERED_SCHEME]
+_UNORDERED_ACTIVE_TABLE = _UNORDERED_TABLES[_UNORDERED_SCHEME]
+
 
+# Rendered toolbar icons, shared across toolbars: keyed by kind alone for the default
+# size/colour, otherwise by (kind, width, height, fg rgba)
+_ICON_CACHE = {}
+_ICON_SIZE = QSize(24, 24)
+_ICON_FG = QColor("#303030")
 
-def _make_icon(kind: str, size: QSize = QSize(24, 24), fg: QColor = QColor("#303030")) -> QIcon:
+# Blank typing format for "Clear formatting" (setCurrentCharFormat copies it)
+_EMPTY_CHAR_FMT = QTextCharFormat()
+
+
+def _make_icon(kind: str, size: QSize = _ICON_SIZE, fg: QColor = _ICON_FG) -> QIcon:
+    if size is _ICON_SIZE and fg is _ICON_FG:
+        key = kind
+    else:
+        key = (kind, size.width(), size.height(), int(fg.rgba()))
+    icon = _ICON_CACHE.get(key)
+    if icon is None:
+        icon = _ICON_CACHE[key] = _build_icon_uncached(kind, size, fg)
+    return icon
+
+
+def _build_icon_uncached(kind: str, size: QSize, fg: QColor) -> QIcon:
     pm = QPixmap(size)
     pm.fill(Qt.transparent)
     p = QPainter(pm)
@@ -499,8 +743,6 @@ def _make_icon(kind: str, size: QSize = QSize(24, 24), fg: QColor = QColor("#303
         f.setItalic(italic)
         f.setPointSizeF(max(8.0, h * 0.48))
         p.setFont(f)
-        metrics = QtWidgets.QStyleOption().fontMetrics
-        # Fallback: draw centered
         rect = QRect(2, 2, w - 4, h - 4)
         p.drawText(rect, Qt.AlignCenter, txt)
         if underline:
@@ -644,6 +886,31 @@ def _make_icon(kind: str, size: QSize = QSize(24, 24), fg: QColor = QColor("#303
     return QIcon(pm)
 
 
+# Horizontal rule: a full-width table with an inline top border. Inline CSS keeps
+# the styling through HTML save/reload.
+_HR_HTML = (
+    '<table width="100%" cellpadding="0" cellspacing="0" border="0" '
+    'style="border-collapse: collapse;">'
+    '<tr><td style="border-top: 1px solid #000000; padding: 0; height: 1px;"></td></tr>'
+    '</table><p></p>'
+)
+
+
+def _insert_horizontal_rule(text_edit: QtWidgets.QTextEdit):
+    cur = text_edit.textCursor()
+    cur.beginEditBlock()
+    try:
+        # Collapse selection and move to block boundary so the rule is on its own line
+        if cur.hasSelection():
+            pos = max(cur.position(), cur.anchor())
+            cur.setPosition(pos)
+        if cur.positionInBlock() != 0:
+            cur.insertBlock()
+        cur.insertHtml(_HR_HTML)
+    finally:
+        cur.endEditBlock()
+
+
 def add_rich_text_toolbar(
     parent_tab: QtWidgets.QWidget,
     text_edit: QtWidgets.QTextEdit,
@@ -685,8 +952,7 @@ def add_rich_text_toolbar(
     toolbar.addSeparator()
 
     # Bold/Italic/Underline/Strike
-    def toggle_format(flag_attr: str, on: bool):
-        fmt = QTextCharFormat()
+    def _set_flag(fmt, flag_attr: str, on: bool):
         if flag_attr == "bold":
             fmt.setFontWeight(QFont.Bold if on else QFont.Normal)
         elif flag_attr == "italic":
@@ -695,38 +961,55 @@ def add_rich_text_toolbar(
             fmt.setFontUnderline(on)
         elif flag_attr == "strike":
             fmt.setFontStrikeOut(on)
+
+    def toggle_format_batch(fmt_patch: dict):
+        # One template carrying every requested flag, merged once over the selection
+        fmt = QTextCharFormat()
+        for flag_attr, on in fmt_patch.items():
+            _set_flag(fmt, flag_attr, on)
         cursor = text_edit.textCursor()
-        if not cursor.hasSelection():
-            # Apply to current word/cursor moving forward
-            cursor.select(cursor.WordUnderCursor)
+        if cursor.hasSelection():
+            # The merge already updates the selected text; the typing format follows it
+            cursor.mergeCharFormat(fmt)
+            return
+        # Apply to current word/cursor moving forward
+        cur_fmt = text_edit.currentCharFormat()
+        for flag_attr, on in fmt_patch.items():
+            _set_flag(cur_fmt, flag_attr, on)
+        cursor.select(cursor.WordUnderCursor)
         cursor.mergeCharFormat(fmt)
-        text_edit.mergeCurrentCharFormat(fmt)
+        # Typing format: flip just these attributes instead of a second document merge.
+        # Safe only without a selection, where setCurrentCharFormat touches no text
+        text_edit.setCurrentCharFormat(cur_fmt)
+
+    def toggle_format(flag_attr: str, on: bool):
+        toggle_format_batch({flag_attr: on})
 
     act_bold = QtWidgets.QAction(_make_icon("bold"), "", toolbar)
     act_bold.setCheckable(True)
     act_bold.setShortcut(QKeySequence.Bold)
     act_bold.setToolTip("Bold (Ctrl+B)")
-    act_bold.triggered.connect(lambda on: toggle_format("bold", on))
+    act_bold.triggered.connect(partial(toggle_format, "bold"))
     toolbar.addAction(act_bold)
 
     act_italic = QtWidgets.QAction(_make_icon("italic"), "", toolbar)
     act_italic.setCheckable(True)
     act_italic.setShortcut(QKeySequence.Italic)
     act_italic.setToolTip("Italic (Ctrl+I)")
-    act_italic.triggered.connect(lambda on: toggle_format("italic", on))
+    act_italic.triggered.connect(partial(toggle_format, "italic"))
     toolbar.addAction(act_italic)
 
     act_underline = QtWidgets.QAction(_make_icon("underline"), "", toolbar)
     act_underline.setCheckable(True)
     act_underline.setShortcut(QKeySequence.Underline)
     act_underline.setToolTip("Underline (Ctrl+U)")
-    act_underline.triggered.connect(lambda on: toggle_format("underline", on))
+    act_underline.triggered.connect(partial(toggle_format, "underline"))
     toolbar.addAction(act_underline)
 
     act_strike = QtWidgets.QAction(_make_icon("strike"), "", toolbar)
     act_strike.setCheckable(True)
     act_strike.setToolTip("Strikethrough")
-    act_strike.triggered.connect(lambda on: toggle_format("strike", on))
+    act_strike.triggered.connect(partial(toggle_format, "strike"))
     toolbar.addAction(act_strike)
 
     toolbar.addSeparator()
@@ -734,11 +1017,8 @@ def add_rich_text_toolbar(
     # Font family and size
     font_box = QtWidgets.QFontComboBox(toolbar)
     # Make the font family control more compact horizontally
-    try:
-        font_box.setMaximumWidth(140)
-        font_box.setMinimumContentsLength(8)
-    except Exception:
-        pass
+    font_box.setMaximumWidth(140)
+    font_box.setMinimumContentsLength(8)
     # Signal connection moved to later in setup to use guarded wrapper
     font_box.setToolTip("Font family")
     toolbar.addWidget(font_box)
@@ -747,26 +1027,19 @@ def add_rich_text_toolbar(
     for sz in [8, 9, 10, 11, 12, 14, 16, 18, 20, 24, 28, 32]:
         size_box.addItem(str(sz), sz)
     size_box.setEditable(False)
-    try:
-        size_box.setMaximumWidth(72)
-    except Exception:
-        pass
+    size_box.setMaximumWidth(72)
     # Signal connection moved to later in setup to use guarded wrapper
     size_box.setToolTip("Font size")
     toolbar.addWidget(size_box)
 
     # Apply default font family and size for new content (does not overwrite existing styled HTML)
-    try:
-        text_edit.document().setDefaultFont(QFont(DEFAULT_FONT_FAMILY, DEFAULT_FONT_SIZE_PT))
-        # Reflect defaults in the pickers
-        font_box.setCurrentFont(QFont(DEFAULT_FONT_FAMILY))
-        # Ensure the size combo selects the default size if present
-        for i in range(size_box.count()):
-            if int(size_box.itemData(i)) == int(DEFAULT_FONT_SIZE_PT):
-                size_box.setCurrentIndex(i)
-                break
-    except Exception:
-        pass
+    text_edit.document().setDefaultFont(QFont(DEFAULT_FONT_FAMILY, DEFAULT_FONT_SIZE_PT))
+    # Reflect defaults in the pickers
+    font_box.setCurrentFont(QFont(DEFAULT_FONT_FAMILY))
+    # Ensure the size combo selects the default size if present
+    idx = size_box.findData(int(DEFAULT_FONT_SIZE_PT))
+    if idx >= 0:
+        size_box.setCurrentIndex(idx)
 
     toolbar.addSeparator()
 
@@ -774,32 +1047,23 @@ def add_rich_text_toolbar(
     btn_color = QtWidgets.QToolButton(toolbar)
     btn_color.setText("A")
     btn_color.setToolTip("Text color")
-    btn_color.clicked.connect(lambda: _apply_text_color(text_edit, foreground=True))
-    try:
-        btn_color.setFixedSize(24, 24)
-    except Exception:
-        pass
+    btn_color.clicked.connect(partial(_apply_text_color, text_edit, foreground=True))
+    btn_color.setFixedSize(24, 24)
     toolbar.addWidget(btn_color)
 
     btn_bg = QtWidgets.QToolButton(toolbar)
     btn_bg.setText("Bg")
     btn_bg.setToolTip("Highlight")
-    btn_bg.clicked.connect(lambda: _apply_text_color(text_edit, foreground=False))
-    try:
-        btn_bg.setFixedSize(24, 24)
-    except Exception:
-        pass
+    btn_bg.clicked.connect(partial(_apply_text_color, text_edit, foreground=False))
+    btn_bg.setFixedSize(24, 24)
     toolbar.addWidget(btn_bg)
 
     # Clear only background highlight (keep bold/italic/etc.)
     btn_bg_clear = QtWidgets.QToolButton(toolbar)
     btn_bg_clear.setText("NoBg")
     btn_bg_clear.setToolTip("Remove highlight (background)")
-    btn_bg_clear.clicked.connect(lambda: _clear_background(text_edit))
-    try:
-        btn_bg_clear.setFixedSize(28, 24)
-    except Exception:
-        pass
+    btn_bg_clear.clicked.connect(partial(_clear_background, text_edit))
+    btn_bg_clear.setFixedSize(28, 24)
     toolbar.addWidget(btn_bg_clear)
 
     toolbar.addSeparator()
@@ -815,91 +1079,62 @@ def add_rich_text_toolbar(
     act_align_right.setToolTip("Align Right")
     act_align_justify = QtWidgets.QAction(_make_icon("align_justify"), "", toolbar, checkable=True)
     act_align_justify.setToolTip("Justify")
-    for a in (act_align_left, act_align_center, act_align_right, act_align_justify):
+    for a, flag in (
+        (act_align_left, Qt.AlignLeft),
+        (act_align_center, Qt.AlignHCenter),
+        (act_align_right, Qt.AlignRight),
+        (act_align_justify, Qt.AlignJustify),
+    ):
+        a.setData(int(flag))
         group_align.addAction(a)
         toolbar.addAction(a)
-    act_align_left.triggered.connect(lambda: text_edit.setAlignment(Qt.AlignLeft))
-    act_align_center.triggered.connect(lambda: text_edit.setAlignment(Qt.AlignHCenter))
-    act_align_right.triggered.connect(lambda: text_edit.setAlignment(Qt.AlignRight))
-    act_align_justify.triggered.connect(lambda: text_edit.setAlignment(Qt.AlignJustify))
+    # One connection for the whole group; each action carries its flag
+    group_align.triggered.connect(lambda a: text_edit.setAlignment(Qt.Alignment(a.data())))
 
     toolbar.addSeparator()
 
     # Lists
     act_bullets = toolbar.addAction(
-        _make_icon("list_bullets"), "", lambda: _toggle_list(text_edit, ordered=False)
+        _make_icon("list_bullets"), "", partial(_toggle_list, text_edit, ordered=False)
     )
     act_bullets.setToolTip("Bulleted list")
     act_numbers = toolbar.addAction(
-        _make_icon("list_numbers"), "", lambda: _toggle_list(text_edit, ordered=True)
+        _make_icon("list_numbers"), "", partial(_toggle_list, text_edit, ordered=True)
     )
     act_numbers.setToolTip("Numbered list")
 
     # Indent/Outdent for list nesting
     act_indent = toolbar.addAction(
-        _make_icon("indent"), "", lambda: _change_list_indent(text_edit, +1)
+        _make_icon("indent"), "", partial(_change_list_indent, text_edit, delta=+1)
     )
-    act_indent.setShortcut(QKeySequence("Ctrl+]"))
-    try:
+    act_indent.setShortcut(_KS_INDENT)
+    if _HAS_SHORTCUT_CTX:
         act_indent.setShortcutContext(Qt.WidgetWithChildrenShortcut)
-    except Exception:
-        pass
     act_indent.setToolTip("Indent (Tab, Ctrl+])")
     act_outdent = toolbar.addAction(
-        _make_icon("outdent"), "", lambda: _change_list_indent(text_edit, -1)
+        _make_icon("outdent"), "", partial(_change_list_indent, text_edit, delta=-1)
     )
-    act_outdent.setShortcut(QKeySequence("Ctrl["))
-    try:
+    act_outdent.setShortcut(_KS_OUTDENT)
+    if _HAS_SHORTCUT_CTX:
         act_outdent.setShortcutContext(Qt.WidgetWithChildrenShortcut)
-    except Exception:
-        pass
     act_outdent.setToolTip("Outdent (Shift+Tab, Ctrl+[)")
 
-    # Enable Tab/Shift+Tab to control list levels
-    _install_list_tab_handler(text_edit)
-    # Enable table cell Tab navigation
-    _install_table_tab_handler(text_edit)
-    # Enable plain paragraph indent/outdent with Tab/Shift+Tab when not in lists/tables
-    _install_plain_indent_tab_handler(text_edit)
+    # Tab/Shift+Tab: table cell navigation, list levels, and plain paragraph indent/outdent;
+    # Ctrl+V: honor Default Paste Mode without relying on a window-level shortcut
+    _install_rich_text_event_filter(text_edit)
 
     # Disable drag-and-drop into the editor per current requirements
-    try:
-        text_edit.setAcceptDrops(False)
-        if hasattr(text_edit, "viewport") and text_edit.viewport() is not None:
-            text_edit.viewport().setAcceptDrops(False)
-    except Exception:
-        pass
+    text_edit.setAcceptDrops(False)
+    text_edit.viewport().setAcceptDrops(False)
 
     toolbar.addSeparator()
 
     # Clear formatting, HR, Insert image/video
     act_clear = toolbar.addAction(
-        _make_icon("color"), "", lambda: text_edit.setCurrentCharFormat(QTextCharFormat())
+        _make_icon("color"), "", partial(text_edit.setCurrentCharFormat, _EMPTY_CHAR_FMT)
     )
     act_clear.setToolTip("Clear formatting")
-    def _insert_horizontal_rule():
-        cur = text_edit.textCursor()
-        cur.beginEditBlock()
-        try:
-            # Collapse selection and move to block boundary so the rule is on its own line
-            if cur.hasSelection():
-                pos = max(cur.position(), cur.anchor())
-                cur.setPosition(pos)
-            if cur.positionInBlock() != 0:
-                cur.insertBlock()
-            # Insert a full-width table with inline style for the top border
-            # Using inline CSS ensures the styling persists through HTML save/reload
-            hr_html = (
-                '<table width="100%" cellpadding="0" cellspacing="0" border="0" '
-                'style="border-collapse: collapse;">'
-                '<tr><td style="border-top: 1px solid #000000; padding: 0; height: 1px;"></td></tr>'
-                '</table><p></p>'
-            )
-            cur.insertHtml(hr_html)
-        finally:
-            cur.endEditBlock()
-
-    act_hr = toolbar.addAction(_make_icon("hr"), "", _insert_horizontal_rule)
+    act_hr = toolbar.addAction(_make_icon("hr"), "", partial(_insert_horizontal_rule, text_edit))
     act_hr.setToolTip("Insert horizontal rule")
     # Image insert: split-button with dropdown for sizing modes
     btn_img = QtWidgets.QToolButton(toolbar)
@@ -908,29 +1143,37 @@ def add_rich_text_toolbar(
     # Open the menu on any click (no direct action)
     btn_img.setPopupMode(QtWidgets.QToolButton.InstantPopup)
     img_menu = QtWidgets.QMenu(btn_img)
-    try:
-        act_def = img_menu.addAction(f"Use default ({int(DEFAULT_IMAGE_LONG_SIDE)} px)…")
-    except Exception:
-        act_def = img_menu.addAction("Use default size…")
-    act_fit = img_menu.addAction("Fit to editor width…")
-    act_orig = img_menu.addAction("Original size…")
-    act_cust = img_menu.addAction("Custom width…")
 
-    def _choose_custom_and_insert():
+    # Menu entries are built on first open; most sessions never use this dropdown
+    def _populate_img_menu():
+        if img_menu.property("populated"):
+            return
+        img_menu.setProperty("populated", True)
         try:
-            w, ok = QtWidgets.QInputDialog.getInt(
-                toolbar, "Insert Image", "Width (px):", int(DEFAULT_IMAGE_LONG_SIDE), 50, 8000, 10
-            )
-            if not ok:
-                return
-            _insert_image_via_dialog(text_edit, mode="custom", custom_width=float(w))
+            act_def = img_menu.addAction(f"Use default ({int(DEFAULT_IMAGE_LONG_SIDE)} px)…")
         except Exception:
-            pass
+            act_def = img_menu.addAction("Use default size…")
+        act_fit = img_menu.addAction("Fit to editor width…")
+        act_orig = img_menu.addAction("Original size…")
+        act_cust = img_menu.addAction("Custom width…")
 
-    act_def.triggered.connect(lambda: _insert_image_via_dialog(text_edit, mode="default"))
-    act_fit.triggered.connect(lambda: _insert_image_via_dialog(text_edit, mode="fit-width"))
-    act_orig.triggered.connect(lambda: _insert_image_via_dialog(text_edit, mode="original"))
-    act_cust.triggered.connect(_choose_custom_and_insert)
+        def _choose_custom_and_insert():
+            try:
+                w, ok = QtWidgets.QInputDialog.getInt(
+                    toolbar, "Insert Image", "Width (px):", int(DEFAULT_IMAGE_LONG_SIDE), 50, 8000, 10
+                )
+                if not ok:
+                    return
+                _insert_image_via_dialog(text_edit, mode="custom", custom_width=float(w))
+            except Exception:
+                pass
+
+        act_def.triggered.connect(partial(_insert_image_via_dialog, text_edit, mode="default"))
+        act_fit.triggered.connect(partial(_insert_image_via_dialog, text_edit, mode="fit-width"))
+        act_orig.triggered.connect(partial(_insert_image_via_dialog, text_edit, mode="original"))
+        act_cust.triggered.connect(_choose_custom_and_insert)
+
+    img_menu.aboutToShow.connect(_populate_img_menu)
     btn_img.setMenu(img_menu)
     toolbar.addWidget(btn_img)
     # Video insert: split-button with options
@@ -939,66 +1182,89 @@ def add_rich_text_toolbar(
     btn_vid.setToolTip("Insert video from file")
     btn_vid.setPopupMode(QtWidgets.QToolButton.InstantPopup)
     vid_menu = QtWidgets.QMenu(btn_vid)
-    # Sizing section (mirrors image sizing semantics)
-    try:
-        act_vsz_def = vid_menu.addAction(f"Size: Default ({int(DEFAULT_IMAGE_LONG_SIDE)} px long side)")
-    except Exception:
-        act_vsz_def = vid_menu.addAction("Size: Default")
-    act_vsz_fit = vid_menu.addAction("Size: Fit editor width")
-    act_vsz_orig = vid_menu.addAction("Size: Original")
-    act_vsz_custom = vid_menu.addAction("Size: Custom width…")
-    vid_menu.addSeparator()
-    # Capture time section
-    act_v1 = vid_menu.addAction("Frame at 1.0s…")
-    act_v3 = vid_menu.addAction("Frame at 3.0s…")
-    act_v5 = vid_menu.addAction("Frame at 5.0s…")
-    act_vc = vid_menu.addAction("Custom time…")
-    vid_menu.addSeparator()
-    act_vs = vid_menu.addAction("Use synthetic placeholder…")
-
-    def _choose_custom_video_time():
+
+    def _populate_vid_menu():
+        if vid_menu.property("populated"):
+            return
+        vid_menu.setProperty("populated", True)
+        # Sizing section (mirrors image sizing semantics)
         try:
-            secs, ok = QtWidgets.QInputDialog.getDouble(toolbar, "Insert Video", "Capture time (seconds):", 1.0, 0.0, 36000.0, 1)
-            if not ok:
-                return
-            _insert_video_via_dialog(text_edit, capture_seconds=float(secs), force_synthetic=False)
+            act_vsz_def = vid_menu.addAction(f"Size: Default ({int(DEFAULT_IMAGE_LONG_SIDE)} px long side)")
         except Exception:
-            pass
+            act_vsz_def = vid_menu.addAction("Size: Default")
+        act_vsz_fit = vid_menu.addAction("Size: Fit editor width")
+        act_vsz_orig = vid_menu.addAction("Size: Original")
+        act_vsz_custom = vid_menu.addAction("Size: Custom width…")
+        vid_menu.addSeparator()
+        # Capture time section
+        act_v1 = vid_menu.addAction("Frame at 1.0s…")
+        act_v3 = vid_menu.addAction("Frame at 3.0s…")
+        act_v5 = vid_menu.addAction("Frame at 5.0s…")
+        act_vc = vid_menu.addAction("Custom time…")
+        vid_menu.addSeparator()
+        act_vs = vid_menu.addAction("Use synthetic placeholder…")
+
+        def _choose_custom_video_time():
+            try:
+                secs, ok = QtWidgets.QInputDialog.getDouble(toolbar, "Insert Video", "Capture time (seconds):", 1.0, 0.0, 36000.0, 1)
+                if not ok:
+                    return
+                _insert_video_via_dialog(text_edit, capture_seconds=float(secs), force_synthetic=False)
+            except Exception:
+                pass
 
-    # Track chosen sizing mode for subsequent inserts
-    _video_size_state = {"mode": "default", "custom_width": None}
+        # Track chosen sizing mode for subsequent inserts (kept on the editor, read at insert time)
+        text_edit._video_size_state = {"mode": "default", "custom_width": None}
 
-    def _set_video_size(mode: str, custom_w: float = None):
-        _video_size_state["mode"] = mode
-        _video_size_state["custom_width"] = custom_w
+        def _set_video_size(mode: str, custom_w: float = None):
+            text_edit._video_size_state["mode"] = mode
+            text_edit._video_size_state["custom_width"] = custom_w
 
-    act_vsz_def.triggered.connect(lambda: _set_video_size("default"))
-    act_vsz_fit.triggered.connect(lambda: _set_video_size("fit-width"))
-    act_vsz_orig.triggered.connect(lambda: _set_video_size("original"))
+        # Preset size modes carry their mode as action data; one menu-level connection
+        act_vsz_def.setData("default")
+        act_vsz_fit.setData("fit-width")
+        act_vsz_orig.setData("original")
 
-    def _choose_video_custom_width():
-        try:
-            w, ok = QtWidgets.QInputDialog.getInt(toolbar, "Video width", "Width (px):", int(DEFAULT_IMAGE_LONG_SIDE), 50, 8000, 10)
-            if ok:
-                _set_video_size("custom", float(w))
-        except Exception:
-            pass
-    act_vsz_custom.triggered.connect(_choose_video_custom_width)
+        def _on_vid_menu_triggered(act):
+            mode = act.data()
+            if mode:
+                _set_video_size(mode)
 
-    act_v1.triggered.connect(lambda: _insert_video_via_dialog(text_edit, capture_seconds=1.0, force_synthetic=False, size_mode=_video_size_state["mode"], custom_width=_video_size_state["custom_width"]))
-    act_v3.triggered.connect(lambda: _insert_video_via_dialog(text_edit, capture_seconds=3.0, force_synthetic=False, size_mode=_video_size_state["mode"], custom_width=_video_size_state["custom_width"]))
-    act_v5.triggered.connect(lambda: _insert_video_via_dialog(text_edit, capture_seconds=5.0, force_synthetic=False, size_mode=_video_size_state["mode"], custom_width=_video_size_state["custom_width"]))
-    act_vc.triggered.connect(_choose_custom_video_time)
-    act_vs.triggered.connect(lambda: _insert_video_via_dialog(text_edit, capture_seconds=None, force_synthetic=True, size_mode=_video_size_state["mode"], custom_width=_video_size_state["custom_width"]))
+        vid_menu.triggered.connect(_on_vid_menu_triggered)
+
+        def _choose_video_custom_width():
+            try:
+                w, ok = QtWidgets.QInputDialog.getInt(toolbar, "Video width", "Width (px):", int(DEFAULT_IMAGE_LONG_SIDE), 50, 8000, 10)
+                if ok:
+                    _set_video_size("custom", float(w))
+            except Exception:
+                pass
+        act_vsz_custom.triggered.connect(_choose_video_custom_width)
+
+        def _do_insert_video(secs: float):
+            st = text_edit._video_size_state
+            _insert_video_via_dialog(text_edit, capture_seconds=secs, force_synthetic=False, size_mode=st["mode"], custom_width=st["custom_width"])
+
+        def _do_insert_synthetic_video():
+            st = text_edit._video_size_state
+            _insert_video_via_dialog(text_edit, capture_seconds=None, force_synthetic=True, size_mode=st["mode"], custom_width=st["custom_width"])
+
+        act_v1.triggered.connect(partial(_do_insert_video, 1.0))
+        act_v3.triggered.connect(partial(_do_insert_video, 3.0))
+        act_v5.triggered.connect(partial(_do_insert_video, 5.0))
+        act_vc.triggered.connect(_choose_custom_video_time)
+        act_vs.triggered.connect(_do_insert_synthetic_video)
+
+    vid_menu.aboutToShow.connect(_populate_vid_menu)
     btn_vid.setMenu(vid_menu)
     toolbar.addWidget(btn_vid)
 
     # Paste Text Only quick action
-    act_paste_plain = toolbar.addAction(_make_icon("color"), "", lambda: paste_text_only(text_edit))
+    act_paste_plain = toolbar.addAction(_make_icon("color"), "", partial(paste_text_only, text_edit))
     act_paste_plain.setToolTip("Paste Text Only (Ctrl+Shift+V)")
 
     # HTML Source editor
-    act_html = toolbar.addAction(_make_icon("code"), "", lambda: _open_html_source_dialog(text_edit))
+    act_html = toolbar.addAction(_make_icon("code"), "", partial(_open_html_source_dialog, text_edit))
     act_html.setToolTip("HTML Source…")
 
     # Table: insert or edit if caret is inside a table (as an action so it participates in overflow menu)
@@ -1009,7 +1275,7 @@ def add_rich_text_toolbar(
         act_table.setPriority(QtWidgets.QAction.HighPriority)
     except Exception:
         pass
-    act_table.triggered.connect(lambda: _table_insert_or_edit(text_edit))
+    act_table.triggered.connect(partial(_table_insert_or_edit, text_edit))
     toolbar.addAction(act_table)
 
     # (Image Actions toolbar button removed by request)
@@ -1025,25 +1291,42 @@ def add_rich_text_toolbar(
     # Guard flag to prevent circular toolbar sync during format application
     _applying_format = [False]
 
-    # Reflect current formatting in toolbar toggles when cursor moves
+    # Reflect current formatting in toolbar toggles when cursor moves.
+    # cursorPositionChanged and selectionChanged usually fire together, so the
+    # sync is coalesced to once per event-loop turn.
+    _sync_pending = [False]
+
     def _sync_toolbar():
+        if _sync_pending[0]:
+            return
+        _sync_pending[0] = True
+        QTimer.singleShot(0, _sync_toolbar_now)
+
+    def _sync_toolbar_now():
+        _sync_pending[0] = False
         # Skip sync if we're in the middle of applying a format change
-        if _applying_format[0]:
+        if _applying_format[0] or not _is_alive(text_edit):
             return
         fmt = text_edit.currentCharFormat()
         act_bold.setChecked(fmt.fontWeight() == QFont.Bold)
         act_italic.setChecked(fmt.fontItalic())
         act_underline.setChecked(fmt.fontUnderline())
         act_strike.setChecked(fmt.fontStrikeOut())
+        # Only touch the combos when they disagree with the format
+        size = int(fmt.fontPointSize())
+        fam = fmt.fontFamily()
+        need_size = size > 0 and size_box.currentData() != size
+        need_font = bool(fam) and font_box.currentFont().family() != fam
+        if not (need_size or need_font):
+            return
         # Block signals while updating font/size combos to prevent circular re-application
         try:
             old_size_blocked = size_box.blockSignals(True)
             old_font_blocked = font_box.blockSignals(True)
             try:
-                if fmt.fontPointSize() > 0:
-                    _select_combo_value(size_box, int(fmt.fontPointSize()))
-                fam = fmt.fontFamily()
-                if fam:
+                if need_size:
+                    _select_combo_value(size_box, size)
+                if need_font:
                     font_box.setCurrentFont(QFont(fam))
             finally:
                 size_box.blockSignals(old_size_blocked)
@@ -1066,13 +1349,13 @@ def add_rich_text_toolbar(
                     win._two_col_dirty = True
                     # Schedule immediate save via timer to persist font change
                     from PyQt5.QtCore import QTimer
-                    QTimer.singleShot(50, lambda: _trigger_save_for_format_change(win))
+                    QTimer.singleShot(50, partial(_trigger_save_for_format_change, win))
             except Exception:
                 pass
         finally:
             # Delay clearing the flag to allow pending signals to be ignored
             from PyQt5.QtCore import QTimer
-            QTimer.singleShot(100, lambda: _clear_applying_flag())
+            QTimer.singleShot(100, _clear_applying_flag)
     
     def _trigger_save_for_format_change(win):
         """Save page after a format change (font, size, etc.) since these don't trigger textChanged."""
@@ -1095,13 +1378,13 @@ def add_rich_text_toolbar(
                 if win and hasattr(win, "_two_col_dirty"):
                     win._two_col_dirty = True
                     from PyQt5.QtCore import QTimer
-                    QTimer.singleShot(50, lambda: _trigger_save_for_format_change(win))
+                    QTimer.singleShot(50, partial(_trigger_save_for_format_change, win))
             except Exception:
                 pass
         finally:
             # Delay clearing the flag to allow pending signals to be ignored
             from PyQt5.QtCore import QTimer
-            QTimer.singleShot(100, lambda: _clear_applying_flag())
+            QTimer.singleShot(100, _clear_applying_flag)
 
     def _clear_applying_flag():
         _applying_format[0] = False
@@ -1123,21 +1406,10 @@ def add_rich_text_toolbar(
     except Exception:
         pass
 
-    # Install Ctrl+V override to honor Default Paste Mode without relying on a window-level shortcut
-    _install_default_paste_override(text_edit)
     # Enable Ctrl+Click to open links in the system browser
     _install_link_click_handler(text_edit)
     # Enable right-click table context menu
     _install_table_context_menu(text_edit)
-    # Enable right-click image resize menu (stable alternative to overlay)
-    # (Already installed above together with image shortcuts)
-    # Disable drag-and-drop to avoid accidental inserts while we focus on stable HTML-style flows
-    try:
-        text_edit.setAcceptDrops(False)
-        if text_edit.viewport() is not None:
-            text_edit.viewport().setAcceptDrops(False)
-    except Exception:
-        pass
     # Enable mouse-based image resizing with aspect ratio preserved (can disable via env)
     if _is_image_resize_enabled():
         _install_image_resize_handler(text_edit)
@@ -1153,36 +1425,6 @@ def add_rich_text_toolbar(
     except Exception:
         pass
 
-    # Deterministic keyboard shortcut to open Image Properties for image at/near caret
-    def _open_image_properties_from_caret():
-        try:
-            info = _image_info_from_selection(text_edit)
-            if info is None:
-                info = _image_info_at_cursor(text_edit)
-            if info is None:
-                cur = text_edit.textCursor()
-                info = _image_info_near_doc_pos(text_edit, cur.position())
-            if info is None:
-                info = _image_info_in_block(text_edit, text_edit.textCursor().block(), prefer_pos=text_edit.textCursor().position())
-            if info is None:
-                # No image nearby, do nothing
-                return
-            _image_properties_dialog_apply(text_edit, info)
-        except Exception:
-            pass
-    try:
-        sc1 = QtWidgets.QShortcut(QKeySequence("Ctrl+Shift+I"), text_edit)
-        sc1.setContext(Qt.WidgetWithChildrenShortcut)
-        sc1.activated.connect(_open_image_properties_from_caret)
-    except Exception:
-        pass
-    try:
-        sc2 = QtWidgets.QShortcut(QKeySequence("F2"), text_edit)
-        sc2.setContext(Qt.WidgetWithChildrenShortcut)
-        sc2.activated.connect(_open_image_properties_from_caret)
-    except Exception:
-        pass
-
     # Install a small image HUD button that appears when caret is on/near an image
     try:
         _install_image_hud(text_edit)
@@ -1209,6 +1451,56 @@ def _effective_default_font(text_edit: QtWidgets.QTextEdit) -> QFont:
     return df
 
 
+def _default_family_and_size(text_edit: QtWidgets.QTextEdit):
+    """Return (family, point size) of the effective default font."""
+    df = _effective_default_font(text_edit)
+    try:
+        sz = df.pointSizeF() if df.pointSizeF() > 0 else float(df.pointSize())
+    except Exception:
+        sz = 12.0
+    return df.family(), sz
+
+
+def _build_text_only_formats(old_fmt: QTextCharFormat, doc_font, fg_rgba):
+    neutral = QTextCharFormat()
+    # Base on current family/size so paste follows user-selected toolbar values
+    # family/size fallback to document defaults if current format is unspecified
+    doc_fam, doc_sz = doc_font
+    fam = old_fmt.fontFamily() or doc_fam
+    if fam:
+        neutral.setFontFamily(fam)
+    sz = old_fmt.fontPointSize()
+    if not sz or sz <= 0:
+        sz = doc_sz
+    if sz and sz > 0:
+        neutral.setFontPointSize(float(sz))
+    # Do not bring background (transparent for inserted text); keep foreground consistent
+    neutral.setForeground(QColor.fromRgba(fg_rgba))
+    neutral.setBackground(Qt.transparent)
+    # Restore current typing format (clear background so it doesn't persist)
+    restored = QTextCharFormat(old_fmt)
+    restored.setBackground(Qt.transparent)
+    return neutral, restored
+
+
+def _build_match_style_formats(pre_fmt: QTextCharFormat, doc_font):
+    # Normalized format with explicit family/size fallback to document defaults
+    doc_fam, doc_sz = doc_font
+    fmt = QTextCharFormat(pre_fmt)
+    fam = fmt.fontFamily() or doc_fam
+    if fam:
+        fmt.setFontFamily(fam)
+    sz = fmt.fontPointSize()
+    if not sz or sz <= 0:
+        sz = doc_sz
+    fmt.setFontPointSize(float(sz))
+    # Ensure background doesn't carry over
+    fmt.setBackground(Qt.transparent)
+    restored = QTextCharFormat(pre_fmt)
+    restored.setBackground(Qt.transparent)
+    return fmt, restored
+
+
 def paste_text_only(text_edit: QtWidgets.QTextEdit):
     """Paste clipboard contents as plain text and normalize formatting to defaults (no bold/size/bg)."""
     cb = QtWidgets.QApplication.clipboard()
@@ -1226,30 +1518,11 @@ def paste_text_only(text_edit: QtWidgets.QTextEdit):
         )
     if not text:
         return
-    # Capture current format/cursor and create a neutral style based on current selection style
+    # Capture current format/cursor; the neutral style is based on the current selection style
     cursor = text_edit.textCursor()
     old_fmt = text_edit.currentCharFormat()
-    neutral = QTextCharFormat()
-    # Base on current family/size so paste follows user-selected toolbar values
-    # family/size fallback to document defaults if current format is unspecified
-    doc_font = _effective_default_font(text_edit)
-    fam = old_fmt.fontFamily() or doc_font.family()
-    if fam:
-        neutral.setFontFamily(fam)
-    sz = old_fmt.fontPointSize()
-    if not sz or sz <= 0:
-        try:
-            sz = doc_font.pointSizeF() if doc_font.pointSizeF() > 0 else float(doc_font.pointSize())
-        except Exception:
-            sz = 12.0
-    if sz and sz > 0:
-        neutral.setFontPointSize(float(sz))
-    # Do not bring background; keep foreground consistent
-    try:
-        neutral.setForeground(text_edit.palette().text().color())
-    except Exception:
-        pass
-    neutral.clearBackground()
+    fg = text_edit.palette().text().color()
+    neutral_bg, restored = _build_text_only_formats(old_fmt, _default_family_and_size(text_edit), fg.rgba())
     # Insert, then normalize the inserted range, then restore original typing format
     start = cursor.position()
     cursor.insertText(text)
@@ -1257,13 +1530,7 @@ def paste_text_only(text_edit: QtWidgets.QTextEdit):
     rng = QTextCursor(text_edit.document())
     rng.setPosition(start)
     rng.setPosition(end, QTextCursor.KeepAnchor)
-    # ensure transparent background for inserted text
-    neutral_bg = QTextCharFormat(neutral)
-    neutral_bg.setBackground(Qt.transparent)
     rng.mergeCharFormat(neutral_bg)
-    # Restore current typing format (clear background so it doesn't persist)
-    restored = QTextCharFormat(old_fmt)
-    restored.setBackground(Qt.transparent)
     text_edit.setCurrentCharFormat(restored)
     cursor.setPosition(end)
     text_edit.setTextCursor(cursor)
@@ -1302,40 +1569,41 @@ def paste_match_style(text_edit: QtWidgets.QTextEdit):
     rng = QTextCursor(text_edit.document())
     rng.setPosition(before)
     rng.setPosition(after, QTextCursor.KeepAnchor)
-    # Build a normalized format with explicit family/size fallback to document defaults
-    doc_font = _effective_default_font(text_edit)
-    fmt = QTextCharFormat(pre_fmt)
-    fam = fmt.fontFamily() or doc_font.family()
-    if fam:
-        fmt.setFontFamily(fam)
-    sz = fmt.fontPointSize()
-    if not sz or sz <= 0:
-        try:
-            sz = doc_font.pointSizeF() if doc_font.pointSizeF() > 0 else float(doc_font.pointSize())
-        except Exception:
-            sz = 12.0
-    fmt.setFontPointSize(float(sz))
-    # Ensure background doesn't carry over
-    try:
-        fmt.setBackground(Qt.transparent)
-    except Exception:
-        fmt.clearBackground()
+    fmt, restored = _build_match_style_formats(pre_fmt, _default_family_and_size(text_edit))
     rng.mergeCharFormat(fmt)
     # Restore typing format and place caret at end
-    restored = QTextCharFormat(pre_fmt)
-    try:
-        restored.setBackground(Qt.transparent)
-    except Exception:
-        restored.clearBackground()
     text_edit.setCurrentCharFormat(restored)
     cursor.setPosition(after)
     text_edit.setTextCursor(cursor)
 
 
-def _image_info_at_position(text_edit: QtWidgets.QTextEdit, pos_or_posint):
+_IMG_INFO_CACHE_MAX = 64
+
+
+def _image_info_at_position(text_edit: QtWidgets.QTextEdit, pos_or_posint, block: bool = True, base: str = None):
     """Detect image info at a specific document position (int) or viewport QPoint.
-    Returns {cursor_pos,name,w,h,iw,ih} or None.
+    Returns {cursor_pos,name,w,h,iw,ih} or None; see _qimage_dims for block.
     """
+    if isinstance(pos_or_posint, QPoint) or not block:
+        return _scan_image_info_at_position(text_edit, pos_or_posint, block, base)
+    # Document positions are memoized per document revision: the resize/fit paths look
+    # the same image up several times (pos, pos-1, again after applying) between edits
+    doc = text_edit.document()
+    if not doc.isUndoRedoEnabled():
+        return _scan_image_info_at_position(text_edit, pos_or_posint, block, base)
+    rev = doc.revision()
+    cache = getattr(text_edit, "_img_info_cache", None)
+    if cache is None or cache[0] is not doc or cache[1] != rev or len(cache[2]) >= _IMG_INFO_CACHE_MAX:
+        cache = text_edit._img_info_cache = (doc, rev, {})
+    key = (int(pos_or_posint), base)
+    hit = cache[2].get(key, cache)
+    if hit is cache:
+        hit = cache[2][key] = _scan_image_info_at_position(text_edit, pos_or_posint, block, base)
+    # Callers may fill in or tweak the dict; hand out copies
+    return dict(hit) if hit is not None else None
+
+
+def _scan_image_info_at_position(text_edit: QtWidgets.QTextEdit, pos_or_posint, block: bool, base: str):
     try:
         # Map from viewport QPoint to document position if needed
         if isinstance(pos_or_posint, QPoint):
@@ -1344,27 +1612,6 @@ def _image_info_at_position(text_edit: QtWidgets.QTextEdit, pos_or_posint):
             cur = QTextCursor(text_edit.document())
             cur.setPosition(int(pos_or_posint))
 
-        def _mk(imgf: QTextImageFormat, c: QTextCursor):
-            try:
-                name = imgf.name() if hasattr(imgf, "name") else imgf.property(QTextFormat.ImageName)
-            except Exception:
-                name = ""
-            w = float(imgf.width() or 0.0)
-            h = float(imgf.height() or 0.0)
-            iw = ih = None
-            try:
-                base = getattr(text_edit.window(), "_media_root", None)
-                path = name
-                if base and name and not os.path.isabs(name):
-                    path = os.path.join(base, name)
-                if not _is_raw_ext(path):
-                    img = QImage(path)
-                    if not img.isNull():
-                        iw, ih = img.width(), img.height()
-            except Exception:
-                pass
-            return {"cursor_pos": c.position(), "name": name, "w": w, "h": h, "iw": iw, "ih": ih}
-
         # Check current, previous, and next positions
         candidates = []
         for offset in (0, -1, +1):
@@ -1375,239 +1622,166 @@ def _image_info_at_position(text_edit: QtWidgets.QTextEdit, pos_or_posint):
                 c.movePosition(QTextCursor.Right)
             candidates.append(c)
         for c in candidates:
-            fmt = c.charFormat()
-            if fmt is not None and (
-                (hasattr(fmt, "isImageFormat") and fmt.isImageFormat())
-                or fmt.objectType() == QTextFormat.ImageObject
-            ):
-                return _mk(QTextImageFormat(fmt), QTextCursor(c))
-            # Try selecting the char at this position to fetch the actual object format
-            try:
+            imgf = _extract_image_fmt(c)
+            if imgf is None:
+                # Try selecting the char at this position to fetch the actual object format
                 csel = QTextCursor(c)
                 csel.movePosition(QTextCursor.Right, QTextCursor.KeepAnchor, 1)
-                fmt2 = csel.charFormat()
-                if fmt2 is not None and (
-                    (hasattr(fmt2, "isImageFormat") and fmt2.isImageFormat())
-                    or fmt2.objectType() == QTextFormat.ImageObject
-                ):
-                    return _mk(QTextImageFormat(fmt2), QTextCursor(c))
-            except Exception:
-                pass
+                imgf = _extract_image_fmt(csel)
+            if imgf is not None:
+                return _image_info_dict(text_edit, c.position(), imgf, block, base)
     except Exception:
         return None
     return None
 
 
-def _image_info_at_cursor(text_edit: QtWidgets.QTextEdit):
-    """Robustly detect an image under/near the caret or selection start.
-    Strategy:
-    1) Check current pos and neighbors
-    2) Check selection start and neighbors
-    3) Scan left/right within a small radius of positions
-    4) Sample viewport points around the caret rect center
+def _locate_image(text_edit: QtWidgets.QTextEdit, block: bool = True, base: str = None, selection: bool = True):
+    """Image for the caret: with selection=True, the first image inside a non-empty
+    selection; otherwise (or if none) the one nearest the caret or selection start.
+    Cursor, document and media root are fetched once for the whole lookup.
     """
     try:
         cur = text_edit.textCursor()
-        # Try current pos and neighbors
-        info = _image_info_at_position(text_edit, cur.position())
-        if info:
-            return info
-        # Try selection anchor/start if available
-        try:
-            start_pos = min(cur.anchor(), cur.position())
-        except Exception:
-            start_pos = cur.position()
-        if start_pos != cur.position():
-            info = _image_info_at_position(text_edit, start_pos)
-            if info:
-                return info
-            info = _image_info_at_position(text_edit, max(0, start_pos - 1))
-            if info:
-                return info
-        # Scan positions around caret within a small radius
-        try:
-            p0 = cur.position()
-            for d in (1, 2, 3, 4, 6, 8, 12, 16, 24, 32):
-                for pos_try in (max(0, p0 - d), p0 + d):
-                    info = _image_info_at_position(text_edit, pos_try)
-                    if info:
-                        return info
-        except Exception:
-            pass
-        # Sample viewport around caret rect center
-        try:
-            r = text_edit.cursorRect(cur)
-            if r is not None and r.isValid():
-                vp = text_edit.viewport()
-                cx = r.center().x()
-                cy = r.center().y()
-                # Sweep horizontally and slightly vertically
-                for dy in (0, int(r.height()/3) if r.height() > 0 else 6, -int(r.height()/3) if r.height() > 0 else -6):
-                    for dx in (-64, -48, -32, -24, -16, -8, -4, 0, 4, 8, 16, 24, 32, 48, 64):
-                        pt = QPoint(int(cx + dx), int(cy + dy))
-                        # Clamp within viewport
-                        if vp is not None:
-                            rr = vp.rect()
-                            if not rr.contains(pt):
-                                continue
-                        info = _image_info_at_position(text_edit, pt)
-                        if info:
-                            return info
-        except Exception:
-            pass
+        doc = text_edit.document()
+        p0 = cur.position()
+        a = cur.anchor()
+        start_pos = min(a, p0)
+        if base is None:
+            base = _resolve_base(text_edit)
+        hit = None
+        if selection and a != p0:
+            hit = _first_image_in_range(doc, start_pos, max(a, p0))
+        if hit is None:
+            hit = _nearest_image_around(doc, cur.block(), p0, start_pos)
+        if hit is not None:
+            return _image_info_dict(text_edit, hit[0], hit[1].toImageFormat(), block, base)
     except Exception:
         return None
     return None
 
 
-def _image_info_near_doc_pos(text_edit: QtWidgets.QTextEdit, doc_pos: int, max_scan: int = 512):
+def _image_info_at_cursor(text_edit: QtWidgets.QTextEdit, block: bool = True, base: str = None):
+    """Detect an image under/near the caret or selection start; see _locate_image."""
+    return _locate_image(text_edit, block, base, selection=False)
+
+
+def _nearest_image_around(doc, blk, p0: int, start_pos: int):
+    # One pass over the image fragments of the caret's block (and the selection
+    # start's block); the nearest image wins. Adjacent blocks are only consulted,
+    # within a short radius, when those blocks hold no image.
+    blocks = [blk]
+    if start_pos != p0:
+        sblk = doc.findBlock(start_pos)
+        if sblk.isValid() and sblk != blk:
+            blocks.insert(0, sblk)
+    best = _nearest_image_in_blocks(blocks, p0, start_pos, None)
+    if best is None:
+        # Same reach as the old +/-32 position probe
+        reach = 34
+        neighbours = []
+        b = blocks[0].previous()
+        while b.isValid() and b.position() + b.length() >= start_pos - reach:
+            neighbours.append(b)
+            b = b.previous()
+        b = blk.next()
+        while b.isValid() and b.position() <= p0 + reach:
+            neighbours.append(b)
+            b = b.next()
+        best = _nearest_image_in_blocks(neighbours, p0, start_pos, reach)
+    return best[1:] if best is not None else None
+
+
+def _iter_fragments(block):
+    # Valid formatted runs of a QTextBlock, in document order
+    it = block.begin()
+    while not it.atEnd():
+        frag = it.fragment()
+        if frag.isValid():
+            yield frag
+        it += 1
+
+
+def _first_image_in_range(doc, start: int, end: int):
+    # (position, format) of the first image char in [start, end], walking the
+    # formatted runs of the covered blocks instead of every char
+    blk = doc.findBlock(start)
+    while blk.isValid() and blk.position() <= end:
+        for frag in _iter_fragments(blk):
+            fp = frag.position()
+            if fp + frag.length() > start and fp <= end:
+                fmt = frag.charFormat()
+                if _is_image_fmt(fmt):
+                    return max(fp, start), fmt
+        blk = blk.next()
+    return None
+
+
+def _nearest_image_in_blocks(blocks, p0: int, start_pos: int, radius):
+    # (distance, position, char format) of the closest image char to either
+    # p0 or start_pos; a caret on either side of the image counts as distance 0
+    best = None
+    for b in blocks:
+        for frag in _iter_fragments(b):
+            fmt = frag.charFormat()
+            if _is_image_fmt(fmt):
+                fpos = frag.position()
+                for q in range(fpos, fpos + frag.length()):
+                    dist = min(
+                        0 if q <= p <= q + 1 else min(abs(q - p), abs(q + 1 - p))
+                        for p in (p0, start_pos)
+                    )
+                    if (radius is None or dist <= radius) and (best is None or dist < best[0]):
+                        best = (dist, q, fmt)
+    return best
+
+
+def _image_info_near_doc_pos(
+    text_edit: QtWidgets.QTextEdit, doc_pos: int, max_scan: int = 512, block: bool = True, base: str = None
+):
     """Find image nearest to a given document position, scanning within the current block first.
     Returns {cursor_pos,name,w,h,iw,ih} or None.
     """
     try:
-        doc = text_edit.document()
-        cur = QTextCursor(doc)
-        cur.setPosition(int(doc_pos))
-        blk = cur.block()
+        doc_pos = int(doc_pos)
+        blk = text_edit.document().findBlock(doc_pos)
+        if not blk.isValid():
+            return None
         # Limit search to the paragraph/block for precision
         start = blk.position()
         end = blk.position() + blk.length() - 1
-        # Scan outward from doc_pos within [start,end]
-        def _try_at(p):
-            if p < start or p > end:
-                return None
-            c = QTextCursor(doc)
-            c.setPosition(p)
-            # Select the char at this position to retrieve object format
-            c.movePosition(QTextCursor.Right, QTextCursor.KeepAnchor, 1)
-            fmt = c.charFormat()
-            if fmt is not None and ((hasattr(fmt, "isImageFormat") and fmt.isImageFormat()) or fmt.objectType() == QTextFormat.ImageObject):
-                imgf = QTextImageFormat(fmt)
-                name = imgf.name() if hasattr(imgf, "name") else imgf.property(QTextFormat.ImageName)
-                w = float(imgf.width() or 0.0)
-                h = float(imgf.height() or 0.0)
-                # Try to get intrinsic size
-                iw = ih = None
-                try:
-                    base = getattr(text_edit.window(), "_media_root", None)
-                    path = name
-                    if base and name and not os.path.isabs(name):
-                        path = os.path.join(base, name)
-                    img = QImage(path)
-                    if not img.isNull():
-                        iw, ih = img.width(), img.height()
-                except Exception:
-                    pass
-                return {"cursor_pos": p, "name": name, "w": w, "h": h, "iw": iw, "ih": ih}
-            return None
-        # Check exact pos and neighbors out to max_scan (capped by block length)
         max_delta = int(min(max_scan, max(0, end - start)))
-        # Prefer exact, then +/-1, +/-2, ...
-        for d in range(0, max_delta + 1):
-            # exact
-            if d == 0:
-                info = _try_at(doc_pos)
-                if info:
-                    return info
-                continue
-            # left then right
-            info = _try_at(doc_pos - d)
-            if info:
-                return info
-            info = _try_at(doc_pos + d)
-            if info:
-                return info
-    except Exception:
-        return None
-    return None
-
-
-def _image_info_from_selection(text_edit: QtWidgets.QTextEdit):
-    """If there's a selection, scan the selected range for an image object and return its info."""
-    try:
-        cur = text_edit.textCursor()
-        a = cur.anchor()
-        p = cur.position()
-        start = min(a, p)
-        end = max(a, p)
-        if start == end:
-            return None
-        doc = text_edit.document()
-        pos = start
-        while pos <= end:
-            c = QTextCursor(doc)
-            c.setPosition(pos)
-            c.movePosition(QTextCursor.Right, QTextCursor.KeepAnchor, 1)
-            fmt = c.charFormat()
-            if fmt is not None and (
-                (hasattr(fmt, "isImageFormat") and fmt.isImageFormat())
-                or fmt.objectType() == QTextFormat.ImageObject
-            ):
-                imgf = QTextImageFormat(fmt)
-                try:
-                    name = imgf.name() if hasattr(imgf, "name") else imgf.property(QTextFormat.ImageName)
-                except Exception:
-                    name = ""
-                w = float(imgf.width() or 0.0)
-                h = float(imgf.height() or 0.0)
-                iw = ih = None
-                try:
-                    base = getattr(text_edit.window(), "_media_root", None)
-                    path = name
-                    if base and name and not os.path.isabs(name):
-                        path = os.path.join(base, name)
-                    img = QImage(path)
-                    if not img.isNull():
-                        iw, ih = img.width(), img.height()
-                except Exception:
-                    pass
-                return {"cursor_pos": c.position(), "name": name, "w": w, "h": h, "iw": iw, "ih": ih}
-            pos += 1
+        # One pass over the block's image fragments; nearest wins, left before right on ties
+        best = None
+        for frag in _iter_fragments(blk):
+            fmt = frag.charFormat()
+            if _is_image_fmt(fmt):
+                fpos = frag.position()
+                for q in range(fpos, fpos + frag.length()):
+                    rank = (abs(q - doc_pos), q > doc_pos)
+                    if rank[0] <= max_delta and (best is None or rank < best[0]):
+                        best = (rank, q, fmt)
+        if best is not None:
+            return _image_info_dict(text_edit, best[1], best[2].toImageFormat(), block, base)
     except Exception:
         return None
     return None
 
 
-def _image_info_in_block(text_edit: QtWidgets.QTextEdit, block, prefer_pos: int = None):
+def _image_info_in_block(
+    text_edit: QtWidgets.QTextEdit, block, prefer_pos: int = None, wait: bool = True, base: str = None
+):
     """Scan QTextBlock fragments to find an embedded image. If multiple, pick the one nearest prefer_pos.
     Returns {cursor_pos,name,w,h,iw,ih} or None.
     """
     try:
         # Collect all image fragments with their positions
-        imgs = []
-        it = block.begin()
-        while not it.atEnd():
-            frag = it.fragment()
-            if frag.isValid():
-                fmt = frag.charFormat()
-                if fmt is not None and ((hasattr(fmt, "isImageFormat") and fmt.isImageFormat()) or fmt.objectType() == QTextFormat.ImageObject):
-                    imgf = QTextImageFormat(fmt)
-                    try:
-                        name = imgf.name() if hasattr(imgf, "name") else imgf.property(QTextFormat.ImageName)
-                    except Exception:
-                        name = ""
-                    w = float(imgf.width() or 0.0)
-                    h = float(imgf.height() or 0.0)
-                    iw = ih = None
-                    try:
-                        base = getattr(text_edit.window(), "_media_root", None)
-                        path = name
-                        if base and name and not os.path.isabs(name):
-                            path = os.path.join(base, name)
-                        img = QImage(path)
-                        if not img.isNull():
-                            iw, ih = img.width(), img.height()
-                    except Exception:
-                        pass
-                    imgs.append({
-                        "cursor_pos": frag.position(),
-                        "name": name,
-                        "w": w,
-                        "h": h,
-                        "iw": iw,
-                        "ih": ih,
-                    })
-            it += 1
+        if base is None:
+            base = _resolve_base(text_edit)
+        imgs = [
+            _image_info_dict(text_edit, frag.position(), frag.charFormat().toImageFormat(), wait, base)
+            for frag in _iter_fragments(block)
+            if _is_image_fmt(frag.charFormat())
+        ]
         if not imgs:
             return None
         if prefer_pos is None:
@@ -1619,77 +1793,64 @@ def _image_info_in_block(text_edit: QtWidgets.QTextEdit, block, prefer_pos: int
         return None
 
 
-def _apply_image_size_at(text_edit: QtWidgets.QTextEdit, cursor_pos: int, name: str, w: float, h: float):
+def _apply_image_size_at(
+    text_edit: QtWidgets.QTextEdit, cursor_pos: int, name: str, w: float, h: float, info_here: dict = None
+):
     try:
         doc = text_edit.document()
-        # Ensure we target the actual image character; adjust if needed
-        info_here = _image_info_at_position(text_edit, cursor_pos)
+        # Ensure we target the actual image character; adjust if needed.
+        # Callers that already located the image can pass its info dict.
         if info_here is None:
-            info_here = _image_info_at_position(text_edit, max(0, cursor_pos - 1))
+            info_here = _image_info_at_position(text_edit, cursor_pos)
+            if info_here is None:
+                info_here = _image_info_at_position(text_edit, max(0, cursor_pos - 1))
         if info_here is not None:
             target_pos = int(info_here.get("cursor_pos", cursor_pos))
         else:
             target_pos = int(cursor_pos)
 
-        # Preferred: replace the object with a new image fragment at the desired size
-        try:
-            c = QTextCursor(doc)
-            c.setPosition(target_pos)
-            # Select the object replacement char if present
-            c.movePosition(QTextCursor.Right, QTextCursor.KeepAnchor, 1)
-            # If selection is not an image, fall back later
-            fmt = c.charFormat()
-            is_img_sel = fmt is not None and (
-                (hasattr(fmt, "isImageFormat") and fmt.isImageFormat()) or fmt.objectType() == QTextFormat.ImageObject
-            )
-            if is_img_sel:
-                try:
-                    c.removeSelectedText()
-                except Exception:
-                    pass
-                imgf = QTextImageFormat()
-                if name:
-                    imgf.setName(name)
-                imgf.setWidth(float(max(1.0, w)))
-                imgf.setHeight(float(max(1.0, h)))
+        imgf = QTextImageFormat()
+        if name:
+            imgf.setName(name)
+        imgf.setWidth(float(max(1.0, w)))
+        imgf.setHeight(float(max(1.0, h)))
+        c = QTextCursor(doc)
+        c.setPosition(target_pos)
+        # Select the object replacement char if present
+        c.movePosition(QTextCursor.Right, QTextCursor.KeepAnchor, 1)
+        if _is_image_fmt(c.charFormat()):
+            # Preferred: replace the object with a new image fragment at the desired size
+            try:
                 c.insertImage(imgf)
                 return
-        except Exception:
-            pass
-
-        # Fallback: setCharFormat on a 1-char selection at the requested position
-        try:
-            c = QTextCursor(doc)
-            c.setPosition(target_pos)
-            c.movePosition(QTextCursor.Right, QTextCursor.KeepAnchor, 1)
-            imgf = QTextImageFormat()
-            if name:
-                imgf.setName(name)
-            imgf.setWidth(float(max(1.0, w)))
-            imgf.setHeight(float(max(1.0, h)))
-            c.setCharFormat(imgf)
-        except Exception:
-            pass
+            except Exception:
+                pass
+        # Fallback: setCharFormat on the 1-char selection at the requested position
+        c.setCharFormat(imgf)
     except Exception:
         pass
 
 
-def _fit_image_to_width_at(text_edit: QtWidgets.QTextEdit, cursor_pos: int, name: str, iw: int, ih: int):
+def _fit_image_to_width_at(
+    text_edit: QtWidgets.QTextEdit, cursor_pos: int, name: str, iw: int, ih: int, info: dict = None
+):
     try:
         if not (iw and ih):
             return
         vp = text_edit.viewport()
         avail = max(16.0, float(vp.width() - 24)) if vp is not None else float(iw)
         scale = avail / float(iw)
-        _apply_image_size_at(text_edit, cursor_pos, name, avail, max(1.0, ih * scale))
+        _apply_image_size_at(text_edit, cursor_pos, name, avail, max(1.0, ih * scale), info_here=info)
     except Exception:
         pass
 
 
-def _reset_image_size_at(text_edit: QtWidgets.QTextEdit, cursor_pos: int, name: str, iw: int, ih: int):
+def _reset_image_size_at(
+    text_edit: QtWidgets.QTextEdit, cursor_pos: int, name: str, iw: int, ih: int, info: dict = None
+):
     try:
         if iw and ih:
-            _apply_image_size_at(text_edit, cursor_pos, name, float(iw), float(ih))
+            _apply_image_size_at(text_edit, cursor_pos, name, float(iw), float(ih), info_here=info)
     except Exception:
         pass
 
@@ -1712,299 +1873,236 @@ def _prompt_resize_image(text_edit: QtWidgets.QTextEdit, cursor_pos: int, name:
         pass
 
 
+# One CSS declaration per match: (key part)(colon, if any)(rest up to the next ';').
+# Empty matches between semicolons are skipped by the callers.
+_CSS_DECL_RE = re.compile(r"([^;:]*)(:?)[^;]*")
+
+
+# Patterns used by _strip_match_style_html, compiled once
+_MS_STYLE_BLOCK_RE = re.compile(r"<\s*style\b[^>]*>.*?<\s*/\s*style\s*>", re.IGNORECASE | re.DOTALL)
+# bgcolor / face|size|color attributes: double-quoted, single-quoted or bare value
+_MS_BGCOLOR_RE = re.compile(r"""\sbgcolor\s*=\s*(?:"[^"]*"|'[^']*'|[^\s>]+)""", re.IGNORECASE)
+_MS_FONT_OPEN_RE = re.compile(r"<\s*font\b[^>]*>", re.IGNORECASE)
+_MS_FONT_CLOSE_RE = re.compile(r"<\s*/\s*font\s*>", re.IGNORECASE)
+_MS_FONT_ATTRS_RE = re.compile(r"""\s(?:face|size|color)\s*=\s*(?:"[^"]*"|'[^']*'|[^\s>]+)""", re.IGNORECASE)
+_MS_STYLE_ATTR_DQ_RE = re.compile(r'\sstyle\s*=\s*"([^"]*)"', re.IGNORECASE)
+_MS_STYLE_ATTR_SQ_RE = re.compile(r"\sstyle\s*=\s*'([^']*)'", re.IGNORECASE)
+# Style keys dropped on match-style paste (plus anything starting with "background")
+_MS_DROP_STYLE_KEYS = frozenset({"font-size", "font-family", "font", "line-height"})
+
+
+def _match_style_clean_style(m) -> str:
+    return _match_style_style_attr(m.group(1))
+
+
+@lru_cache(maxsize=1024)
+def _match_style_style_attr(value: str) -> str:
+    # Clean style attributes: remove background*, font-size, font-family, shorthand font, and line-height.
+    # Rich clipboard HTML repeats the same style strings on every span, hence the cache
+    kept = []
+    for d in _CSS_DECL_RE.finditer(value):
+        p = d.group(0).strip()
+        if not p:
+            continue
+        key = d.group(1).strip().lower()
+        if key.startswith("background") or key in _MS_DROP_STYLE_KEYS:
+            continue
+        kept.append(p)
+    if not kept:
+        return ""
+    return ' style="' + "; ".join(kept) + '"'
+
+
 def _strip_match_style_html(html: str) -> str:
     """Remove background, font-size, and font-family related styles/attributes so current style applies immediately."""
-    import re
-
     s = html
     # Remove any <style>...</style> blocks entirely to prevent global overrides affecting pasted fragment
-    s = re.sub(r"<\s*style\b[^>]*>.*?<\s*/\s*style\s*>", "", s, flags=re.IGNORECASE | re.DOTALL)
+    s = _MS_STYLE_BLOCK_RE.sub("", s)
     # Remove bgcolor attribute
-    s = re.sub(r'\sbgcolor\s*=\s*"[^"]*"', "", s, flags=re.IGNORECASE)
-    s = re.sub(r"\sbgcolor\s*=\s*'[^']*'", "", s, flags=re.IGNORECASE)
-    s = re.sub(r"\sbgcolor\s*=\s*[^\s>]+", "", s, flags=re.IGNORECASE)
+    s = _MS_BGCOLOR_RE.sub("", s)
     # Replace deprecated <font> tags with span
-    s = re.sub(r"<\s*font\b[^>]*>", "<span>", s, flags=re.IGNORECASE)
-    s = re.sub(r"<\s*/\s*font\s*>", "</span>", s, flags=re.IGNORECASE)
+    s = _MS_FONT_OPEN_RE.sub("<span>", s)
+    s = _MS_FONT_CLOSE_RE.sub("</span>", s)
     # Drop face/size/color attributes
-    s = re.sub(r'\s(face|size|color)\s*=\s*"[^"]*"', "", s, flags=re.IGNORECASE)
-    s = re.sub(r"\s(face|size|color)\s*=\s*'[^']*'", "", s, flags=re.IGNORECASE)
-    s = re.sub(r"\s(face|size|color)\s*=\s*[^\s>]+", "", s, flags=re.IGNORECASE)
-
-    # Clean style attributes: remove background*, font-size, font-family, shorthand font, and line-height
-    def _clean_style(m):
-        inner = m.group(1)
-        parts = [p.strip() for p in inner.split(";") if p.strip()]
-        kept = []
-        for p in parts:
-            key = p.split(":", 1)[0].strip().lower()
-            if key.startswith("background") or key in (
-                "font-size",
-                "font-family",
-                "font",
-                "line-height",
-            ):
-                continue
-            kept.append(p)
-        if not kept:
-            return ""
-        return ' style="' + "; ".join(kept) + '"'
-
-    s = re.sub(r'\sstyle\s*=\s*"([^"]*)"', _clean_style, s, flags=re.IGNORECASE)
-    s = re.sub(
-        r"\sstyle\s*=\s*'([^']*)'",
-        lambda m: _clean_style(m).replace('"', '"'),
-        s,
-        flags=re.IGNORECASE,
-    )
+    s = _MS_FONT_ATTRS_RE.sub("", s)
+    # Single-quoted styles come back double-quoted
+    s = _MS_STYLE_ATTR_DQ_RE.sub(_match_style_clean_style, s)
+    s = _MS_STYLE_ATTR_SQ_RE.sub(_match_style_clean_style, s)
     return s
 
 
+# Storage sanitizer whitelists
+# bgcolor is kept on table elements to retain shading
+_STORE_BGCOLOR_TAGS = frozenset({"td", "th", "tr"})
+_STORE_STYLE_TAGS = frozenset({
+    "ol", "ul", "li", "p", "div", "td", "th", "tr", "table", "span", "a", "em", "strong", "b", "i", "u", "s", "hr"
+})
+_STORE_PDIV_TAGS = frozenset({"p", "div"})
+_STORE_PDIV_KEYS = frozenset({"margin-left", "text-align"})
+_STORE_CELL_STYLE_TAGS = frozenset({"td", "th", "tr", "hr"})
+_STORE_CELL_STYLE_KEYS = frozenset({
+    "background", "background-color", "text-align",
+    "border", "border-top", "border-right", "border-bottom", "border-left",
+    "border-top-color", "border-right-color", "border-bottom-color", "border-left-color",
+    "border-top-style", "border-right-style", "border-bottom-style", "border-left-style",
+    "border-top-width", "border-right-width", "border-bottom-width", "border-left-width",
+    "padding", "padding-top", "padding-right", "padding-bottom", "padding-left",
+    "height",
+})
+_STORE_CHAR_STYLE_KEYS = frozenset({
+    "font-weight", "font-style", "text-decoration", "color",
+    "background", "background-color", "font-family", "font-size",
+})
+_STORE_TABLE_ATTRS = frozenset({"width", "height", "cellpadding", "cellspacing", "border"})
+_STORE_CELL_ATTRS = frozenset({"colspan", "rowspan", "align", "valign"})
+_STORE_IMG_ATTRS = frozenset({"src", "alt", "title", "width", "height"})
+# Plain attributes kept per tag. Open tags keep list semantics (type may be set by Qt for
+# list appearance; value continues numbering), links and table sizing; self-closing tags
+# only ever carried alignment, image and cell-span attributes.
+_STORE_ATTRS = {
+    "p": frozenset({"align"}),
+    "div": frozenset({"align"}),
+    "ol": frozenset({"type", "start"}),
+    "ul": frozenset({"type", "start"}),
+    "li": frozenset({"value"}),
+    "a": frozenset({"href", "title"}),
+    "img": _STORE_IMG_ATTRS,
+    "table": _STORE_TABLE_ATTRS,
+    "tr": _STORE_TABLE_ATTRS,
+    "td": _STORE_TABLE_ATTRS | _STORE_CELL_ATTRS,
+    "th": _STORE_TABLE_ATTRS | _STORE_CELL_ATTRS,
+}
+_STORE_VOID_ATTRS = {
+    "p": frozenset({"align"}),
+    "div": frozenset({"align"}),
+    "img": _STORE_IMG_ATTRS,
+    "td": _STORE_CELL_ATTRS,
+    "th": _STORE_CELL_ATTRS,
+}
+# Marks the style attribute in the policy tables; its value is filtered, not copied
+_STORE_STYLE = object()
+
+
+def _store_attr_policy(keep_map):
+    # Flatten the whitelists into one (tag, attr) -> action lookup: True keeps the
+    # attribute as-is, _STORE_STYLE filters it; anything absent (class, color,
+    # face, size, data-*, ids, ...) is dropped
+    policy = {(tag, attr): True for tag, attrs in keep_map.items() for attr in attrs}
+    policy.update(((tag, "bgcolor"), True) for tag in _STORE_BGCOLOR_TAGS)
+    policy.update(((tag, "style"), _STORE_STYLE) for tag in _STORE_STYLE_TAGS)
+    return policy
+
+
+_STORE_ATTR_POLICY = _store_attr_policy(_STORE_ATTRS)
+_STORE_VOID_ATTR_POLICY = _store_attr_policy(_STORE_VOID_ATTRS)
+
+
+@lru_cache(maxsize=1024)
+def _store_style(tag_l: str, value: str) -> str:
+    # Keep safe styles, including inline character formatting so user-applied
+    # bold/italic/underline/strike, colors, and custom font family/size persist.
+    #
+    # We preserve:
+    # - list-related (-qt-list-*, -qt-paragraph-type)
+    # - paragraph/div margin-left and text-align
+    # - table cell/row background-color, text-align, borders and padding
+    # - border-collapse on tables (HR styling)
+    # - character styles: font-weight, font-style, text-decoration, color,
+    #   background/background-color, font-family, font-size
+    pdiv = tag_l in _STORE_PDIV_TAGS
+    cell = tag_l in _STORE_CELL_STYLE_TAGS
+    # Qt repeats the same few style strings on every span/paragraph, hence the cache
+    kept = []
+    for m in _CSS_DECL_RE.finditer(value):
+        d = m.group(0).strip()
+        if not d:
+            continue
+        key = m.group(1).strip().lower() if m.group(2) else ""
+        if (
+            key.startswith("-qt-list-")
+            or key == "-qt-paragraph-type"
+            or (pdiv and key in _STORE_PDIV_KEYS)
+            or (cell and key in _STORE_CELL_STYLE_KEYS)
+            or (tag_l == "table" and key == "border-collapse")
+            or key in _STORE_CHAR_STYLE_KEYS
+        ):
+            kept.append(d)
+    return "; ".join(kept)
+
+
+def _store_attrs_text(tag_l: str, attrs, policies) -> str:
+    # HTMLParser hands over lower-cased attribute names
+    allowed = []
+    buffered_style = None
+    for k, v in attrs:
+        action = policies.get((tag_l, k))
+        if action is None:
+            continue
+        if action is _STORE_STYLE:
+            buffered_style = _store_style(tag_l, str(v)) or buffered_style
+        else:
+            allowed.append((k, v))
+    if buffered_style:
+        allowed.append(("style", buffered_style))
+    if not allowed:
+        return ""
+    return "".join([f' {k}="{v}"' for k, v in allowed])
+
+
+class _StoreCleaner(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.out = []
+        # Bound once: the handlers below run for every tag and text run
+        self._app = self.out.append
+        self._skip_style = False
+
+    def handle_starttag(self, tag, attrs):
+        tag_l = tag.lower()
+        if tag_l == "style":
+            # Skip entire style blocks
+            self._skip_style = True
+            return
+        # Convert deprecated <font> to span
+        if tag_l == "font":
+            tag_l = "span"
+        if attrs:
+            self._app(f"<{tag_l}{_store_attrs_text(tag_l, attrs, _STORE_ATTR_POLICY)}>")
+        else:
+            self._app(f"<{tag_l}>")
+
+    def handle_endtag(self, tag):
+        tag_l = tag.lower()
+        if tag_l == "style":
+            self._skip_style = False
+            return
+        if tag_l == "font":
+            tag_l = "span"
+        self._app(f"</{tag_l}>")
+
+    def handle_startendtag(self, tag, attrs):
+        tag_l = tag.lower()
+        if tag_l == "style":
+            return
+        if attrs:
+            self._app(f"<{tag_l}{_store_attrs_text(tag_l, attrs, _STORE_VOID_ATTR_POLICY)}/>")
+        else:
+            self._app(f"<{tag_l}/>")
+
+    def handle_data(self, data):
+        if not self._skip_style:
+            self._app(data)
+
+
 def sanitize_html_for_storage(raw_html: str) -> str:
     """Strip inline font/background styles and classes before saving to avoid size/background regressions on reload.
     Keeps structure (p, br, lists, basic formatting), links and images.
     """
     if not isinstance(raw_html, str) or not raw_html:
         return raw_html
-    from html.parser import HTMLParser
-
-    class _StoreCleaner(HTMLParser):
-        def __init__(self):
-            super().__init__()
-            self.out = []
-            self._skip_style = False
-
-        def handle_starttag(self, tag, attrs):
-            tag_l = tag.lower()
-            if tag_l == "style":
-                # Skip entire style blocks
-                self._skip_style = True
-                return
-            # Convert deprecated <font> to span
-            if tag_l == "font":
-                tag_l = "span"
-            allowed = []
-            buffered_style = None
-            for k, v in attrs:
-                lk = k.lower()
-                if lk in ("class", "color", "face", "size"):
-                    continue
-                if lk == "bgcolor":
-                    # Preserve bgcolor on table elements to retain shading
-                    if tag_l in ("td", "th", "tr"):
-                        allowed.append((k, v))
-                    continue
-                if lk == "style":
-                    # Keep safe styles, including inline character formatting so user-applied
-                    # bold/italic/underline/strike, colors, and custom font family/size persist.
-                    #
-                    # We preserve:
-                    # - list-related (-qt-list-*, -qt-paragraph-type)
-                    # - paragraph/div margin-left and text-align
-                    # - table cell/row background-color and text-align
-                    # - character styles: font-weight, font-style, text-decoration, color,
-                    #   background/background-color, font-family, font-size
-                    if tag_l in ("ol", "ul", "li", "p", "div", "td", "th", "tr", "table", "span", "a", "em", "strong", "b", "i", "u", "s", "hr"):
-                        try:
-                            decls = [d.strip() for d in str(v).split(";") if d.strip()]
-                            kept = []
-                            for d in decls:
-                                parts = d.split(":", 1)
-                                key = parts[0].strip().lower() if len(parts) == 2 else ""
-                                if key.startswith("-qt-list-") or key == "-qt-paragraph-type":
-                                    kept.append(d)
-                                elif tag_l in ("p", "div") and key in ("margin-left", "text-align"):
-                                    kept.append(d)
-                                elif tag_l in ("td", "th", "tr", "hr") and key in (
-                                    "background",
-                                    "background-color",
-                                    "text-align",
-                                    "border",
-                                    "border-top",
-                                    "border-right",
-                                    "border-bottom",
-                                    "border-left",
-                                    "border-top-color",
-                                    "border-right-color",
-                                    "border-bottom-color",
-                                    "border-left-color",
-                                    "border-top-style",
-                                    "border-right-style",
-                                    "border-bottom-style",
-                                    "border-left-style",
-                                    "border-top-width",
-                                    "border-right-width",
-                                    "border-bottom-width",
-                                    "border-left-width",
-                                    "padding",
-                                    "padding-top",
-                                    "padding-right",
-                                    "padding-bottom",
-                                    "padding-left",
-                                    "height",
-                                ):
-                                    kept.append(d)
-                                # Preserve border-collapse on tables for HR styling
-                                elif tag_l == "table" and key == "border-collapse":
-                                    kept.append(d)
-                                # Allow inline char formatting on common tags
-                                elif key in (
-                                    "font-weight",
-                                    "font-style",
-                                    "text-decoration",
-                                    "color",
-                                    "background",
-                                    "background-color",
-                                    "font-family",
-                                    "font-size",
-                                ):
-                                    kept.append(d)
-                            if kept:
-                                buffered_style = "; ".join(kept)
-                        except Exception:
-                            pass
-                    continue
-                # Preserve explicit HTML alignment on paragraphs/divs
-                if tag_l in ("p", "div") and lk == "align":
-                    allowed.append((k, v))
-                # Preserve list semantics
-                if tag_l in ("ol", "ul") and lk in (
-                    "type",
-                    "start",
-                ):  # type may be set by Qt for list appearance
-                    allowed.append((k, v))
-                elif tag_l == "li" and lk in ("value",):  # value allows continuing numbering
-                    allowed.append((k, v))
-                elif tag_l == "a" and lk in ("href", "title"):
-                    allowed.append((k, v))
-                elif tag_l == "img" and lk in ("src", "alt", "title", "width", "height"):
-                    allowed.append((k, v))
-                elif lk.startswith("data-"):
-                    # Previously preserved formula-related attributes; now dropped after rollback.
-                    continue
-                if tag_l == "div" and lk == "id" and str(v) == "NB_DATA_FORMULAS":
-                    # Sidecar div no longer used; skip.
-                    continue
-                elif lk in (
-                    "width",
-                    "height",
-                    "cellpadding",
-                    "cellspacing",
-                    "border",
-                ) and tag_l in ("table", "td", "th", "tr"):
-                    allowed.append((k, v))
-                elif tag_l in ("td", "th") and lk in ("colspan", "rowspan", "align", "valign"):
-                    allowed.append((k, v))
-                # drop everything else
-            if buffered_style:
-                allowed.append(("style", buffered_style))
-            attrs_txt = "".join(f' {k}="{v}"' for k, v in allowed)
-            self.out.append(f"<{tag_l}{attrs_txt}>")
-
-        def handle_endtag(self, tag):
-            tag_l = tag.lower()
-            if tag_l == "style":
-                self._skip_style = False
-                return
-            if tag_l == "font":
-                tag_l = "span"
-            self.out.append(f"</{tag_l}>")
-
-        def handle_startendtag(self, tag, attrs):
-            tag_l = tag.lower()
-            if tag_l == "style":
-                return
-            allowed = []
-            buffered_style = None
-            for k, v in attrs:
-                lk = k.lower()
-                if lk in ("class", "color", "face", "size"):
-                    continue
-                if lk == "bgcolor":
-                    if tag_l in ("td", "th", "tr"):
-                        allowed.append((k, v))
-                    continue
-                if lk == "style":
-                    if tag_l in ("ol", "ul", "li", "p", "div", "td", "th", "tr", "table", "span", "a", "em", "strong", "b", "i", "u", "s", "hr"):
-                        try:
-                            decls = [d.strip() for d in str(v).split(";") if d.strip()]
-                            kept = []
-                            for d in decls:
-                                parts = d.split(":", 1)
-                                key = parts[0].strip().lower() if len(parts) == 2 else ""
-                                if key.startswith("-qt-list-") or key == "-qt-paragraph-type":
-                                    kept.append(d)
-                                elif tag_l in ("p", "div") and key in ("margin-left", "text-align"):
-                                    kept.append(d)
-                                elif tag_l in ("td", "th", "tr", "hr") and key in (
-                                    "background",
-                                    "background-color",
-                                    "text-align",
-                                    "border",
-                                    "border-top",
-                                    "border-right",
-                                    "border-bottom",
-                                    "border-left",
-                                    "border-top-color",
-                                    "border-right-color",
-                                    "border-bottom-color",
-                                    "border-left-color",
-                                    "border-top-style",
-                                    "border-right-style",
-                                    "border-bottom-style",
-                                    "border-left-style",
-                                    "border-top-width",
-                                    "border-right-width",
-                                    "border-bottom-width",
-                                    "border-left-width",
-                                    "padding",
-                                    "padding-top",
-                                    "padding-right",
-                                    "padding-bottom",
-                                    "padding-left",
-                                    "height",
-                                ):
-                                    kept.append(d)
-                                # Preserve border-collapse on tables for HR styling
-                                elif tag_l == "table" and key == "border-collapse":
-                                    kept.append(d)
-                                elif key in (
-                                    "font-weight",
-                                    "font-style",
-                                    "text-decoration",
-                                    "color",
-                                    "background",
-                                    "background-color",
-                                    "font-family",
-                                    "font-size",
-                                ):
-                                    kept.append(d)
-                            if kept:
-                                buffered_style = "; ".join(kept)
-                        except Exception:
-                            pass
-                    continue
-                if tag_l in ("p", "div") and lk == "align":
-                    allowed.append((k, v))
-                if tag_l == "div" and lk == "id" and str(v) == "NB_DATA_FORMULAS":
-                    # Skip legacy sidecar id.
-                    continue
-                if lk.startswith("data-"):
-                    # Drop legacy formula attributes.
-                    continue
-                if tag_l == "img" and lk in ("src", "alt", "title", "width", "height"):
-                    allowed.append((k, v))
-                elif tag_l in ("td", "th") and lk in ("colspan", "rowspan", "align", "valign"):
-                    allowed.append((k, v))
-            if buffered_style:
-                allowed.append(("style", buffered_style))
-            attrs_txt = "".join(f' {k}="{v}"' for k, v in allowed)
-            self.out.append(f"<{tag_l}{attrs_txt}/>")
-
-        def handle_data(self, data):
-            if not self._skip_style:
-                self.out.append(data)
-
+    # Without markup or entities the parser would hand the text back verbatim
+    if "<" not in raw_html and "&" not in raw_html:
+        return raw_html
     try:
         cl = _StoreCleaner()
         cl.feed(raw_html)
@@ -2026,18 +2124,24 @@ def _merge_with_adjacent_lists(cursor: QTextCursor, cur_list: QTextList):
         search = prev
         steps = 0
         current_level = cur_fmt.indent()
+        current_style = cur_fmt.style()
+        # Consecutive blocks usually share one QTextList; once a list has been
+        # ruled out, its other items are skipped without re-reading the format
+        seen = None
         while search.isValid() and steps < 500:
             tl = search.textList()
             if tl is None:
                 # blank/unstyled paragraph: treat as a boundary
                 break
-            pf = tl.format()
-            if pf.indent() < current_level:
-                # crossed into a parent or higher-level boundary; don't merge across parents
-                break
-            if pf.indent() == current_level and pf.style() == cur_fmt.style():
-                tl.add(block)
-                return
+            if tl is not seen:
+                pf = tl.format()
+                if pf.indent() < current_level:
+                    # crossed into a parent or higher-level boundary; don't merge across parents
+                    break
+                if pf.indent() == current_level and pf.style() == current_style:
+                    tl.add(block)
+                    return
+                seen = tl
             search = search.previous()
             steps += 1
         # Merge with next list if same style/indent
@@ -2053,44 +2157,31 @@ def _merge_with_adjacent_lists(cursor: QTextCursor, cur_list: QTextList):
         pass
 
 
-def _is_ordered_style(style: QTextListFormat.Style) -> bool:
-    return style in (
+# Ordered (numbered) list styles, as ints for a single set lookup
+_ORDERED_STYLES = frozenset(
+    int(s)
+    for s in (
         QTextListFormat.ListDecimal,
         QTextListFormat.ListLowerAlpha,
         QTextListFormat.ListUpperAlpha,
         QTextListFormat.ListLowerRoman,
         QTextListFormat.ListUpperRoman,
     )
+)
+
+
+def _is_ordered_style(style: QTextListFormat.Style) -> bool:
+    return int(style) in _ORDERED_STYLES
 
 
 def _ordered_style_for_level(level: int) -> QTextListFormat.Style:
-    lvl = max(1, level)
-    if _ORDERED_SCHEME == "decimal":
-        return QTextListFormat.ListDecimal
-    # 'classic' default: I, A, 1, a, i (repeat)
-    idx = (lvl - 1) % 5
-    if idx == 0:
-        return QTextListFormat.ListUpperRoman
-    if idx == 1:
-        return QTextListFormat.ListUpperAlpha
-    if idx == 2:
-        return QTextListFormat.ListDecimal
-    if idx == 3:
-        return QTextListFormat.ListLowerAlpha
-    return QTextListFormat.ListLowerRoman
+    table = _ORDERED_ACTIVE_TABLE
+    return table[(max(1, level) - 1) % len(table)]
 
 
 def _unordered_style_for_level(level: int) -> QTextListFormat.Style:
-    lvl = max(1, level)
-    if _UNORDERED_SCHEME == "disc-only":
-        return QTextListFormat.ListDisc
-    # 'disc-circle-square' default (cycles every 3 levels)
-    idx = (lvl - 1) % 3
-    if idx == 0:
-        return QTextListFormat.ListDisc
-    if idx == 1:
-        return QTextListFormat.ListCircle
-    return QTextListFormat.ListSquare
+    table = _UNORDERED_ACTIVE_TABLE
+    return table[(max(1, level) - 1) % len(table)]
 
 
 def set_list_schemes(ordered: str = None, unordered: str = None):
@@ -2098,15 +2189,15 @@ def set_list_schemes(ordered: str = None, unordered: str = None):
     ordered: 'classic' or 'decimal'
     unordered: 'disc-circle-square' or 'disc-only'
     """
-    global _ORDERED_SCHEME, _UNORDERED_SCHEME
-    if ordered in (None, ""):
-        pass
-    elif ordered in ("classic", "decimal"):
+    global _ORDERED_SCHEME, _UNORDERED_SCHEME, _ORDERED_ACTIVE_TABLE, _UNORDERED_ACTIVE_TABLE
+    table = _ORDERED_TABLES.get(ordered) if isinstance(ordered, str) else None
+    if table is not None:
         _ORDERED_SCHEME = ordered
-    if unordered in (None, ""):
-        pass
-    elif unordered in ("disc-circle-square", "disc-only"):
+        _ORDERED_ACTIVE_TABLE = table
+    table = _UNORDERED_TABLES.get(unordered) if isinstance(unordered, str) else None
+    if table is not None:
         _UNORDERED_SCHEME = unordered
+        _UNORDERED_ACTIVE_TABLE = table
 
 
 def get_list_schemes():
@@ -2138,7 +2229,7 @@ def _insert_image_from_path(text_edit: QtWidgets.QTextEdit, src_path: str, mode:
         if not (isinstance(src_path, str) and src_path):
             return
         # Determine if it's an image; if not, just insert as-is
-        if not os.path.exists(src_path) or imghdr.what(src_path) is None:
+        if not _sniff_image(src_path):
             try:
                 text_edit.textCursor().insertImage(src_path)
             except Exception:
@@ -2168,9 +2259,7 @@ def _insert_image_from_path(text_edit: QtWidgets.QTextEdit, src_path: str, mode:
             abs_probe = src_path
             if db_path and media_root and rel_or_abs and not os.path.isabs(rel_or_abs):
                 abs_probe = os.path.join(media_root, rel_or_abs)
-            img = QImage(abs_probe)
-            iw = int(img.width()) if not img.isNull() else 0
-            ih = int(img.height()) if not img.isNull() else 0
+            iw, ih = _path_image_dims(abs_probe)
         except Exception:
             iw = ih = 0
 
@@ -2245,6 +2334,124 @@ def _insert_video_via_dialog(text_edit: QtWidgets.QTextEdit, capture_seconds: fl
     )
 
 
+# OpenCV (optional) is imported on the first video insert and then reused;
+# _CV2_CHECKED records that the import was tried so a missing module costs once
+_CV2 = None
+_CV2_CHECKED = False
+
+
+def _get_cv2():
+    global _CV2, _CV2_CHECKED
+    if not _CV2_CHECKED:
+        _CV2_CHECKED = True
+        try:
+            import cv2  # type: ignore
+
+            _ = cv2.__version__
+            _CV2 = cv2
+        except Exception:
+            _CV2 = None
+    return _CV2
+
+
+def _extract_frame_with_opencv(cv2, source: str, out_jpg: str, t_sec: float) -> bool:
+    try:
+        cap = cv2.VideoCapture(source)
+        if not cap.isOpened():
+            return False
+        # Seek by time when supported
+        ok_seek = cap.set(cv2.CAP_PROP_POS_MSEC, max(0.0, float(t_sec)) * 1000.0)
+        if not ok_seek:
+            # Fallback: estimate frame index by FPS
+            fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+            idx = int(max(0.0, float(t_sec)) * float(fps))
+            cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
+        ret, frame = cap.read()
+        cap.release()
+        if not ret or frame is None:
+            return False
+        # Write JPEG
+        ok = cv2.imwrite(out_jpg, frame, [cv2.IMWRITE_JPEG_QUALITY, _VIDEO_THUMB_JPEG_QUALITY])
+        return bool(ok and os.path.exists(out_jpg))
+    except Exception:
+        return False
+
+
+# Synthetic video thumbnail: 16:9 dark frame, border, play glyph and a caption
+# bar, rendered once; each insert copies it and only draws the filename
+_VIDEO_THUMB_SIZE = (1280, 720)
+_VIDEO_THUMB_OVERLAY_H = int(_VIDEO_THUMB_SIZE[1] * 0.16)
+# Thumbnails (synthetic and extracted frames) are stored as JPEG: far cheaper to
+# encode than deflating a 1280x720 PNG, and smaller to copy into the media store
+_VIDEO_THUMB_JPEG_QUALITY = 85
+_VIDEO_THUMB_TEMPLATE = None
+
+
+def _video_thumb_cache_dir() -> str:
+    # Extracted frames are kept between sessions in the per-user cache, not the
+    # shared temp directory; falls back to temp if the cache can't be created
+    try:
+        base = QStandardPaths.writableLocation(QStandardPaths.CacheLocation)
+        if base:
+            path = os.path.join(base, "video_thumbs")
+            os.makedirs(path, exist_ok=True)
+            return path
+    except Exception:
+        pass
+    import tempfile
+
+    return tempfile.gettempdir()
+
+
+def _get_video_thumb_template() -> QImage:
+    global _VIDEO_THUMB_TEMPLATE
+    if _VIDEO_THUMB_TEMPLATE is not None:
+        return _VIDEO_THUMB_TEMPLATE
+    thumb_w, thumb_h = _VIDEO_THUMB_SIZE
+    # Painted on the CPU and only ever written to disk, so a QImage in one of
+    # QPainter's native raster formats rather than a platform pixmap
+    img = QImage(thumb_w, thumb_h, QImage.Format_RGB32)
+    img.fill(QColor(20, 20, 20))
+    p = QPainter(img)
+    try:
+        pen = QPen(QColor(0, 0, 0, 140))
+        pen.setWidth(6)
+        p.setPen(pen)
+        p.drawRect(3, 3, thumb_w - 6, thumb_h - 6)
+    except Exception:
+        pass
+    try:
+        play_size = int(min(thumb_w, thumb_h) * 0.22)
+        cx, cy = thumb_w // 2, thumb_h // 2
+        pts = [
+            QPoint(cx - play_size // 3, cy - play_size // 2),
+            QPoint(cx - play_size // 3, cy + play_size // 2),
+            QPoint(cx + play_size // 2, cy),
+        ]
+        p.setBrush(QBrush(QColor(255, 255, 255, 230)))
+        p.setPen(Qt.NoPen)
+        # Only the slanted edges of the play glyph need antialiasing; the
+        # border and caption bar are axis-aligned on whole pixels
+        p.setRenderHint(QPainter.Antialiasing, True)
+        p.drawPolygon(*pts)
+        p.setRenderHint(QPainter.Antialiasing, False)
+    except Exception:
+        pass
+    try:
+        overlay_h = _VIDEO_THUMB_OVERLAY_H
+        p.setPen(Qt.NoPen)
+        p.setBrush(QBrush(QColor(0, 0, 0, 140)))
+        p.drawRect(0, thumb_h - overlay_h, thumb_w, overlay_h)
+    except Exception:
+        pass
+    try:
+        p.end()
+    except Exception:
+        pass
+    _VIDEO_THUMB_TEMPLATE = img
+    return img
+
+
 def _insert_video_from_path(
     text_edit: QtWidgets.QTextEdit,
     src_path: str,
@@ -2280,86 +2487,37 @@ def _insert_video_from_path(
                     except Exception:
                         return 1.0
 
-                def _opencv_available() -> bool:
-                    try:
-                        import cv2  # type: ignore
-                        _ = cv2.__version__
-                        return True
-                    except Exception:
-                        return False
-
-                def _extract_frame_with_opencv(source: str, out_png: str, t_sec: float) -> bool:
-                    try:
-                        import cv2  # type: ignore
-                        cap = cv2.VideoCapture(source)
-                        if not cap.isOpened():
-                            return False
-                        # Seek by time when supported
-                        ok_seek = cap.set(cv2.CAP_PROP_POS_MSEC, max(0.0, float(t_sec)) * 1000.0)
-                        if not ok_seek:
-                            # Fallback: estimate frame index by FPS
-                            fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
-                            idx = int(max(0.0, float(t_sec)) * float(fps))
-                            cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
-                        ret, frame = cap.read()
-                        cap.release()
-                        if not ret or frame is None:
-                            return False
-                        # Write PNG
-                        ok = cv2.imwrite(out_png, frame)
-                        return bool(ok and os.path.exists(out_png))
-                    except Exception:
-                        return False
-
-                tmp_dir = tempfile.gettempdir()
-                tmp_thumb = os.path.join(tmp_dir, f"nb_thumb_{os.getpid()}_{abs(hash(src_path))}.png")
-                made_real = False
-                # Prefer OpenCV if available
                 use_sec = float(capture_seconds) if capture_seconds is not None else _video_thumb_seconds()
-                if (not force_synthetic) and _opencv_available():
-                    if _extract_frame_with_opencv(src_path, tmp_thumb, use_sec):
-                        made_real = True
+                thumb_dir = _video_thumb_cache_dir()
+                # Stable across sessions so an extracted frame is reused for the same video and
+                # time; the source's mtime and size are in the key, so a replaced file is re-read
+                st = os.stat(src_path)
+                ident = os.fsencode(src_path) + f"|{st.st_mtime_ns}|{st.st_size}|{use_sec}".encode()
+                key = hashlib.blake2b(ident, digest_size=8).hexdigest()
+                tmp_thumb = os.path.join(thumb_dir, f"nb_thumb_{key}.jpg")
+                made_real = False
+                if not force_synthetic:
+                    made_real = os.path.isfile(tmp_thumb)
+                    # Prefer OpenCV if available
+                    if not made_real:
+                        cv2 = _get_cv2()
+                        made_real = cv2 is not None and _extract_frame_with_opencv(cv2, src_path, tmp_thumb, use_sec)
                 if not made_real:
-                    # Synthetic 16:9 thumbnail with play icon and filename
-                    thumb_w, thumb_h = 1280, 720
-                    pm = QPixmap(QSize(thumb_w, thumb_h))
-                    pm.fill(QColor(20, 20, 20))
-                    p = QPainter(pm)
-                    try:
-                        p.setRenderHint(QPainter.Antialiasing, True)
-                    except Exception:
-                        pass
-                    try:
-                        pen = QPen(QColor(0, 0, 0, 140))
-                        pen.setWidth(6)
-                        p.setPen(pen)
-                        p.drawRect(3, 3, thumb_w - 6, thumb_h - 6)
-                    except Exception:
-                        pass
-                    try:
-                        play_size = int(min(thumb_w, thumb_h) * 0.22)
-                        cx, cy = thumb_w // 2, thumb_h // 2
-                        pts = [
-                            QPoint(cx - play_size // 3, cy - play_size // 2),
-                            QPoint(cx - play_size // 3, cy + play_size // 2),
-                            QPoint(cx + play_size // 2, cy),
-                        ]
-                        p.setBrush(QBrush(QColor(255, 255, 255, 230)))
-                        p.setPen(Qt.NoPen)
-                        p.drawPolygon(*pts)
-                    except Exception:
-                        pass
+                    # Synthetic 16:9 thumbnail with play icon and filename; drawn to its own
+                    # file so a cached extracted frame is not overwritten
+                    tmp_thumb = os.path.join(thumb_dir, f"nb_thumb_{key}_synthetic.jpg")
+                    thumb_w, thumb_h = _VIDEO_THUMB_SIZE
+                    overlay_h = _VIDEO_THUMB_OVERLAY_H
+                    # Copy of the shared background; only the filename is painted per insert
+                    img = QImage(_get_video_thumb_template())
+                    p = QPainter(img)
                     try:
-                        name = os.path.basename(src_path)
-                        overlay_h = int(thumb_h * 0.16)
-                        p.setPen(Qt.NoPen)
-                        p.setBrush(QBrush(QColor(0, 0, 0, 140)))
-                        p.drawRect(0, thumb_h - overlay_h, thumb_w, overlay_h)
                         p.setPen(QColor(240, 240, 240))
                         f = QFont()
                         f.setPointSizeF(max(12.0, overlay_h * 0.35))
                         f.setBold(False)
                         p.setFont(f)
+                        name = os.path.basename(src_path)
                         p.drawText(QRect(12, thumb_h - overlay_h, thumb_w - 24, overlay_h), Qt.AlignVCenter | Qt.TextSingleLine, name)
                     except Exception:
                         pass
@@ -2368,28 +2526,30 @@ def _insert_video_from_path(
                     except Exception:
                         pass
                     try:
-                        pm.save(tmp_thumb, "PNG")
+                        img.save(tmp_thumb, "JPG", _VIDEO_THUMB_JPEG_QUALITY)
                     except Exception:
                         tmp_thumb = None
 
                 rel_thumb = None
                 if tmp_thumb and os.path.exists(tmp_thumb):
                     try:
-                        _, rel_thumb = save_file_into_store(db_path, tmp_thumb, original_filename=os.path.basename(src_path) + ".thumb.png")
+                        _, rel_thumb = save_file_into_store(db_path, tmp_thumb, original_filename=os.path.basename(src_path) + ".thumb.jpg")
                     except Exception:
                         rel_thumb = None
-                    try:
-                        os.remove(tmp_thumb)
-                    except Exception:
-                        pass
+                    # Keep extracted frames for the next insert of this video; synthetic ones are cheap to redraw
+                    if not made_real:
+                        try:
+                            os.remove(tmp_thumb)
+                        except Exception:
+                            pass
 
                 if rel_thumb is not None:
                     try:
                         # Probe intrinsic size from stored file
                         abs_probe = os.path.join(media_root, rel_thumb) if not os.path.isabs(rel_thumb) else rel_thumb
-                        img_probe = QImage(abs_probe)
-                        iw = int(img_probe.width()) if not img_probe.isNull() else 1280
-                        ih = int(img_probe.height()) if not img_probe.isNull() else 720
+                        iw, ih = _path_image_dims(abs_probe)
+                        if not (iw and ih):
+                            iw, ih = 1280, 720
                         # Determine display size based on sizing mode (video sizing can use its own default)
                         try:
                             if size_mode == "original":
@@ -2449,6 +2609,14 @@ def _insert_video_from_path(
 
 
 class _ImageResizeHandler(QObject):
+    EVENTS = frozenset({
+        QEvent.MouseButtonPress,
+        QEvent.MouseMove,
+        QEvent.MouseButtonRelease,
+        QEvent.Leave,
+        QEvent.Wheel,
+    })
+
     def __init__(self, edit: QtWidgets.QTextEdit):
         super().__init__(edit)
         self._edit = edit
@@ -2480,64 +2648,38 @@ class _ImageResizeHandler(QObject):
         try:
             # Helper to detect if a cursor sits on an image char and return its image format + adjusted cursor
             def _img_info_for_cursor(cur: QTextCursor):
-                try:
-                    fmt = cur.charFormat()
-                    if fmt is None:
-                        return None
-                    if hasattr(fmt, "isImageFormat") and fmt.isImageFormat():
-                        return QTextImageFormat(fmt), QTextCursor(cur)
-                    if fmt.objectType() == QTextFormat.ImageObject:
-                        return QTextImageFormat(fmt), QTextCursor(cur)
-                    # Try previous char (common when caret is just after the image)
-                    prev = QTextCursor(cur)
-                    prev.movePosition(QTextCursor.Left)
-                    pf = prev.charFormat()
-                    if pf is not None and (
-                        (hasattr(pf, "isImageFormat") and pf.isImageFormat())
-                        or pf.objectType() == QTextFormat.ImageObject
-                    ):
-                        return QTextImageFormat(pf), QTextCursor(prev)
-                except Exception:
-                    return None
+                fmt = cur.charFormat()
+                if _is_image_fmt(fmt):
+                    return fmt.toImageFormat(), QTextCursor(cur)
+                # Try previous char (common when caret is just after the image)
+                prev = QTextCursor(cur)
+                prev.movePosition(QTextCursor.Left)
+                pf = prev.charFormat()
+                if _is_image_fmt(pf):
+                    return pf.toImageFormat(), QTextCursor(prev)
                 return None
 
             base_cursor = self._edit.cursorForPosition(pos)
-            # Build candidates safely: base, base-1, base+1
-            candidates = []
-            try:
-                c0 = QTextCursor(base_cursor)
-                candidates.append(c0)
-                c1 = QTextCursor(base_cursor)
-                c1.movePosition(QTextCursor.Left)
-                candidates.append(c1)
-                c2 = QTextCursor(base_cursor)
-                c2.movePosition(QTextCursor.Right)
-                candidates.append(c2)
-            except Exception:
-                candidates = [QTextCursor(base_cursor)]
+            # Candidates: base, base-1, base+1 (movePosition clamps at the document edges)
+            c1 = QTextCursor(base_cursor)
+            c1.movePosition(QTextCursor.Left)
+            c2 = QTextCursor(base_cursor)
+            c2.movePosition(QTextCursor.Right)
+            candidates = (QTextCursor(base_cursor), c1, c2)
 
             for candidate in candidates:
                 info = _img_info_for_cursor(candidate)
                 if info is None:
                     continue
                 imgf, c = info
-                try:
-                    name = imgf.name() if hasattr(imgf, "name") else imgf.property(QTextFormat.ImageName)
-                except Exception:
-                    name = ""
+                name = imgf.name()
 
-                # Prefer on-screen rect via adjacent cursor rectangles for accuracy
-                # cursorRect can crash on invalid positions; guard it
-                try:
-                    r1 = self._edit.cursorRect(c)
-                except Exception:
-                    continue
+                # Prefer on-screen rect via adjacent cursor rectangles for accuracy;
+                # both cursors come from the document, so their positions are valid
+                r1 = self._edit.cursorRect(c)
                 c_after = QTextCursor(c)
                 c_after.movePosition(QTextCursor.Right)
-                try:
-                    r2 = self._edit.cursorRect(c_after)
-                except Exception:
-                    continue
+                r2 = self._edit.cursorRect(c_after)
                 x_left = min(r1.left(), r2.left())
                 x_right = max(r1.left(), r2.left())
                 width_from_layout = max(0, x_right - x_left)
@@ -2546,27 +2688,15 @@ class _ImageResizeHandler(QObject):
                 h_from_layout = max(r1.height(), r2.height())
 
                 # Fallback to image format/intrinsic dims if layout width is zero
-                w = imgf.width() if hasattr(imgf, "width") and imgf.width() else 0
-                h = imgf.height() if hasattr(imgf, "height") and imgf.height() else 0
+                w = imgf.width() or 0
+                h = imgf.height() or 0
                 if (not w or not h):
-                    # Try intrinsic by loading image from media root
-                    abs_path = name
-                    try:
-                        base = getattr(self._edit.window(), "_media_root", None)
-                        if base and not os.path.isabs(name):
-                            abs_path = os.path.join(base, name)
-                        img = QImage(abs_path)
-                        if not img.isNull():
-                            w = img.width()
-                            h = img.height()
-                    except Exception:
-                        pass
-                try:
-                    iw = int(max(1, float(width_from_layout or w)))
-                    ih = int(max(1, float(h_from_layout if width_from_layout else h)))
-                except Exception:
-                    iw = int(width_from_layout or (w or 1))
-                    ih = int(h_from_layout if width_from_layout else (h or 1))
+                    # Try intrinsic size from the image header in the media root
+                    iw0, ih0 = _qimage_dims(self._edit, name)
+                    if iw0 and ih0:
+                        w, h = iw0, ih0
+                iw = int(max(1, width_from_layout or w))
+                ih = int(max(1, h_from_layout if width_from_layout else h))
 
                 # If layout didn't give a width, compute left edge from the right caret position
                 if width_from_layout == 0 and iw > 0:
@@ -2598,13 +2728,7 @@ class _ImageResizeHandler(QObject):
                 return False
             et = event.type()
             # Only process expected GUI events; otherwise, ignore
-            if et not in (
-                QEvent.MouseButtonPress,
-                QEvent.MouseMove,
-                QEvent.MouseButtonRelease,
-                QEvent.Leave,
-                QEvent.Wheel,
-            ):
+            if et not in self.EVENTS:
                 return False
             # Map position to viewport coordinates for consistent hit-testing (mouse events only)
             pos_vp = None
@@ -2780,8 +2904,9 @@ class _ImageContextMenuHandler(QObject):
             edit = self._edit
             if not _is_alive(edit):
                 return None
+            base = _resolve_base(edit)
             # Try robust shared detector first
-            info = _image_info_at_position(edit, pos_vp)
+            info = _image_info_at_position(edit, pos_vp, base=base)
             if info is not None:
                 return info
             # Expand search: scan a small neighborhood around click point
@@ -2792,38 +2917,28 @@ class _ImageContextMenuHandler(QObject):
                     pt = QPoint(int(pos_vp.x() + dx), int(pos_vp.y() + dy))
                     if rect is not None and not rect.contains(pt):
                         continue
-                    info = _image_info_at_position(edit, pt)
+                    info = _image_info_at_position(edit, pt, base=base)
                     if info is not None:
                         return info
             # As a last resort, look at cursor at/near click position and neighbors
             cur = edit.cursorForPosition(pos_vp)
             for candidate in (QTextCursor(cur),):
                 fmt = candidate.charFormat()
-                if fmt is not None and ((hasattr(fmt, "isImageFormat") and fmt.isImageFormat()) or fmt.objectType() == QTextFormat.ImageObject):
-                    imgf = QTextImageFormat(fmt)
+                if _is_image_fmt(fmt):
+                    imgf = fmt.toImageFormat()
                     return {"cursor_pos": candidate.position(), "name": imgf.name(), "w": imgf.width() or 0.0, "h": imgf.height() or 0.0}
                 prev = QTextCursor(candidate)
                 prev.movePosition(QTextCursor.Left)
                 pf = prev.charFormat()
-                if pf is not None and ((hasattr(pf, "isImageFormat") and pf.isImageFormat()) or pf.objectType() == QTextFormat.ImageObject):
-                    imgf = QTextImageFormat(pf)
+                if _is_image_fmt(pf):
+                    imgf = pf.toImageFormat()
                     return {"cursor_pos": prev.position(), "name": imgf.name(), "w": imgf.width() or 0.0, "h": imgf.height() or 0.0}
         except Exception:
             return None
         return None
 
     def _intrinsic_size(self, name: str):
-        try:
-            path = name
-            base = getattr(self._edit.window(), "_media_root", None)
-            if base and name and not os.path.isabs(name):
-                path = os.path.join(base, name)
-            img = QImage(path)
-            if not img.isNull():
-                return img.width(), img.height()
-        except Exception:
-            pass
-        return None, None
+        return _qimage_dims(self._edit, name)
 
     def _apply_size(self, cursor_pos: int, name: str, w: float, h: float):
         try:
@@ -2905,19 +3020,20 @@ class _ImageContextMenuHandler(QObject):
             except Exception:
                 pass
             # Detect image
-            info = _image_info_at_cursor(self._edit)
+            base = _resolve_base(self._edit)
+            info = _image_info_at_cursor(self._edit, base=base)
             if info is None:
                 info = self._find_image_at(pos_vp)
             if info is None:
                 try:
                     c_try = self._edit.cursorForPosition(pos_vp)
-                    info = _image_info_near_doc_pos(self._edit, c_try.position())
+                    info = _image_info_near_doc_pos(self._edit, c_try.position(), base=base)
                 except Exception:
                     pass
             if info is None:
                 try:
                     c_try = self._edit.cursorForPosition(pos_vp)
-                    info = _image_info_in_block(self._edit, c_try.block(), prefer_pos=c_try.position())
+                    info = _image_info_in_block(self._edit, c_try.block(), prefer_pos=c_try.position(), base=base)
                 except Exception:
                     pass
             if info is None:
@@ -2964,7 +3080,7 @@ class _ImageContextMenuHandler(QObject):
                 if not href:
                     blk = ctmp.block(); bc = QTextCursor(blk); bc.select(QTextCursor.BlockUnderCursor)
                     frag_html = bc.selection().toHtml()
-                    m = re.search(r"<a[^>]+href=\"([^\"]+)\"[^>]*>\s*<img[^>]*>\s*</a>", frag_html, re.IGNORECASE)
+                    m = _LINKED_IMG_HREF_RE.search(frag_html)
                     href = m.group(1) if m else None
                 if isinstance(href, str) and href.strip():
                     hv = href.strip()
@@ -2999,7 +3115,7 @@ class _ImageContextMenuHandler(QObject):
             elif rel_video and 'act_open_video' in locals() and chosen == act_open_video:
                 try:
                     base = getattr(self._edit.window(), "_media_root", None)
-                    if base and not re.match(r"^[a-zA-Z]+:|^/", rel_video):
+                    if base and not _URL_SCHEME_OR_ROOT_RE.match(rel_video):
                         abs_path = os.path.normpath(os.path.join(base, rel_video))
                         QDesktopServices.openUrl(QUrl.fromLocalFile(abs_path))
                     else:
@@ -3059,6 +3175,8 @@ class _ImageContextMenuHandler(QObject):
 
 
 class _ImageHud(QObject):
+    EVENTS = frozenset({QEvent.Resize, QEvent.Paint, QEvent.Wheel, QEvent.Scroll, QEvent.LayoutRequest})
+
     def __init__(self, edit: QtWidgets.QTextEdit):
         super().__init__(edit)
         self._edit = edit
@@ -3079,25 +3197,21 @@ class _ImageHud(QObject):
         except Exception:
             pass
         try:
-            self._vp.installEventFilter(self)
+            _route_events(edit, self._vp, self, self.EVENTS)
         except Exception:
             pass
         self._last_info = None
 
     def eventFilter(self, obj, event):
-        if obj is self._vp and event.type() in (QEvent.Resize, QEvent.Paint, QEvent.Wheel, QEvent.Scroll, QEvent.LayoutRequest):
+        if obj is self._vp and event.type() in self.EVENTS:
             self._update()
         return super().eventFilter(obj, event)
 
     def _detect(self):
         edit = self._edit
-        info = _image_info_at_cursor(edit)
-        if info is None:
-            cur = edit.textCursor()
-            info = _image_info_near_doc_pos(edit, cur.position())
-        if info is None:
-            info = _image_info_in_block(edit, edit.textCursor().block(), prefer_pos=edit.textCursor().position())
-        return info
+        # Runs on every caret move/paint: don't block on image file reads here. The
+        # caret's whole block is covered by _locate_image, so no further fallbacks
+        return _locate_image(edit, block=False, selection=False)
 
     def _update(self):
         try:
@@ -3120,6 +3234,9 @@ class _ImageHud(QObject):
     def _on_click(self):
         info = self._last_info or self._detect()
         if info:
+            if info.get("iw") is None:
+                info = dict(info)
+                info["iw"], info["ih"] = _qimage_dims(self._edit, info.get("name"))
             _image_properties_dialog_apply(self._edit, info)
 
 
@@ -3135,7 +3252,8 @@ def _install_image_hud(text_edit: QtWidgets.QTextEdit):
 
 def _install_image_context_menu(text_edit: QtWidgets.QTextEdit):
     try:
-        if text_edit is None:
+        # Once per editor; a second handler would pop a second menu
+        if text_edit is None or getattr(text_edit, "_imageContextHandlers", None):
             return
         handler = _ImageContextMenuHandler(text_edit)
         # Connect custom context menu signals from both editor and viewport
@@ -3194,7 +3312,7 @@ def _install_image_resize_handler(text_edit: QtWidgets.QTextEdit):
                 try:
                     watcher = _ResizeViewportWatcher(overlay, _sync_overlay)
                     overlay._vpWatcher = watcher  # keep a python-side ref
-                    vp.installEventFilter(watcher)
+                    _route_events(text_edit, vp, watcher, _ResizeViewportWatcher.EVENTS)
                 except Exception:
                     pass
                 # Ensure we get hover move events even without a button pressed
@@ -3202,11 +3320,11 @@ def _install_image_resize_handler(text_edit: QtWidgets.QTextEdit):
                     vp.setMouseTracking(True)
                 except Exception:
                     pass
-                vp.installEventFilter(handler)
+                _route_events(text_edit, vp, handler, _ImageResizeHandler.EVENTS)
                 # Also enable tracking and filter on the editor
                 try:
                     text_edit.setMouseTracking(True)
-                    text_edit.installEventFilter(handler)
+                    _route_events(text_edit, text_edit, handler, _ImageResizeHandler.EVENTS)
                 except Exception:
                     pass
                 # Drop overlay reference when viewport or editor is destroyed
@@ -3229,6 +3347,8 @@ def _install_image_resize_handler(text_edit: QtWidgets.QTextEdit):
 
 class _ResizeViewportWatcher(QObject):
     """Internal helper to keep an overlay synced with the viewport size."""
+    EVENTS = frozenset({QEvent.Resize, QEvent.Show, QEvent.Hide, QEvent.Wheel})
+
     def __init__(self, overlay: QtWidgets.QWidget, on_change):
         super().__init__(overlay)
         self._overlay = overlay
@@ -3236,7 +3356,7 @@ class _ResizeViewportWatcher(QObject):
 
     def eventFilter(self, obj, event):
         et = event.type()
-        if et in (QEvent.Resize, QEvent.Show, QEvent.Hide, QEvent.Wheel):
+        if et in self.EVENTS:
             try:
                 self._on_change()
             except Exception:
@@ -3302,6 +3422,15 @@ class _ImageResizeOverlay(QtWidgets.QWidget):
 
 
 # ----------------------------- Tables -----------------------------
+# QTextLength accessors resolved once (older PyQt builds lack rawValue()/type())
+_QTL_GET = QTextLength.rawValue if hasattr(QTextLength, "rawValue") else QTextLength.value
+_QTL_TYPE = QTextLength.type if hasattr(QTextLength, "type") else (lambda _length: None)
+
+# Block format merged into currency/planning cells to right-align them
+_RIGHT_ALIGN_BFMT = QTextBlockFormat()
+_RIGHT_ALIGN_BFMT.setAlignment(Qt.AlignRight)
+
+
 def _current_table(text_edit: QtWidgets.QTextEdit):
     try:
         cur = text_edit.textCursor()
@@ -3394,10 +3523,8 @@ def _enforce_uniform_table_borders(text_edit: QtWidgets.QTextEdit):
                             fmt.setBorderBrush(QBrush(QColor(grid_hex)))
                         except Exception:
                             pass
-                        try:
+                        if _HAS_BORDER_STYLE:
                             fmt.setBorderStyle(QTextFrameFormat.BorderStyle_Solid)
-                        except Exception:
-                            pass
                         tbl.setFormat(fmt)
                     except Exception:
                         pass
@@ -3422,10 +3549,8 @@ def _enforce_uniform_table_borders(text_edit: QtWidgets.QTextEdit):
                                     tcf.setBorderBrush(QBrush(QColor(grid_hex)))
                                 except Exception:
                                     pass
-                                try:
+                                if _HAS_BORDER_STYLE:
                                     tcf.setBorderStyle(QTextFrameFormat.BorderStyle_Solid)
-                                except Exception:
-                                    pass
                                 cell.setFormat(tcf)
                             except Exception:
                                 pass
@@ -3466,6 +3591,12 @@ def insert_table_from_preset(text_edit: QtWidgets.QTextEdit, preset_name: str, f
     html = data.get("html") if isinstance(data, dict) else None
     if isinstance(html, str) and html.strip():
         cur = text_edit.textCursor()
+        # Outer container geometry, built once and reused by every enforcement pass below
+        full_width = QTextLength(QTextLength.PercentageLength, 100.0)
+        half_split = [
+            QTextLength(QTextLength.PercentageLength, 50.0),
+            QTextLength(QTextLength.PercentageLength, 50.0),
+        ]
         # If we're already inside an outer 1x2 container, reuse it to avoid nesting
         reuse_outer = False
         existing_table = cur.currentTable()
@@ -3486,26 +3617,16 @@ def insert_table_from_preset(text_edit: QtWidgets.QTextEdit, preset_name: str, f
             outer_fmt.setCellSpacing(0)
             outer_fmt.setBorder(1.0)
             try:
-                outer_fmt.setWidth(QTextLength(QTextLength.PercentageLength, 100.0))
-                outer_fmt.setColumnWidthConstraints(
-                    [
-                        QTextLength(QTextLength.PercentageLength, 50.0),
-                        QTextLength(QTextLength.PercentageLength, 50.0),
-                    ]
-                )
+                outer_fmt.setWidth(full_width)
+                outer_fmt.setColumnWidthConstraints(half_split)
             except Exception:
                 pass
             outer = cur.insertTable(1, 2, outer_fmt)
             # Re-apply format immediately to guard against layout quirks
             try:
                 fmt_chk = outer.format()
-                fmt_chk.setWidth(QTextLength(QTextLength.PercentageLength, 100.0))
-                fmt_chk.setColumnWidthConstraints(
-                    [
-                        QTextLength(QTextLength.PercentageLength, 50.0),
-                        QTextLength(QTextLength.PercentageLength, 50.0),
-                    ]
-                )
+                fmt_chk.setWidth(full_width)
+                fmt_chk.setColumnWidthConstraints(half_split)
                 outer.setFormat(fmt_chk)
             except Exception:
                 pass
@@ -3513,13 +3634,8 @@ def insert_table_from_preset(text_edit: QtWidgets.QTextEdit, preset_name: str, f
             # Ensure the existing container is full width with 50/50 columns
             try:
                 fmt = outer.format()
-                fmt.setWidth(QTextLength(QTextLength.PercentageLength, 100.0))
-                fmt.setColumnWidthConstraints(
-                    [
-                        QTextLength(QTextLength.PercentageLength, 50.0),
-                        QTextLength(QTextLength.PercentageLength, 50.0),
-                    ]
-                )
+                fmt.setWidth(full_width)
+                fmt.setColumnWidthConstraints(half_split)
                 outer.setFormat(fmt)
             except Exception:
                 pass
@@ -3530,7 +3646,6 @@ def insert_table_from_preset(text_edit: QtWidgets.QTextEdit, preset_name: str, f
             left_cur.insertHtml(html)
             # Ensure the inserted left table fills the cell and uses 50/25/25 columns
             try:
-                from PyQt5.QtGui import QTextLength
                 from ui_planning_register import _is_planning_register_table
 
                 # Find first table inside the left cell range
@@ -3620,13 +3735,8 @@ def insert_table_from_preset(text_edit: QtWidgets.QTextEdit, preset_name: str, f
         # Final enforcement: make sure the outer container is full-width with 50/50 split.
         try:
             fmt_final = outer.format()
-            fmt_final.setWidth(QTextLength(QTextLength.PercentageLength, 100.0))
-            fmt_final.setColumnWidthConstraints(
-                [
-                    QTextLength(QTextLength.PercentageLength, 50.0),
-                    QTextLength(QTextLength.PercentageLength, 50.0),
-                ]
-            )
+            fmt_final.setWidth(full_width)
+            fmt_final.setColumnWidthConstraints(half_split)
             outer.setFormat(fmt_final)
         except Exception:
             pass
@@ -3833,9 +3943,7 @@ def _table_insert_dialog(text_edit: QtWidgets.QTextEdit):
     form.addRow("Cell padding:", sp_pad)
     form.addRow("Cell spacing:", sp_space)
     form.addRow("Table width (% of editor):", sp_width)
-    btns = QtWidgets.QDialogButtonBox(
-        QtWidgets.QDialogButtonBox.Ok | QtWidgets.QDialogButtonBox.Cancel, parent=dlg
-    )
+    btns = QtWidgets.QDialogButtonBox(_OK_CANCEL, parent=dlg)
     form.addRow(btns)
     btns.accepted.connect(dlg.accept)
     btns.rejected.connect(dlg.reject)
@@ -3890,16 +3998,14 @@ def _table_properties_dialog(text_edit: QtWidgets.QTextEdit, table):
     # Pre-fill from existing width; fallback estimate if fixed
     try:
         wlen = fmt.width()
-        # PyQt QTextLength exposes type() and value() or rawValue()
-        wtype = wlen.type() if hasattr(wlen, "type") else None
-        if wtype == wlen.PercentageLength:
-            val = wlen.rawValue() if hasattr(wlen, "rawValue") else wlen.value()
-            sp_width.setValue(float(val))
+        wtype = _QTL_TYPE(wlen)
+        if wtype == QTextLength.PercentageLength:
+            sp_width.setValue(float(_QTL_GET(wlen)))
         else:
             # Approximate percent from viewport width
             vp = text_edit.viewport() if hasattr(text_edit, "viewport") else None
             vw = float(vp.width()) if vp is not None else 1.0
-            v = wlen.value() if hasattr(wlen, "value") else 0.0
+            v = _QTL_GET(wlen)
             pct = max(10.0, min(100.0, (float(v) / vw) * 100.0 if vw > 1.0 and v else 100.0))
             sp_width.setValue(pct)
     except Exception:
@@ -3908,9 +4014,7 @@ def _table_properties_dialog(text_edit: QtWidgets.QTextEdit, table):
     form.addRow("Cell padding:", sp_pad)
     form.addRow("Cell spacing:", sp_space)
     form.addRow("Table width (% of editor):", sp_width)
-    btns = QtWidgets.QDialogButtonBox(
-        QtWidgets.QDialogButtonBox.Ok | QtWidgets.QDialogButtonBox.Cancel, parent=dlg
-    )
+    btns = QtWidgets.QDialogButtonBox(_OK_CANCEL, parent=dlg)
     form.addRow(btns)
     btns.accepted.connect(dlg.accept)
     btns.rejected.connect(dlg.reject)
@@ -3920,8 +4024,6 @@ def _table_properties_dialog(text_edit: QtWidgets.QTextEdit, table):
     fmt.setCellPadding(sp_pad.value())
     fmt.setCellSpacing(sp_space.value())
     try:
-        from PyQt5.QtGui import QTextLength
-
         fmt.setWidth(QTextLength(QTextLength.PercentageLength, sp_width.value()))
     except Exception:
         pass
@@ -3948,8 +4050,6 @@ def _table_refresh_currency_alignment_after_col_change(text_edit: QtWidgets.QTex
         currency_cols = _detect_currency_columns(table)
         if not currency_cols:
             return
-        from PyQt5.QtCore import Qt as _Qt
-        from PyQt5.QtGui import QTextBlockFormat as _QTextBlockFormat
         rows = table.rows()
         for c in currency_cols:
             for r in range(1, rows):  # Skip header row
@@ -3958,19 +4058,7 @@ def _table_refresh_currency_alignment_after_col_change(text_edit: QtWidgets.QTex
                     if not cell.isValid():
                         continue
                     # Apply right-alignment to all blocks in the cell
-                    start_pos = cell.firstCursorPosition().position()
-                    end_pos = cell.lastCursorPosition().position()
-                    from PyQt5.QtGui import QTextCursor as _QTextCursor
-                    cur = _QTextCursor(text_edit.document())
-                    cur.setPosition(start_pos)
-                    while cur.position() <= end_pos:
-                        bf = _QTextBlockFormat()
-                        bf.setAlignment(_Qt.AlignRight)
-                        cur.mergeBlockFormat(bf)
-                        if cur.position() == end_pos:
-                            break
-                        if not cur.movePosition(_QTextCursor.NextBlock):
-                            break
+                    _right_align_cell_blocks(cell)
                 except Exception:
                     pass
     except Exception:
@@ -4004,6 +4092,10 @@ def _table_add_remove(text_edit: QtWidgets.QTextEdit, action: str):
         _table_refresh_currency_alignment_after_col_change(text_edit, tbl)
 
 
+# Row action labels for the table context menu when a single row is selected
+_ROW_LABELS_1 = ("Insert Row Above (1)", "Insert Row Below (1)", "Remove Selected Row")
+
+
 class _TableContextMenu(QObject):
     def __init__(self, edit: QtWidgets.QTextEdit):
         super().__init__(edit)
@@ -4028,265 +4120,266 @@ class _TableContextMenu(QObject):
         self._viewport = None
 
     def eventFilter(self, obj, event):
+        # Guard clauses keep the common non-context-menu path to a few compares
+        if event.type() != QEvent.ContextMenu:
+            return False
+        if obj is not self._edit and obj is not self._viewport:
+            return False
         if self._edit is None:
             return False
-        if (
-            obj is self._edit or (self._viewport is not None and obj is self._viewport)
-        ) and event.type() == QEvent.ContextMenu:
-            pos = event.pos()
-            # Position reported is in obj coords; map to the edit for cursor and to global for menu
-            try:
-                if obj is self._edit:
-                    widget_pos = pos
-                    global_pos = self._edit.mapToGlobal(pos)
-                else:
-                    # obj is viewport
-                    widget_pos = pos  # QTextEdit accepts viewport coords for cursorForPosition
-                    global_pos = obj.mapToGlobal(pos)
-            except Exception:
+        pos = event.pos()
+        # Position reported is in obj coords; map to the edit for cursor and to global for menu
+        try:
+            if obj is self._edit:
                 widget_pos = pos
-                try:
-                    global_pos = self._edit.mapToGlobal(pos)
-                except Exception:
-                    return False
-            # Capture original selection and table BEFORE making any cursor changes
-            orig_cur = self._edit.textCursor()
-            orig_tbl = orig_cur.currentTable()
-            # Compute selection rectangle from original selection (do not disturb selection)
-            orig_rect = _table_selection_rect(self._edit, orig_tbl)
-
-            # First priority: if click is on/near an image, show image menu and consume
-            try:
-                # Try detection chain (prioritize clicked position to avoid disturbing selection)
-                info = _image_info_at_position(self._edit, widget_pos)
-                if info is None:
-                    # Fallbacks that don't require changing the current selection
-                    try:
-                        c_try = self._edit.cursorForPosition(widget_pos)
-                        info = _image_info_near_doc_pos(self._edit, c_try.position())
-                    except Exception:
-                        pass
-                if info is None:
-                    try:
-                        info = _image_info_in_block(self._edit, self._edit.textCursor().block(), prefer_pos=self._edit.textCursor().position())
-                    except Exception:
-                        pass
-                if info is not None:
-                    menu = QtWidgets.QMenu(self._edit)
-                    cursor_pos = int(info.get("cursor_pos", 0))
-                    name = info.get("name", "")
-                    cur_w = float(info.get("w") or 0.0)
-                    cur_h = float(info.get("h") or 0.0)
-                    act_resize = menu.addAction("Image Properties…")
-                    menu.addSeparator()
-                    act_fit = menu.addAction("Fit to editor width")
-                    act_reset = menu.addAction("Reset to original size")
-                    chosen = menu.exec_(global_pos)
-                    if chosen is not None:
-                        if chosen == act_resize:
-                            iw, ih = (None, None)
-                            try:
-                                iw, ih = _ImageContextMenuHandler(self._edit)._intrinsic_size(name)
-                            except Exception:
-                                pass
-                            info_d = {"cursor_pos": cursor_pos, "name": name, "w": cur_w, "h": cur_h, "iw": iw, "ih": ih}
-                            _image_properties_dialog_apply(self._edit, info_d)
-                        elif chosen == act_fit:
-                            try:
-                                _ImageContextMenuHandler(self._edit)._fit_to_width(cursor_pos, name)
-                            except Exception:
-                                pass
-                        elif chosen == act_reset:
-                            try:
-                                _ImageContextMenuHandler(self._edit)._reset_size(cursor_pos, name)
-                            except Exception:
-                                pass
-                    return True
-            except Exception:
-                pass
-            # Also capture clicked cell context
+                global_pos = self._edit.mapToGlobal(pos)
+            else:
+                # obj is viewport
+                widget_pos = pos  # QTextEdit accepts viewport coords for cursorForPosition
+                global_pos = obj.mapToGlobal(pos)
+        except Exception:
+            widget_pos = pos
             try:
-                clicked_cur = self._edit.cursorForPosition(widget_pos)
+                global_pos = self._edit.mapToGlobal(pos)
             except Exception:
-                clicked_cur = orig_cur
-            clicked_tbl = clicked_cur.currentTable()
-            # Choose active table for the menu: prefer the one with a valid selection rect
-            tbl = orig_tbl if (orig_tbl is not None and orig_rect is not None) else clicked_tbl
-            # When not over a table, show standard context menu with spell suggestions
-            if tbl is None:
+                return False
+        # Capture original selection and table BEFORE making any cursor changes
+        orig_cur = self._edit.textCursor()
+        orig_tbl = orig_cur.currentTable()
+        # Compute selection rectangle from original selection (do not disturb selection)
+        orig_rect = _table_selection_rect(self._edit, orig_tbl)
+
+        # First priority: if click is on/near an image, show image menu and consume
+        try:
+            # Try detection chain (prioritize clicked position to avoid disturbing selection)
+            base = _resolve_base(self._edit)
+            info = _image_info_at_position(self._edit, widget_pos, base=base)
+            if info is None:
+                # Fallbacks that don't require changing the current selection
                 try:
-                    menu = self._edit.createStandardContextMenu()
+                    c_try = self._edit.cursorForPosition(widget_pos)
+                    info = _image_info_near_doc_pos(self._edit, c_try.position(), base=base)
                 except Exception:
-                    menu = QtWidgets.QMenu(self._edit)
-                # Add spell suggestions at the top of the menu
+                    pass
+            if info is None:
                 try:
-                    from spell_check import get_spell_checker
-                    spell_checker = get_spell_checker(self._edit)
-                    if spell_checker and spell_checker.enabled:
-                        spell_checker._add_spell_suggestions_to_menu(menu, prepend=True, pos=widget_pos)
+                    tcur = self._edit.textCursor()
+                    info = _image_info_in_block(self._edit, tcur.block(), prefer_pos=tcur.position(), base=base)
                 except Exception:
                     pass
-                sub_ins = menu.addMenu("Insert")
-                act_ins_table = sub_ins.addAction("Table…")
-                # Insert Planning Register (dialog) under Insert submenu
-                act_ins_pr_dialog = sub_ins.addAction("Planning Register…")
+            if info is not None:
+                menu = QtWidgets.QMenu(self._edit)
+                cursor_pos = int(info.get("cursor_pos", 0))
+                name = info.get("name", "")
+                cur_w = float(info.get("w") or 0.0)
+                cur_h = float(info.get("h") or 0.0)
+                act_resize = menu.addAction("Image Properties…")
+                menu.addSeparator()
+                act_fit = menu.addAction("Fit to editor width")
+                act_reset = menu.addAction("Reset to original size")
                 chosen = menu.exec_(global_pos)
-                if chosen is None:
-                    return True
-                if chosen == act_ins_table:
-                    _table_insert_dialog(self._edit)
-                    return True
-                if chosen == act_ins_pr_dialog:
-                    try:
-                        from ui_richtext import insert_planning_register_via_dialog
-
-                        # window is parent of the editor; walk up to QMainWindow
-                        w = self._edit.window()
-                        insert_planning_register_via_dialog(w)
-                    except Exception:
-                        pass
-                    return True
+                if chosen is not None:
+                    if chosen == act_resize:
+                        iw, ih = (None, None)
+                        try:
+                            iw, ih = _qimage_dims(self._edit, name)
+                        except Exception:
+                            pass
+                        info_d = {"cursor_pos": cursor_pos, "name": name, "w": cur_w, "h": cur_h, "iw": iw, "ih": ih}
+                        _image_properties_dialog_apply(self._edit, info_d)
+                    elif chosen == act_fit:
+                        try:
+                            _ImageContextMenuHandler(self._edit)._fit_to_width(cursor_pos, name)
+                        except Exception:
+                            pass
+                    elif chosen == act_reset:
+                        try:
+                            _ImageContextMenuHandler(self._edit)._reset_size(cursor_pos, name)
+                        except Exception:
+                            pass
                 return True
-            # Otherwise, build the full table menu
-            menu = QtWidgets.QMenu(self._edit)
-            # Add spell suggestions at the top if word is misspelled
+        except Exception:
+            pass
+        # Also capture clicked cell context
+        try:
+            clicked_cur = self._edit.cursorForPosition(widget_pos)
+        except Exception:
+            clicked_cur = orig_cur
+        clicked_tbl = clicked_cur.currentTable()
+        # Choose active table for the menu: prefer the one with a valid selection rect
+        tbl = orig_tbl if (orig_tbl is not None and orig_rect is not None) else clicked_tbl
+        # When not over a table, show standard context menu with spell suggestions
+        if tbl is None:
+            try:
+                menu = self._edit.createStandardContextMenu()
+            except Exception:
+                menu = QtWidgets.QMenu(self._edit)
+            # Add spell suggestions at the top of the menu
             try:
                 from spell_check import get_spell_checker
                 spell_checker = get_spell_checker(self._edit)
                 if spell_checker and spell_checker.enabled:
-                    spell_checker._add_spell_suggestions_to_menu(menu, prepend=False, pos=widget_pos)
+                    spell_checker._add_spell_suggestions_to_menu(menu, prepend=True, pos=widget_pos)
             except Exception:
                 pass
-            # Precompute selection rectangle early (for multi-column operations)
-            sel_rect = _table_selection_rect(self._edit, tbl)
-            # Insert submenu with Table and Planning Register
             sub_ins = menu.addMenu("Insert")
-            act_ins = sub_ins.addAction("Table…")
-            act_prop = menu.addAction("Table Properties…")
-            act_fit = menu.addAction("Fit Table to Width")
-            act_dist = menu.addAction("Distribute Columns Evenly")
-            act_set_col = menu.addAction("Set Current Column Width…")
-            menu.addSeparator()
-            act_save_preset = menu.addAction("Save Table as Preset…")
+            act_ins_table = sub_ins.addAction("Table…")
             # Insert Planning Register (dialog) under Insert submenu
             act_ins_pr_dialog = sub_ins.addAction("Planning Register…")
-            menu.addSeparator()
-            # Currency column helper
-            act_mark_currency = menu.addAction("Mark Column(s) as Currency + Total")
-            menu.addSeparator()
-            # Determine multi-cell selection rectangle (within chosen table)
-            sel_rows = (sel_rect[2] - sel_rect[0] + 1) if sel_rect is not None else 1
-            # Dynamic labels reflecting selection count
-            act_row_above = menu.addAction(
-                f"Insert Row{'s' if sel_rows>1 else ''} Above ({sel_rows})"
-            )
-            act_row_below = menu.addAction(
-                f"Insert Row{'s' if sel_rows>1 else ''} Below ({sel_rows})"
-            )
-            act_col_left = menu.addAction("Insert Column Left")
-            act_col_right = menu.addAction("Insert Column Right")
-            act_rm_row = menu.addAction(f"Remove Selected Row{'s' if sel_rows>1 else ''}")
-            act_rm_col = menu.addAction("Remove Column")
-            act_clear_cells = menu.addAction("Clear Selected Cells")
-            # Enable/disable depending on context
-            has_tbl = tbl is not None
-            act_prop.setEnabled(has_tbl)
-            act_fit.setEnabled(has_tbl)
-            act_dist.setEnabled(has_tbl)
-            act_set_col.setEnabled(has_tbl)
-            act_row_above.setEnabled(has_tbl)
-            act_row_below.setEnabled(has_tbl)
-            act_col_left.setEnabled(has_tbl)
-            act_col_right.setEnabled(has_tbl)
-            act_rm_row.setEnabled(has_tbl)
-            act_rm_col.setEnabled(has_tbl)
-            act_clear_cells.setEnabled(has_tbl and sel_rect is not None)
             chosen = menu.exec_(global_pos)
             if chosen is None:
                 return True
-            if chosen == act_ins:
+            if chosen == act_ins_table:
                 _table_insert_dialog(self._edit)
-            elif chosen == act_ins_pr_dialog:
+                return True
+            if chosen == act_ins_pr_dialog:
                 try:
-                    from ui_richtext import insert_planning_register_via_dialog
-
+                    # window is parent of the editor; walk up to QMainWindow
                     w = self._edit.window()
                     insert_planning_register_via_dialog(w)
                 except Exception:
                     pass
-            elif chosen == act_mark_currency and has_tbl:
-                # Get clicked cell column explicitly to avoid stale rect issues
-                clicked_col = None
-                try:
-                    self._edit.setTextCursor(clicked_cur)
-                    clicked_cell = tbl.cellAt(clicked_cur)
-                    if clicked_cell.isValid():
-                        clicked_col = clicked_cell.column()
-                except Exception:
-                    pass
-                # Recompute sel_rect after cursor update
-                fresh_rect = _table_selection_rect(self._edit, tbl)
-                try:
-                    _table_mark_currency_columns(self._edit, tbl, fresh_rect, clicked_col)
-                except Exception:
-                    pass
-            elif chosen == act_prop and has_tbl:
-                _table_properties_dialog(self._edit, tbl)
-            elif chosen == act_fit and has_tbl:
-                _table_fit_width(tbl)
-            elif chosen == act_dist and has_tbl:
-                _table_distribute_columns(tbl)
-            elif chosen == act_set_col and has_tbl:
-                # For column-based actions, position the caret to clicked cell to define the column
+                return True
+            return True
+        # Otherwise, build the full table menu
+        menu = QtWidgets.QMenu(self._edit)
+        # Add spell suggestions at the top if word is misspelled
+        try:
+            from spell_check import get_spell_checker
+            spell_checker = get_spell_checker(self._edit)
+            if spell_checker and spell_checker.enabled:
+                spell_checker._add_spell_suggestions_to_menu(menu, prepend=False, pos=widget_pos)
+        except Exception:
+            pass
+        # Precompute selection rectangle early (for multi-column operations)
+        sel_rect = _table_selection_rect(self._edit, tbl)
+        # Insert submenu with Table and Planning Register
+        sub_ins = menu.addMenu("Insert")
+        act_ins = sub_ins.addAction("Table…")
+        act_prop = menu.addAction("Table Properties…")
+        act_fit = menu.addAction("Fit Table to Width")
+        act_dist = menu.addAction("Distribute Columns Evenly")
+        act_set_col = menu.addAction("Set Current Column Width…")
+        menu.addSeparator()
+        act_save_preset = menu.addAction("Save Table as Preset…")
+        # Insert Planning Register (dialog) under Insert submenu
+        act_ins_pr_dialog = sub_ins.addAction("Planning Register…")
+        menu.addSeparator()
+        # Currency column helper
+        act_mark_currency = menu.addAction("Mark Column(s) as Currency + Total")
+        menu.addSeparator()
+        # Determine multi-cell selection rectangle (within chosen table)
+        sel_rows = (sel_rect[2] - sel_rect[0] + 1) if sel_rect is not None else 1
+        # Dynamic labels reflecting selection count (static labels for the common single-row case)
+        if sel_rows == 1:
+            row_labels = _ROW_LABELS_1
+        else:
+            row_labels = (
+                f"Insert Rows Above ({sel_rows})",
+                f"Insert Rows Below ({sel_rows})",
+                "Remove Selected Rows",
+            )
+        act_row_above = menu.addAction(row_labels[0])
+        act_row_below = menu.addAction(row_labels[1])
+        # Column actions carry their _table_add_remove op name so they dispatch through one branch
+        act_col_left = menu.addAction("Insert Column Left")
+        act_col_left.setData("col_left")
+        act_col_right = menu.addAction("Insert Column Right")
+        act_col_right.setData("col_right")
+        act_rm_row = menu.addAction(row_labels[2])
+        act_rm_col = menu.addAction("Remove Column")
+        act_rm_col.setData("remove_col")
+        act_clear_cells = menu.addAction("Clear Selected Cells")
+        # Enable/disable depending on context
+        has_tbl = tbl is not None
+        act_prop.setEnabled(has_tbl)
+        act_fit.setEnabled(has_tbl)
+        act_dist.setEnabled(has_tbl)
+        act_set_col.setEnabled(has_tbl)
+        act_row_above.setEnabled(has_tbl)
+        act_row_below.setEnabled(has_tbl)
+        act_col_left.setEnabled(has_tbl)
+        act_col_right.setEnabled(has_tbl)
+        act_rm_row.setEnabled(has_tbl)
+        act_rm_col.setEnabled(has_tbl)
+        act_clear_cells.setEnabled(has_tbl and sel_rect is not None)
+        chosen = menu.exec_(global_pos)
+        if chosen is None:
+            return True
+        if chosen == act_ins:
+            _table_insert_dialog(self._edit)
+        elif chosen == act_ins_pr_dialog:
+            try:
+                w = self._edit.window()
+                insert_planning_register_via_dialog(w)
+            except Exception:
+                pass
+        elif chosen == act_mark_currency and has_tbl:
+            # Get clicked cell column explicitly to avoid stale rect issues
+            clicked_col = None
+            try:
+                self._edit.setTextCursor(clicked_cur)
+                clicked_cell = tbl.cellAt(clicked_cur)
+                if clicked_cell.isValid():
+                    clicked_col = clicked_cell.column()
+            except Exception:
+                pass
+            # Recompute sel_rect after cursor update
+            fresh_rect = _table_selection_rect(self._edit, tbl)
+            try:
+                _table_mark_currency_columns(self._edit, tbl, fresh_rect, clicked_col)
+            except Exception:
+                pass
+        elif chosen == act_prop and has_tbl:
+            _table_properties_dialog(self._edit, tbl)
+        elif chosen == act_fit and has_tbl:
+            _table_fit_width(tbl)
+        elif chosen == act_dist and has_tbl:
+            _table_distribute_columns(tbl)
+        elif chosen == act_set_col and has_tbl:
+            # For column-based actions, position the caret to clicked cell to define the column
+            try:
+                self._edit.setTextCursor(clicked_cur)
+            except Exception:
+                pass
+            _table_set_current_column_width(self._edit, tbl)
+        elif chosen == act_save_preset and has_tbl:
+            # Use the centralized HTML-based saver so data and styles are preserved
+            try:
+                save_current_table_as_preset(self._edit)
+            except Exception:
+                pass
+        elif has_tbl:
+            col_op = chosen.data()
+            if col_op:
+                # Column ops act on the clicked cell's column
                 try:
                     self._edit.setTextCursor(clicked_cur)
                 except Exception:
                     pass
-                _table_set_current_column_width(self._edit, tbl)
-            elif chosen == act_save_preset and has_tbl:
-                # Use the centralized HTML-based saver so data and styles are preserved
-                try:
-                    save_current_table_as_preset(self._edit)
-                except Exception:
-                    pass
-            elif has_tbl:
-                if chosen == act_row_above:
-                    _table_insert_rows_from_selection(self._edit, tbl, sel_rect, above=True)
-                elif chosen == act_row_below:
-                    _table_insert_rows_from_selection(self._edit, tbl, sel_rect, above=False)
-                elif chosen == act_col_left:
-                    try:
-                        self._edit.setTextCursor(clicked_cur)
-                    except Exception:
-                        pass
-                    _table_add_remove(self._edit, "col_left")
-                elif chosen == act_col_right:
-                    try:
-                        self._edit.setTextCursor(clicked_cur)
-                    except Exception:
-                        pass
-                    _table_add_remove(self._edit, "col_right")
-                elif chosen == act_rm_row:
-                    _table_remove_rows_from_selection(self._edit, tbl, sel_rect)
-                elif chosen == act_rm_col:
-                    try:
-                        self._edit.setTextCursor(clicked_cur)
-                    except Exception:
-                        pass
-                    _table_add_remove(self._edit, "remove_col")
-                elif chosen == act_clear_cells and sel_rect is not None:
-                    _table_clear_selected_cells(self._edit, tbl, sel_rect)
-            return True
-        return super().eventFilter(obj, event)
+                _table_add_remove(self._edit, col_op)
+            elif chosen == act_row_above:
+                _table_insert_rows_from_selection(
+                    self._edit, tbl, sel_rect, above=True, fallback_cur=orig_cur
+                )
+            elif chosen == act_row_below:
+                _table_insert_rows_from_selection(
+                    self._edit, tbl, sel_rect, above=False, fallback_cur=orig_cur
+                )
+            elif chosen == act_rm_row:
+                _table_remove_rows_from_selection(self._edit, tbl, sel_rect, fallback_cur=orig_cur)
+            elif chosen == act_clear_cells and sel_rect is not None:
+                _table_clear_selected_cells(self._edit, tbl, sel_rect)
+        return True
 
 
 def _install_table_context_menu(text_edit: QtWidgets.QTextEdit):
     handler = _TableContextMenu(text_edit)
-    text_edit.installEventFilter(handler)
+    _route_events(text_edit, text_edit, handler, (QEvent.ContextMenu,))
     try:
         vp = text_edit.viewport()
         if vp is not None:
-            vp.installEventFilter(handler)
+            _route_events(text_edit, vp, handler, (QEvent.ContextMenu,))
     except Exception:
         pass
     if not hasattr(text_edit, "_tableCtx"):  # keep references
@@ -4296,29 +4389,25 @@ def _install_table_context_menu(text_edit: QtWidgets.QTextEdit):
 
 def _table_selection_rect(text_edit: QtWidgets.QTextEdit, table):
     """Return (r0,c0,r1,c1) rectangle for current selection within table; None if selection not in table."""
-    try:
-        if table is None:
-            return None
-        cur = text_edit.textCursor()
-        a = cur.anchor()
-        p = cur.position()
-        c1 = table.cellAt(min(a, p))
-        c2 = table.cellAt(max(a, p))
-        if not c1.isValid() or not c2.isValid():
-            # If no selection, use current cell
-            c = table.cellAt(cur)
-            if not c.isValid():
-                return None
-            r = c.row()
-            ccol = c.column()
-            return (r, ccol, r, ccol)
-        r0 = min(c1.row(), c2.row())
-        r1 = max(c1.row(), c2.row())
-        c0 = min(c1.column(), c2.column())
-        c1i = max(c1.column(), c2.column())
-        return (r0, c0, r1, c1i)
-    except Exception:
+    if table is None or text_edit is None:
         return None
+    cur = text_edit.textCursor()
+    a = cur.anchor()
+    p = cur.position()
+    lo, hi = (a, p) if a <= p else (p, a)
+    c1 = table.cellAt(lo)
+    c2 = table.cellAt(hi)
+    if not (c1.isValid() and c2.isValid()):
+        # If no selection, use current cell
+        c = table.cellAt(cur)
+        if not c.isValid():
+            return None
+        r = c.row()
+        ccol = c.column()
+        return (r, ccol, r, ccol)
+    r0, r1 = sorted((c1.row(), c2.row()))
+    c0, c1i = sorted((c1.column(), c2.column()))
+    return (r0, c0, r1, c1i)
 
 
 def _table_clear_selected_cells(text_edit: QtWidgets.QTextEdit, table, rect):
@@ -4340,17 +4429,21 @@ def _table_clear_selected_cells(text_edit: QtWidgets.QTextEdit, table, rect):
                 pass
 
 
-def _table_insert_rows_from_selection(text_edit: QtWidgets.QTextEdit, table, rect, above: bool):
-    cur = text_edit.textCursor()
-    cell = table.cellAt(cur)
-    if not cell.isValid():
-        return
-    base_row = cell.row()
-    count = 1
+def _table_insert_rows_from_selection(
+    text_edit: QtWidgets.QTextEdit, table, rect, above: bool, fallback_cur=None
+):
+    # fallback_cur: cursor the caller already holds, used only when there is no rect
     if rect is not None:
         r0, _c0, r1, _c1 = rect
         count = max(1, r1 - r0 + 1)
         base_row = r0 if above else (r1 + 1)
+    else:
+        cur = fallback_cur if fallback_cur is not None else text_edit.textCursor()
+        cell = table.cellAt(cur)
+        if not cell.isValid():
+            return
+        base_row = cell.row()
+        count = 1
     # Capture context about header/totals position before insert
     try:
         rows_before = table.rows()
@@ -4385,8 +4478,7 @@ def _table_insert_rows_from_selection(text_edit: QtWidgets.QTextEdit, table, rec
         try:
             from ui_planning_register import _is_planning_register_table, _is_cost_list_table, _is_protected_cell
 
-            bf = QTextBlockFormat()
-            bf.setAlignment(Qt.AlignRight)
+            bf = _RIGHT_ALIGN_BFMT
             rows_total = table.rows()
             r_start = max(0, base_row)
             r_end = min(rows_total - 1, base_row + count - 1)
@@ -4421,8 +4513,7 @@ def _table_insert_rows_from_selection(text_edit: QtWidgets.QTextEdit, table, rec
         try:
             currency_cols = _detect_currency_columns(table)
             if currency_cols:
-                bf = QTextBlockFormat()
-                bf.setAlignment(Qt.AlignRight)
+                bf = _RIGHT_ALIGN_BFMT
                 rows_total = table.rows()
                 r_start = max(0, base_row)
                 r_end = min(rows_total - 1, base_row + count - 1)
@@ -4444,11 +4535,13 @@ def _table_insert_rows_from_selection(text_edit: QtWidgets.QTextEdit, table, rec
         pass
 
 
-def _table_remove_rows_from_selection(text_edit: QtWidgets.QTextEdit, table, rect):
-    cur = text_edit.textCursor()
-    cell = table.cellAt(cur)
-    if rect is None or not cell.isValid():
+def _table_remove_rows_from_selection(
+    text_edit: QtWidgets.QTextEdit, table, rect, fallback_cur=None
+):
+    if rect is None:
         # Remove current row
+        cur = fallback_cur if fallback_cur is not None else text_edit.textCursor()
+        cell = table.cellAt(cur)
         try:
             table.removeRows(cell.row(), 1)
         except Exception:
@@ -4518,8 +4611,8 @@ def _table_set_current_column_width(text_edit: QtWidgets.QTextEdit, table):
     col_idx = cell.column()
     cols = table.columns()
     fmt = table.format()
-    constraints = list(fmt.columnWidthConstraints()) or []
-    if not constraints or len(constraints) != cols:
+    constraints = list(fmt.columnWidthConstraints())
+    if len(constraints) != cols:
         constraints = [QTextLength(QTextLength.PercentageLength, 100.0 / cols) for _ in range(cols)]
     # Ask user for percentage
     dlg = QtWidgets.QInputDialog(text_edit)
@@ -4528,39 +4621,20 @@ def _table_set_current_column_width(text_edit: QtWidgets.QTextEdit, table):
     dlg.setInputMode(QtWidgets.QInputDialog.DoubleInput)
     dlg.setDoubleRange(1.0, 100.0)
     dlg.setDoubleDecimals(1)
-    dlg.setDoubleValue(
-        constraints[col_idx].rawValue()
-        if hasattr(constraints[col_idx], "rawValue")
-        else constraints[col_idx].value()
-    )
+    dlg.setDoubleValue(_QTL_GET(constraints[col_idx]))
     if dlg.exec_() != QtWidgets.QDialog.Accepted:
         return
     new_pct = dlg.doubleValue()
     # Rebalance other columns to keep sum ~100
     other_indices = [i for i in range(cols) if i != col_idx]
-    current_sum = sum((c.rawValue() if hasattr(c, "rawValue") else c.value()) for c in constraints)
     remaining = max(1.0, 100.0 - new_pct)
     if not other_indices:
         constraints[col_idx] = QTextLength(QTextLength.PercentageLength, new_pct)
     else:
         # Distribute remaining proportionally to their existing sizes
-        other_sum = max(
-            1e-6,
-            sum(
-                (
-                    constraints[i].rawValue()
-                    if hasattr(constraints[i], "rawValue")
-                    else constraints[i].value()
-                )
-                for i in other_indices
-            ),
-        )
-        for i in other_indices:
-            base = (
-                constraints[i].rawValue()
-                if hasattr(constraints[i], "rawValue")
-                else constraints[i].value()
-            )
+        bases = [_QTL_GET(constraints[i]) for i in other_indices]
+        other_sum = max(1e-6, sum(bases))
+        for i, base in zip(other_indices, bases):
             pct = remaining * (base / other_sum)
             constraints[i] = QTextLength(QTextLength.PercentageLength, pct)
         constraints[col_idx] = QTextLength(QTextLength.PercentageLength, new_pct)
@@ -4569,33 +4643,28 @@ def _table_set_current_column_width(text_edit: QtWidgets.QTextEdit, table):
 
 
 # ----------------------------- Table formulas (SUM) -----------------------------
-def _letters_to_index(letters: str) -> int:
-    """Convert spreadsheet-like column letters (A, B, ... Z, AA, AB, ...) to 0-based index."""
-    s = (letters or "").strip().upper()
-    if not s or not s.isalpha():
-        return -1
-    idx = 0
-    for ch in s:
-        idx = idx * 26 + (ord(ch) - ord('A') + 1)
-    return idx - 1
-
-
 def _parse_cell_address(addr: str):
     """Parse like A1 -> (row_idx, col_idx) 0-based. Returns (r, c) or (None, None) if invalid."""
     if not isinstance(addr, str):
         return None, None
-    m = re.match(r"^\s*([A-Za-z]+)(\d+)\s*$", addr)
-    if not m:
+    s = addr.strip()
+    # Split "letters+digits" by hand; cheaper than a regex for these short strings
+    n = len(s)
+    i = 0
+    col = 0
+    while i < n:
+        ch = s[i]
+        if not (ch.isascii() and ch.isalpha()):
+            break
+        col = col * 26 + (ord(ch) & 0x1F)  # A/a -> 1 ... Z/z -> 26
+        i += 1
+    digits = s[i:]
+    if i == 0 or not digits.isdecimal():
         return None, None
-    letters, row_str = m.group(1), m.group(2)
-    col = _letters_to_index(letters)
-    try:
-        row = int(row_str) - 1
-    except Exception:
-        row = -1
-    if row < 0 or col < 0:
+    row = int(digits) - 1
+    if row < 0:
         return None, None
-    return row, col
+    return row, col - 1
 
 
 def _table_cell_plain_text(table, row: int, col: int) -> str:
@@ -4604,8 +4673,11 @@ def _table_cell_plain_text(table, row: int, col: int) -> str:
         if not cell.isValid():
             return ""
         c = cell.firstCursorPosition()
-        # select to last
         last = cell.lastCursorPosition()
+        # Single-block cells (the usual case) can read the block text without a selection
+        if c.blockNumber() == last.blockNumber():
+            return c.block().text()
+        # select to last
         c.setPosition(last.position(), QTextCursor.KeepAnchor)
         return c.selectedText()
     except Exception:
@@ -4651,6 +4723,33 @@ def _table_cell_append_text(text_edit: QtWidgets.QTextEdit, table, row: int, col
         pass
 
 
+def _right_align_cell_blocks(cell):
+    """Right-align every paragraph in a table cell, walking the block list directly."""
+    end_pos = cell.lastCursorPosition().position()
+    block = cell.firstCursorPosition().block()
+    while block.isValid() and block.position() <= end_pos:
+        QTextCursor(block).mergeBlockFormat(_RIGHT_ALIGN_BFMT)
+        block = block.next()
+
+
+_NUMBER_LEADS = frozenset("+-0123456789.")
+
+
+def _try_parse_number(txt: str):
+    # Cell text as a float, permissive of thousands commas; empty counts as 0.0,
+    # anything that can't start a number is None without going through float()
+    if not txt:
+        return 0.0
+    if txt[0] not in _NUMBER_LEADS:
+        return None
+    if "," in txt:
+        txt = txt.replace(",", "")
+    try:
+        return float(txt)
+    except ValueError:
+        return None
+
+
 def _sum_range_in_table(table, start_addr: str, end_addr: str) -> float:
     r0, c0 = _parse_cell_address(start_addr)
     r1, c1 = _parse_cell_address(end_addr)
@@ -4662,16 +4761,10 @@ def _sum_range_in_table(table, start_addr: str, end_addr: str) -> float:
     for r in range(r0, r1 + 1):
         for c in range(c0, c1 + 1):
             txt = _table_cell_plain_text(table, r, c).strip()
-            # If a referenced cell contains a formula, ignore it during SUM
-            if txt.startswith("="):
-                continue
-            # Try parsing as float, permissive of commas
-            try:
-                num = float(txt.replace(",", "")) if txt else 0.0
+            # Formula cells ("=...") and other non-numeric text are ignored during SUM
+            num = _try_parse_number(txt)
+            if num is not None:
                 total += num
-            except Exception:
-                # ignore non-numeric
-                pass
     return total
 
 
@@ -4685,7 +4778,7 @@ _CURRENCY_SUFFIX_LEGACY = " (Currency)"
 def _format_currency(value: float) -> str:
     try:
         # Show negative values with leading minus (simple style)
-        return ("-$%s" % f"{abs(value):,.2f}") if value < 0 else f"${value:,.2f}"
+        return f"-${-value:,.2f}" if value < 0 else f"${value:,.2f}"
     except Exception:
         return str(value)
 
@@ -4696,17 +4789,18 @@ def _has_currency_suffix(text: str) -> bool:
     normalized = text.rstrip()
     return normalized.endswith(_CURRENCY_SUFFIX) or normalized.endswith(_CURRENCY_SUFFIX_LEGACY)
 
+_CURRENCY_VALUE_RE = re.compile(r'^\s*-?\$[\d,]+\.?\d*\s*$')
+
 def _column_has_currency_data(table, col: int) -> bool:
     """Check if a column contains currency-formatted values ($X.XX pattern)."""
     try:
-        import re
-        currency_pattern = re.compile(r'^\s*-?\$[\d,]+\.?\d*\s*$')
         rows = table.rows()
         currency_count = 0
         for r in range(1, rows):  # Skip header
             cell_txt = _table_cell_plain_text(table, r, col)
-            if isinstance(cell_txt, str) and cell_txt.strip():
-                if currency_pattern.match(cell_txt.strip()):
+            # Only cells containing '$' can match; skip the regex for ordinary text
+            if isinstance(cell_txt, str) and "$" in cell_txt:
+                if _CURRENCY_VALUE_RE.match(cell_txt.strip()):
                     currency_count += 1
                     if currency_count >= 2:  # Require at least 2 currency values
                         return True
@@ -4792,10 +4886,7 @@ def _table_mark_currency_columns(text_edit: QtWidgets.QTextEdit, table, sel_rect
                 if not cell.isValid():
                     continue
                 cur = cell.firstCursorPosition()
-                bf = cur.blockFormat()
-                from PyQt5.QtCore import Qt as _Qt
-                bf.setAlignment(_Qt.AlignRight)
-                cur.setBlockFormat(bf)
+                cur.mergeBlockFormat(_RIGHT_ALIGN_BFMT)
                 # Format numeric cell content as currency if parseable
                 raw = _table_cell_plain_text(table, r, c)
                 if raw:
@@ -4845,19 +4936,18 @@ def _table_mark_currency_columns(text_edit: QtWidgets.QTextEdit, table, sel_rect
                 cell = table.cellAt(last_row_idx, c)
                 if cell.isValid():
                     cur = cell.firstCursorPosition()
-                    bf = cur.blockFormat()
-                    from PyQt5.QtCore import Qt as _Qt
-                    bf.setAlignment(_Qt.AlignRight)
-                    cur.setBlockFormat(bf)
+                    cur.mergeBlockFormat(_RIGHT_ALIGN_BFMT)
             except Exception:
                 pass
     except Exception:
         pass
 
-def _table_recompute_currency_columns(text_edit: QtWidgets.QTextEdit, table):
+def _table_recompute_currency_columns(text_edit: QtWidgets.QTextEdit, table, cols=None):
+    """Recompute currency cells and totals; *cols* may pass an already-detected column set."""
     if table is None or table.rows() < 2:
         return
-    cols = _detect_currency_columns(table)
+    if cols is None:
+        cols = _detect_currency_columns(table)
     if not cols:
         return
     last_row_idx = table.rows() - 1
@@ -4875,25 +4965,14 @@ def _table_recompute_currency_columns(text_edit: QtWidgets.QTextEdit, table):
             cell = table.cellAt(r, c)
             if not cell.isValid():
                 return
-            from PyQt5.QtCore import Qt as _Qt
-            start_pos = cell.firstCursorPosition().position()
-            end_pos = cell.lastCursorPosition().position()
-            from PyQt5.QtGui import QTextCursor as _QTextCursor, QTextBlockFormat as _QTextBlockFormat
-            cur = _QTextCursor(text_edit.document())
-            cur.setPosition(start_pos)
-            while cur.position() <= end_pos:
-                bf = _QTextBlockFormat()
-                bf.setAlignment(_Qt.AlignRight)
-                cur.mergeBlockFormat(bf)
-                if cur.position() == end_pos:
-                    break
-                if not cur.movePosition(_QTextCursor.NextBlock):
-                    break
+            _right_align_cell_blocks(cell)
         except Exception:
             pass
 
     for c in cols:
+        # Pass 1: read and parse every data cell of the column once
         total = 0.0
+        parsed = []
         for r in range(1, last_row_idx):
             try:
                 raw = _table_cell_plain_text(table, r, c)
@@ -4901,7 +4980,13 @@ def _table_recompute_currency_columns(text_edit: QtWidgets.QTextEdit, table):
                     continue
                 cleaned = raw.replace("$", "").replace(",", "").strip()
                 val = float(cleaned) if cleaned else 0.0
-                total += val
+            except Exception:
+                continue
+            total += val
+            parsed.append((r, val))
+        # Pass 2: write the formatted values back
+        for r, val in parsed:
+            try:
                 _table_set_cell_plain_text(text_edit, table, r, c, _format_currency(val))
                 _right_align_cell(r, c)
             except Exception:
@@ -4927,20 +5012,7 @@ def _snap_cursor_if_currency_cell(text_edit, table, cell):
             return
         # Ensure cell has right-alignment (may be lost on page reload for empty cells)
         try:
-            from PyQt5.QtCore import Qt as _Qt
-            from PyQt5.QtGui import QTextBlockFormat as _QTextBlockFormat, QTextCursor as _QTextCursor
-            start_pos = cell.firstCursorPosition().position()
-            end_pos = cell.lastCursorPosition().position()
-            align_cur = _QTextCursor(text_edit.document())
-            align_cur.setPosition(start_pos)
-            while align_cur.position() <= end_pos:
-                bf = _QTextBlockFormat()
-                bf.setAlignment(_Qt.AlignRight)
-                align_cur.mergeBlockFormat(bf)
-                if align_cur.position() == end_pos:
-                    break
-                if not align_cur.movePosition(_QTextCursor.NextBlock):
-                    break
+            _right_align_cell_blocks(cell)
         except Exception:
             pass
         # Snap cursor to right
@@ -5012,11 +5084,12 @@ def ensure_currency_columns_watcher(text_edit: QtWidgets.QTextEdit):
                                 text_edit._currency_updating = False
                         # Recompute totals when leaving previous cell
                         prev_tbl = prev[0]
-                        if prev_tbl is not None and _detect_currency_columns(prev_tbl):
+                        prev_cols = _detect_currency_columns(prev_tbl) if prev_tbl is not None else None
+                        if prev_cols:
                             # Recompute totals on leaving any currency cell (guarded to avoid recursion)
                             text_edit._currency_updating = True
                             try:
-                                _table_recompute_currency_columns(text_edit, prev_tbl)
+                                _table_recompute_currency_columns(text_edit, prev_tbl, prev_cols)
                             finally:
                                 text_edit._currency_updating = False
                         text_edit._currency_last_cell = coord
@@ -5025,20 +5098,22 @@ def ensure_currency_columns_watcher(text_edit: QtWidgets.QTextEdit):
                 else:
                     if prev is not None:
                         prev_tbl = prev[0]
-                        if prev_tbl is not None and _detect_currency_columns(prev_tbl):
+                        prev_cols = _detect_currency_columns(prev_tbl) if prev_tbl is not None else None
+                        if prev_cols:
                             text_edit._currency_updating = True
                             try:
-                                _table_recompute_currency_columns(text_edit, prev_tbl)
+                                _table_recompute_currency_columns(text_edit, prev_tbl, prev_cols)
                             finally:
                                 text_edit._currency_updating = False
                     text_edit._currency_last_cell = None
             else:
                 if prev is not None:
                     prev_tbl = prev[0]
-                    if prev_tbl is not None and _detect_currency_columns(prev_tbl):
+                    prev_cols = _detect_currency_columns(prev_tbl) if prev_tbl is not None else None
+                    if prev_cols:
                         text_edit._currency_updating = True
                         try:
-                            _table_recompute_currency_columns(text_edit, prev_tbl)
+                            _table_recompute_currency_columns(text_edit, prev_tbl, prev_cols)
                         finally:
                             text_edit._currency_updating = False
                 text_edit._currency_last_cell = None
@@ -5052,9 +5127,6 @@ def ensure_currency_columns_watcher(text_edit: QtWidgets.QTextEdit):
     class _CurrencyEventFilter(QObject):
         def eventFilter(self, obj, event):
             try:
-                from PyQt5.QtCore import QEvent, Qt
-                from PyQt5.QtGui import QTextBlockFormat, QBrush, QColor
-                
                 # Handle Tab key to insert row above Total in currency tables
                 if event.type() == QEvent.KeyPress:
                     key = event.key()
@@ -5067,33 +5139,35 @@ def ensure_currency_columns_watcher(text_edit: QtWidgets.QTextEdit):
                                 row = cell.row()
                                 col = cell.column()
                                 currency_cols = _detect_currency_columns(table)
+                                # Row/column counts are stable until the insert below
+                                nrows = table.rows()
                                 # Only trigger if this is a currency table with a Total row
-                                if currency_cols and table.rows() > 1:
-                                    last_row_text = _table_cell_plain_text(table, table.rows() - 1, 0)
+                                if currency_cols and nrows > 1:
+                                    last_row_text = _table_cell_plain_text(table, nrows - 1, 0)
                                     if last_row_text == "Total":
                                         # Tab on last data row AND last column inserts new row
-                                        last_data_row = table.rows() - 2
-                                        last_col = table.columns() - 1
+                                        last_data_row = nrows - 2
+                                        ncols = table.columns()
+                                        last_col = ncols - 1
                                         if row == last_data_row and col == last_col:
                                             text_edit._currency_updating = True
                                             try:
                                                 # Format current cell first
-                                                _table_recompute_currency_columns(text_edit, table)
+                                                _table_recompute_currency_columns(text_edit, table, currency_cols)
                                                 # Insert new row before Total
-                                                table.insertRows(table.rows() - 1, 1)
+                                                table.insertRows(nrows - 1, 1)
                                                 new_row = last_data_row + 1
+                                                cell_at = table.cellAt
                                                 # Move cursor to first cell of new row
-                                                new_cell = table.cellAt(new_row, 0)
+                                                new_cell = cell_at(new_row, 0)
                                                 text_edit.setTextCursor(new_cell.firstCursorPosition())
                                                 # Right-align currency columns in new row
-                                                bfmt = QTextBlockFormat()
-                                                bfmt.setAlignment(Qt.AlignRight)
                                                 for c in currency_cols:
-                                                    ccur = table.cellAt(new_row, c).firstCursorPosition()
-                                                    ccur.mergeBlockFormat(bfmt)
+                                                    ccur = cell_at(new_row, c).firstCursorPosition()
+                                                    ccur.mergeBlockFormat(_RIGHT_ALIGN_BFMT)
                                                 # Clear any inherited background from Total row
-                                                for clr_c in range(table.columns()):
-                                                    c = table.cellAt(new_row, clr_c)
+                                                for clr_c in range(ncols):
+                                                    c = cell_at(new_row, clr_c)
                                                     cfmt = c.format()
                                                     cfmt.setBackground(QBrush(Qt.NoBrush))
                                                     c.setFormat(cfmt)
@@ -5107,11 +5181,12 @@ def ensure_currency_columns_watcher(text_edit: QtWidgets.QTextEdit):
                     prev = getattr(text_edit, "_currency_last_cell", None)
                     if prev is not None:
                         prev_tbl = prev[0]
-                        if prev_tbl is not None and _detect_currency_columns(prev_tbl):
+                        prev_cols = _detect_currency_columns(prev_tbl) if prev_tbl is not None else None
+                        if prev_cols:
                             if not text_edit._currency_updating:
                                 text_edit._currency_updating = True
                                 try:
-                                    _table_recompute_currency_columns(text_edit, prev_tbl)
+                                    _table_recompute_currency_columns(text_edit, prev_tbl, prev_cols)
                                 finally:
                                     text_edit._currency_updating = False
                 return False
@@ -5119,7 +5194,7 @@ def ensure_currency_columns_watcher(text_edit: QtWidgets.QTextEdit):
                 return False
 
     text_edit._currency_event_filter = _CurrencyEventFilter(text_edit)
-    text_edit.installEventFilter(text_edit._currency_event_filter)
+    _route_events(text_edit, text_edit, text_edit._currency_event_filter, (QEvent.KeyPress, QEvent.FocusOut))
 
 
 def _apply_selection_colors(text_edit: QtWidgets.QTextEdit, bg: QColor, fg: QColor):
@@ -5147,35 +5222,49 @@ def _apply_font_family(text_edit: QtWidgets.QTextEdit, family: str):
     
     if cursor.hasSelection():
         # IMPORTANT: mergeCharFormat() APPENDS to font stacks instead of replacing.
-        # We need to iterate through each character and REPLACE the font family
-        # while preserving other properties (bold, italic, color, etc.)
+        # We need to REPLACE the font family on each run of text while preserving
+        # other properties (bold, italic, color, etc.)
         
         start = cursor.selectionStart()
         end = cursor.selectionEnd()
+        family = str(family)
         
-        cursor.beginEditBlock()
-        
-        # Iterate through each character position in the selection
-        for pos in range(start, end):
-            cursor.setPosition(pos)
-            cursor.setPosition(pos + 1, cursor.KeepAnchor)
-            
+        def _replace_family(s_pos: int, e_pos: int):
+            cursor.setPosition(s_pos)
+            cursor.setPosition(e_pos, cursor.KeepAnchor)
             # Get current format to preserve other properties
             current_fmt = cursor.charFormat()
-            
             # REPLACE font - clear any existing font stack and set single font
             try:
-                # Clear font families list and set our single font
-                current_fmt.setFontFamilies([str(family)])
+                current_fmt.setFontFamilies([family])
             except AttributeError:
-                current_fmt.setFontFamily(str(family))
-            
+                pass
             # Also set the primary font family directly
-            current_fmt.setFontFamily(str(family))
-            
+            current_fmt.setFontFamily(family)
             # Use setCharFormat to REPLACE (not merge)
             cursor.setCharFormat(current_fmt)
         
+        # Collect the selection's format runs (fragments) up front instead of going
+        # per character; setCharFormat merges/splits fragments, so the document must
+        # not be edited while its fragment iterators are live
+        ranges = []
+        block = text_edit.document().findBlock(start)
+        while block.isValid() and block.position() < end:
+            for frag in _iter_fragments(block):
+                f_start = frag.position()
+                s_pos = max(start, f_start)
+                e_pos = min(end, f_start + frag.length())
+                if s_pos < e_pos:
+                    ranges.append((s_pos, e_pos))
+            # Paragraph separator (keeps typing format on empty lines consistent)
+            sep = block.position() + block.length() - 1
+            if start <= sep < end:
+                ranges.append((sep, sep + 1))
+            block = block.next()
+        
+        cursor.beginEditBlock()
+        for s_pos, e_pos in ranges:
+            _replace_family(s_pos, e_pos)
         cursor.endEditBlock()
         
         # Restore selection
@@ -5314,93 +5403,46 @@ def _change_list_indent(text_edit: QtWidgets.QTextEdit, delta: int):
         _merge_with_adjacent_lists(cursor, nb)
 
 
-class _ListTabHandler(QObject):
-    def __init__(self, edit: QtWidgets.QTextEdit):
-        super().__init__(edit)
-        self._edit = edit
-
-    def eventFilter(self, obj, event):
-        if obj is self._edit and event.type() == QEvent.KeyPress:
-            key = event.key()
-            if key in (Qt.Key_Tab, Qt.Key_Backtab):
-                cur = self._edit.textCursor()
-                if cur.block().textList() is not None:
-                    is_backtab = (key == Qt.Key_Backtab) or bool(
-                        event.modifiers() & Qt.ShiftModifier
-                    )
-                    _change_list_indent(self._edit, -1 if is_backtab else +1)
-                    return True  # consume to avoid inserting a tab char
-        return super().eventFilter(obj, event)
-
-
-def _install_list_tab_handler(text_edit: QtWidgets.QTextEdit):
-    handler = _ListTabHandler(text_edit)
-    text_edit.installEventFilter(handler)
-    # Keep a reference to prevent GC
-    if not hasattr(text_edit, "_listTabHandler"):
-        text_edit._listTabHandler = []
-    text_edit._listTabHandler.append(handler)
-
-
-class _TableTabHandler(QObject):
-    def __init__(self, edit: QtWidgets.QTextEdit):
-        super().__init__(edit)
-        self._edit = edit
-
-    def eventFilter(self, obj, event):
-        if obj is self._edit and event.type() == QEvent.KeyPress:
-            key = event.key()
-            if key in (Qt.Key_Tab, Qt.Key_Backtab):
-                shift = (key == Qt.Key_Backtab) or bool(event.modifiers() & Qt.ShiftModifier)
-                cur = self._edit.textCursor()
-                tbl = cur.currentTable()
-                if tbl is None:
-                    return False
-                cell = tbl.cellAt(cur)
-                if not cell.isValid():
-                    return False
-                row = cell.row()
-                col = cell.column()
-                rows = tbl.rows()
-                cols = tbl.columns()
-                if shift:
-                    # Move backward
-                    prev_col = col - 1
-                    prev_row = row
-                    if prev_col < 0:
-                        prev_row -= 1
-                        if prev_row < 0:
-                            return True  # swallow at very start
-                        prev_col = cols - 1
-                    target = tbl.cellAt(prev_row, prev_col)
-                    self._edit.setTextCursor(target.firstCursorPosition())
-                    return True
-                # Forward
-                next_col = col + 1
-                next_row = row
-                if next_col >= cols:
-                    next_col = 0
-                    next_row += 1
-                    if next_row >= rows:
-                        # Append a new row
-                        try:
-                            tbl.insertRows(rows, 1)
-                            rows += 1
-                        except Exception:
-                            pass
-                if next_row < rows:
-                    target = tbl.cellAt(next_row, next_col)
-                    self._edit.setTextCursor(target.firstCursorPosition())
-                return True
-        return super().eventFilter(obj, event)
-
-
-def _install_table_tab_handler(text_edit: QtWidgets.QTextEdit):
-    handler = _TableTabHandler(text_edit)
-    text_edit.installEventFilter(handler)
-    if not hasattr(text_edit, "_tableTabHandlers"):
-        text_edit._tableTabHandlers = []
-    text_edit._tableTabHandlers.append(handler)
+def _table_tab_navigate(text_edit: QtWidgets.QTextEdit, cur: QTextCursor, tbl, backward: bool) -> bool:
+    """Move to the next/previous table cell (appending a row past the end); False if not in a cell."""
+    cell = tbl.cellAt(cur)
+    if not cell.isValid():
+        return False
+    row = cell.row()
+    col = cell.column()
+    cols = tbl.columns()
+    if backward:
+        # Move backward
+        prev_col = col - 1
+        prev_row = row
+        if prev_col < 0:
+            prev_row -= 1
+            if prev_row < 0:
+                return True  # swallow at very start
+            prev_col = cols - 1
+        target = tbl.cellAt(prev_row, prev_col)
+        text_edit.setTextCursor(target.firstCursorPosition())
+        return True
+    # Forward
+    next_col = col + 1
+    next_row = row
+    if next_col >= cols:
+        # Row count only matters when wrapping past the last column
+        next_col = 0
+        next_row += 1
+        rows = tbl.rows()
+        if next_row >= rows:
+            # Append a new row
+            try:
+                tbl.insertRows(rows, 1)
+                rows += 1
+            except Exception:
+                pass
+        if next_row >= rows:
+            return True
+    target = tbl.cellAt(next_row, next_col)
+    text_edit.setTextCursor(target.firstCursorPosition())
+    return True
 
 
 # ----------------------------- Plain paragraph indent with Tab/Shift+Tab -----------------------------
@@ -5421,62 +5463,38 @@ def _change_block_left_margin(text_edit: QtWidgets.QTextEdit, delta_px: float):
             bf.setLeftMargin(max(0.0, float(bf.leftMargin()) + float(delta_px)))
             cur.mergeBlockFormat(bf)
         else:
-            c = QTextCursor(text_edit.document())
-            c.setPosition(start)
-            while True:
-                block = c.block()
-                bf = block.blockFormat()
-                bf.setLeftMargin(max(0.0, float(bf.leftMargin()) + float(delta_px)))
-                # Select this block and apply
-                bc = QTextCursor(block)
-                bc.select(QTextCursor.BlockUnderCursor)
-                bc.mergeBlockFormat(bf)
+            doc = text_edit.document()
+            # Collect the selected blocks and check whether they share one left margin
+            blocks = []
+            block = doc.findBlock(start)
+            while block.isValid():
+                blocks.append(block)
                 # Stop if we've passed end
                 if block.position() + block.length() >= end:
                     break
-                if not c.movePosition(QTextCursor.NextBlock):
-                    break
+                block = block.next()
+            if not blocks:
+                return
+            margins = {float(b.blockFormat().leftMargin()) for b in blocks}
+            if len(margins) == 1:
+                # Uniform margins (flat paragraphs): one merge over the whole range
+                bf = QTextBlockFormat()
+                bf.setLeftMargin(max(0.0, margins.pop() + float(delta_px)))
+                rng = QTextCursor(doc)
+                rng.setPosition(blocks[0].position())
+                rng.setPosition(blocks[-1].position(), QTextCursor.KeepAnchor)
+                rng.mergeBlockFormat(bf)
+            else:
+                for block in blocks:
+                    bf = QTextBlockFormat()
+                    bf.setLeftMargin(
+                        max(0.0, float(block.blockFormat().leftMargin()) + float(delta_px))
+                    )
+                    QTextCursor(block).mergeBlockFormat(bf)
     finally:
         work.endEditBlock()
 
 
-class _PlainIndentTabHandler(QObject):
-    def __init__(self, edit: QtWidgets.QTextEdit):
-        super().__init__(edit)
-        self._edit = edit
-
-    def eventFilter(self, obj, event):
-        if obj is self._edit and event.type() == QEvent.KeyPress:
-            key = event.key()
-            if key in (Qt.Key_Tab, Qt.Key_Backtab):
-                cur = self._edit.textCursor()
-                # Skip if inside table or list; handled by other filters
-                if cur.currentTable() is not None or cur.block().textList() is not None:
-                    return False
-                is_out = (key == Qt.Key_Backtab) or bool(event.modifiers() & Qt.ShiftModifier)
-                _change_block_left_margin(
-                    self._edit, -INDENT_STEP_PX if is_out else +INDENT_STEP_PX
-                )
-                return True
-        return super().eventFilter(obj, event)
-
-
-def _install_plain_indent_tab_handler(text_edit: QtWidgets.QTextEdit):
-    handler = _PlainIndentTabHandler(text_edit)
-    text_edit.installEventFilter(handler)
-    if not hasattr(text_edit, "_plainIndentHandlers"):
-        text_edit._plainIndentHandlers = []
-    text_edit._plainIndentHandlers.append(handler)
-    # Load indent step from settings if available
-    try:
-        from settings_manager import get_plain_indent_px
-
-        global INDENT_STEP_PX
-        INDENT_STEP_PX = float(get_plain_indent_px())
-    except Exception:
-        pass
-
-
 def _select_combo_value(combo: QtWidgets.QComboBox, value: int):
     try:
         target = int(value)
@@ -5491,44 +5509,118 @@ def _select_combo_value(combo: QtWidgets.QComboBox, value: int):
             continue
 
 
-def _install_default_paste_override(text_edit: QtWidgets.QTextEdit):
-    class _PasteHandler(QObject):
-        def __init__(self, edit):
-            super().__init__(edit)
-            self._edit = edit
+class _RichTextEventRouter(QObject):
+    """One event filter per watched widget (editor, viewport) for all rich-text handlers.
 
-        def _mode(self) -> str:
-            try:
-                from settings_manager import get_default_paste_mode
+    Handlers register the event types they care about; everything else is passed
+    through without calling into them. Like Qt's own filter chain, the most recently
+    registered handler runs first and a True return stops the dispatch.
+    """
 
-                return get_default_paste_mode() or "rich"
-            except Exception:
-                return "rich"
+    def __init__(self, edit: QtWidgets.QTextEdit):
+        super().__init__(edit)
+        self._routes = {}
+
+    def add(self, watched: QObject, handler: QObject, event_types):
+        routes = self._routes.get(watched)
+        if routes is None:
+            routes = self._routes[watched] = {}
+            watched.installEventFilter(self)
+            if watched is not self.parent():
+                watched.destroyed.connect(partial(self._routes.pop, watched, None))
+        for et in event_types:
+            routes[et] = (handler,) + routes.get(et, ())
 
-        def eventFilter(self, obj, event):
-            if obj is self._edit and event.type() == QEvent.KeyPress:
-                if (
-                    event.key() == Qt.Key_V
-                    and (event.modifiers() & Qt.ControlModifier)
-                    and not (event.modifiers() & Qt.AltModifier)
-                ):
-                    mode = self._mode()
-                    if mode == "text-only":
-                        paste_text_only(self._edit)
-                    elif mode == "match-style":
-                        paste_match_style(self._edit)
-                    elif mode == "clean":
-                        paste_clean_formatting(self._edit)
-                    else:
-                        self._edit.paste()
-                    return True
-            return super().eventFilter(obj, event)
+    def eventFilter(self, obj, event):
+        routes = self._routes.get(obj)
+        if routes:
+            for handler in routes.get(event.type(), ()):
+                try:
+                    if handler.eventFilter(obj, event):
+                        return True
+                except RuntimeError:
+                    # Handler's C++ side already gone (e.g. overlay torn down)
+                    continue
+        return False
+
+
+def _route_events(text_edit: QtWidgets.QTextEdit, watched: QObject, handler: QObject, event_types):
+    router = getattr(text_edit, "_rtRouter", None)
+    if router is None:
+        router = text_edit._rtRouter = _RichTextEventRouter(text_edit)
+    router.add(watched, handler, event_types)
+
+
+class _RichTextEventFilter(QObject):
+    """Single key filter per editor for Tab/Shift+Tab and the Ctrl+V default paste mode.
+
+    Tab moves between table cells, changes list levels, or indents plain paragraphs
+    (checked in that order); Ctrl+V dispatches to the configured paste mode.
+    """
+
+    def __init__(self, edit: QtWidgets.QTextEdit):
+        super().__init__(edit)
+        self._edit = edit
+
+    def _paste_mode(self) -> str:
+        try:
+            from settings_manager import get_default_paste_mode
+
+            return get_default_paste_mode() or "rich"
+        except Exception:
+            return "rich"
+
+    def eventFilter(self, obj, event):
+        if obj is not self._edit or event.type() != QEvent.KeyPress:
+            return False
+        key = event.key()
+        if key == Qt.Key_Tab or key == Qt.Key_Backtab:
+            backward = (key == Qt.Key_Backtab) or bool(event.modifiers() & Qt.ShiftModifier)
+            cur = self._edit.textCursor()
+            tbl = cur.currentTable()
+            if tbl is not None and _table_tab_navigate(self._edit, cur, tbl, backward):
+                return True
+            if cur.block().textList() is not None:
+                _change_list_indent(self._edit, -1 if backward else +1)
+                return True  # consume to avoid inserting a tab char
+            if tbl is not None:
+                return False
+            _change_block_left_margin(self._edit, -INDENT_STEP_PX if backward else +INDENT_STEP_PX)
+            return True
+        if key == Qt.Key_V:
+            mods = event.modifiers()
+            if (mods & Qt.ControlModifier) and not (mods & Qt.AltModifier):
+                fn = _PASTE_DISPATCH.get(self._paste_mode())
+                if fn is not None:
+                    fn(self._edit)
+                else:
+                    self._edit.paste()
+                return True
+        return False
+
+
+def _install_rich_text_event_filter(text_edit: QtWidgets.QTextEdit):
+    if getattr(text_edit, "_rtFilter", None) is not None:
+        return
+    handler = _RichTextEventFilter(text_edit)
+    _route_events(text_edit, text_edit, handler, (QEvent.KeyPress,))
+    # Keep a reference to prevent GC
+    text_edit._rtFilter = handler
+    # Load indent step from settings if available
+    try:
+        from settings_manager import get_plain_indent_px
+
+        global INDENT_STEP_PX
+        INDENT_STEP_PX = float(get_plain_indent_px())
+    except Exception:
+        pass
 
-    handler = _PasteHandler(text_edit)
-    text_edit.installEventFilter(handler)
-    if not hasattr(text_edit, "_pasteHandler"):
-        text_edit._pasteHandler = []
-    text_edit._pasteHandler.append(handler)
+
+# Inline style/class attributes dropped by paste_clean_formatting (double- and single-quoted)
+_STYLE_ATTR_RE_DQ = re.compile(r'\sstyle\s*=\s*"[^"]*"', re.IGNORECASE)
+_STYLE_ATTR_RE_SQ = re.compile(r"\sstyle\s*=\s*'[^']*'", re.IGNORECASE)
+_CLASS_ATTR_RE_DQ = re.compile(r'\sclass\s*=\s*"[^"]*"', re.IGNORECASE)
+_CLASS_ATTR_RE_SQ = re.compile(r"\sclass\s*=\s*'[^']*'", re.IGNORECASE)
 
 
 def paste_clean_formatting(text_edit: QtWidgets.QTextEdit):
@@ -5554,12 +5646,10 @@ def paste_clean_formatting(text_edit: QtWidgets.QTextEdit):
     try:
         s = _strip_match_style_html(html)
         # Additionally drop any remaining style/class attributes outright
-        import re
-
-        s = re.sub(r'\sstyle\s*=\s*"[^"]*"', "", s, flags=re.IGNORECASE)
-        s = re.sub(r"\sstyle\s*=\s*'[^']*'", "", s, flags=re.IGNORECASE)
-        s = re.sub(r'\sclass\s*=\s*"[^"]*"', "", s, flags=re.IGNORECASE)
-        s = re.sub(r"\sclass\s*=\s*'[^']*'", "", s, flags=re.IGNORECASE)
+        s = _STYLE_ATTR_RE_DQ.sub("", s)
+        s = _STYLE_ATTR_RE_SQ.sub("", s)
+        s = _CLASS_ATTR_RE_DQ.sub("", s)
+        s = _CLASS_ATTR_RE_SQ.sub("", s)
         cleaned = s
     except Exception:
         cleaned = html
@@ -5569,17 +5659,14 @@ def paste_clean_formatting(text_edit: QtWidgets.QTextEdit):
     cursor.insertHtml(cleaned)
     after = cursor.position()
     # Normalize inserted range to current family/size and transparent background
-    doc_font = _effective_default_font(text_edit)
+    doc_fam, doc_sz = _default_family_and_size(text_edit)
     fmt = QTextCharFormat(pre_fmt)
-    fam = fmt.fontFamily() or doc_font.family()
+    fam = fmt.fontFamily() or doc_fam
     if fam:
         fmt.setFontFamily(fam)
     sz = fmt.fontPointSize()
     if not sz or sz <= 0:
-        try:
-            sz = doc_font.pointSizeF() if doc_font.pointSizeF() > 0 else float(doc_font.pointSize())
-        except Exception:
-            sz = 12.0
+        sz = doc_sz
     fmt.setFontPointSize(float(sz))
     try:
         fmt.setBackground(Qt.transparent)
@@ -5600,20 +5687,27 @@ def paste_clean_formatting(text_edit: QtWidgets.QTextEdit):
     text_edit.setTextCursor(cursor)
 
 
+# Default Paste Mode -> paste function; any other mode ("rich") uses QTextEdit.paste()
+_PASTE_DISPATCH = {
+    "text-only": paste_text_only,
+    "match-style": paste_match_style,
+    "clean": paste_clean_formatting,
+}
+
+
 # ----------------------------- Link handling -----------------------------
+_URL_SCHEMES = ("http://", "https://", "mailto:")
+
+
 def _looks_like_url(text: str) -> bool:
     if not text:
         return False
     t = text.strip()
-    # Quick heuristics for URLs and mailto
-    if t.lower().startswith(("http://", "https://", "mailto:")):
+    # Quick heuristics for URLs and mailto (only the prefix needs case-folding)
+    if t[:8].lower().startswith(_URL_SCHEMES):
         return True
-    if t.lower().startswith("www.") and " " not in t:
-        return True
-    # basic domain.tld pattern without spaces
-    return ("." in t and " " not in t and "/" in t) or (
-        "." in t and t.count(".") >= 1 and " " not in t
-    )
+    # basic domain.tld pattern without spaces (also covers "www.")
+    return " " not in t and "." in t
 
 
 def _normalize_url_scheme(text: str) -> str:
@@ -5673,7 +5767,7 @@ class _LinkClickHandler(QObject):
                 if href and href == self._pressed_anchor:
                     try:
                         # Resolve relative paths (like media/...) against document base for external open
-                        if href and not re.match(r"^[a-zA-Z]+:|^/", href):
+                        if href and not _URL_SCHEME_OR_ROOT_RE.match(href):
                             base = self._edit.document().baseUrl().toLocalFile() if self._edit else ""
                             if base:
                                 # Join using OS path, then convert to file URL
@@ -5689,6 +5783,9 @@ class _LinkClickHandler(QObject):
         return super().eventFilter(obj, event)
 
 
+_LINK_EVENTS = (QEvent.MouseMove, QEvent.MouseButtonPress, QEvent.MouseButtonRelease)
+
+
 def _install_link_click_handler(text_edit: QtWidgets.QTextEdit):
     # Allow links to be interactable with the mouse while still editing
     try:
@@ -5703,7 +5800,7 @@ def _install_link_click_handler(text_edit: QtWidgets.QTextEdit):
         handler = _LinkClickHandler(text_edit)
         vp = text_edit.viewport() if text_edit is not None else None
         if vp is not None:
-            vp.installEventFilter(handler)
+            _route_events(text_edit, vp, handler, _LINK_EVENTS)
         # Keep strong reference on the text_edit object
         if not hasattr(text_edit, "_linkHandler"):
             text_edit._linkHandler = []